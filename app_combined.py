@@ -1,16 +1,27 @@
 # app_combined.py
-from flask import Flask
+import os, sys
 from flask_cors import CORS
 
-from flask_api.expense_routes import app as expense_app
+# expense_routes imports its sibling modules (budget_insights, classifier, ...) by bare name
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "flask_api"))
+
+# Neither import loads torch or the classifier: the expense classifier warms up
+# according to CLASSIFIER_WARMUP and the forecaster is imported on first /predict.
+from flask_api.expense_routes import app  # expense, budget and admin routes
 from future_prediction.predict_api import app as predict_app
 
-app = Flask(__name__)
 CORS(app)
 
-# register the blueprints or route functions
-app.register_blueprint(expense_app.blueprints[None])  # expense routes
-app.register_blueprint(predict_app.blueprints[None])  # predict routes
+# mount the predict routes on the same app
+for rule in predict_app.url_map.iter_rules():
+    if rule.endpoint == "static":
+        continue
+    app.add_url_rule(
+        rule.rule,
+        endpoint=rule.endpoint,
+        view_func=predict_app.view_functions[rule.endpoint],
+        methods=rule.methods,
+    )
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=7860)
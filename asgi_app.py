@@ -0,0 +1,193 @@
+# asgi_app.py
+"""ASGI serving mode: uvicorn asgi_app:app --host 0.0.0.0 --port 7860
+
+The I/O-heavy, user-facing endpoints run as async handlers on the async
+Firestore client (datastore.get_async_db), so a request waiting on
+Firestore or on the predict service holds no thread:
+  /generate_budget         records and goals are read concurrently
+  /track_goal_progress
+  /predict, /predict_future_expense
+                           records read async, forecasting on the CPU pool;
+                           with PREDICT_API_HOSTPORT the proxy call is async
+                           and coalesced per user
+  /categorize_expense      classifier on the CPU pool (still micro-batched)
+
+CPU-bound work goes to a bounded thread pool (ASGI_CPU_WORKERS) so the
+event loop never runs model inference. Every other route (batch, training
+and admin endpoints) is the Flask app from app_combined.py behind a WSGI
+adapter, unchanged.
+"""
+import asyncio
+import functools
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+# expense_routes imports its sibling modules (budget_insights, classifier, ...) by bare name
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "flask_api"))
+
+from app_combined import app as flask_app  # noqa: E402
+from flask_api import expense_routes  # noqa: E402
+import budget_insights  # noqa: E402
+import classifier  # noqa: E402
+from budget_engine import generate_budgets  # noqa: E402
+from future_prediction import predict_api  # noqa: E402
+from future_prediction.coalesce import AsyncSingleFlight  # noqa: E402
+from future_prediction.datastore import get_async_db  # noqa: E402
+from future_prediction.utils import fetch_monthly_category_frame_async, track_reads  # noqa: E402
+
+ASGI_CPU_WORKERS = int(os.environ.get("ASGI_CPU_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 10))
+
+cpu_pool = ThreadPoolExecutor(max_workers=ASGI_CPU_WORKERS, thread_name_prefix="asgi-cpu")
+_predict_flight = AsyncSingleFlight()
+_remote_predict_flight = AsyncSingleFlight()
+_http = None
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, functools.partial(fn, *args))
+
+
+# ───── Category Classifier ─────
+async def classifier_unavailable():
+    """Async counterpart of expense_routes.classifier_unavailable."""
+    try:
+        if await asyncio.to_thread(classifier.ensure_loaded, expense_routes.CLASSIFIER_READY_TIMEOUT):
+            return None
+    except RuntimeError as e:
+        return JSONResponse({"error": str(e)}, 500)
+    return JSONResponse({"status": "model_loading"}, 503, headers={"Retry-After": "5"})
+
+
+async def categorize_expense(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    expense_text = data.get("expense")
+    if not expense_text:
+        return JSONResponse({"error": "Expense text is required"}, 400)
+
+    unavailable = await classifier_unavailable()
+    if unavailable:
+        return unavailable
+
+    expense_text = expense_text.lower()
+    category, confidence = (await run_cpu(expense_routes.classify_cached, [expense_text]))[0]
+    return JSONResponse({
+        "expense": expense_text,
+        "category": category,
+        "confidence": round(confidence, 2)
+    })
+
+
+# ───── Forecasts ─────
+async def _predict_in_process(user_id: str) -> tuple[dict, int]:
+    frame = await fetch_monthly_category_frame_async(user_id, predict_api.CATEGORIES)
+    return await run_cpu(predict_api.predict_user, user_id, frame)
+
+
+async def predict_in_process(user_id: str) -> tuple[dict, int]:
+    """Concurrent requests for the same user share one read and one forecast."""
+    return await _predict_flight.do(user_id, _predict_in_process, user_id)
+
+
+async def predict(request):
+    user_id = request.query_params.get("user_id")
+    if not user_id:
+        return JSONResponse({"error": "user_id is required"}, 400)
+
+    with track_reads() as reads:
+        result, status = await predict_in_process(user_id)
+    return JSONResponse(result, status, headers={"X-Firestore-Reads": str(reads["reads"])})
+
+
+async def _fetch_remote_prediction(user_id: str) -> dict:
+    response = await _http.get(
+        f"http://{expense_routes.PREDICT_API_HOSTPORT}/predict",
+        params={"user_id": user_id},
+        timeout=expense_routes.PREDICT_API_TIMEOUT
+    )
+    return response.json()
+
+
+async def predict_future_expense(request):
+    user_id = request.query_params.get("user_id")
+    if not user_id:
+        return JSONResponse({"error": "user_id is required"}, 400)
+
+    try:
+        if expense_routes.PREDICT_API_HOSTPORT:
+            result = await _remote_predict_flight.do(user_id, _fetch_remote_prediction, user_id)
+        else:
+            result, _ = await predict_in_process(user_id)
+        payload, status = expense_routes.prediction_response(result)
+        return JSONResponse(payload, status)
+
+    except Exception as e:
+        print(f"[ERROR] Prediction for {user_id} failed: {e}")
+        return JSONResponse({"error": str(e)}, 500)
+
+
+# ───── Budgets and goals ─────
+async def generate_budget(request):
+    user_id = request.query_params.get("user_id")
+    if not user_id:
+        return JSONResponse({"error": "user_id required"}, 400)
+
+    inputs = await budget_insights.fetch_budget_inputs_async(user_id)
+    budget = generate_budgets({user_id: inputs}, datetime.now())[user_id]
+    if budget is None:
+        return JSONResponse({"error": "No financial records found"}, 404)
+    return JSONResponse(budget)
+
+
+async def track_goal_progress(request):
+    user_id = request.query_params.get("user_id")
+    goal_id = request.query_params.get("goal_id")
+
+    if not user_id or not goal_id:
+        return JSONResponse({"error": "User ID and Goal ID are required"}, 400)
+
+    goal_ref = get_async_db().collection("users").document(user_id).collection("savings_goals").document(goal_id)
+    goal = await goal_ref.get()
+
+    if not goal.exists:
+        return JSONResponse({"error": "Goal not found"}, 404)
+    return JSONResponse(expense_routes.goal_progress(goal.to_dict()))
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global _http
+    _http = httpx.AsyncClient()
+    try:
+        yield
+    finally:
+        await _http.aclose()
+        cpu_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route("/categorize_expense", categorize_expense, methods=["POST"]),
+        Route("/predict", predict, methods=["GET"]),
+        Route("/predict_future_expense", predict_future_expense, methods=["GET"]),
+        Route("/generate_budget", generate_budget, methods=["GET"]),
+        Route("/track_goal_progress", track_goal_progress, methods=["GET"]),
+        Mount("/", WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
@@ -1,23 +1,22 @@
 # admin_monitor.py
 from flask import Blueprint, jsonify, request, current_app
-import os, json, subprocess, sys, datetime
-from firebase_admin import firestore
-import firebase_admin
+import os, json, sys
 from dotenv import load_dotenv
 load_dotenv()
 
+from future_prediction.datastore import get_db
+from future_prediction.training_queue import get_queue
+from future_prediction.model_bundle import bundle_path, read_header
+from future_prediction.metadata_index import get_index
+
 bp = Blueprint("admin_monitor", __name__, url_prefix="/admin")
 
-# Safe Firebase init (should already be initialized in expense_routes.py)
-if not firebase_admin._apps:
-    firebase_key_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    if not firebase_key_path or not os.path.exists(firebase_key_path):
-        raise RuntimeError("Firebase key not found for admin_monitor.")
-    cred_path = firebase_key_path
-    cred = firebase_admin.credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
+RETRAIN_WAIT_TIMEOUT = float(os.environ.get("RETRAIN_WAIT_TIMEOUT", 3600))
+LIST_USERS_PAGE_SIZE = int(os.environ.get("LIST_USERS_PAGE_SIZE", 100))
+LIST_USERS_MAX_PAGE_SIZE = int(os.environ.get("LIST_USERS_MAX_PAGE_SIZE", 1000))
 
-db = firestore.client()
+# Same client as expense_routes.py (initialized there or on first use)
+db = get_db()
 
 MODELS_ROOT = os.path.abspath(os.path.join(
     os.path.dirname(__file__), "..", "models"
@@ -53,7 +52,15 @@ def model_status():
     meta = safe_read_json(metadata_path(user_id))
     # inspect model files presence
     mdir = user_model_dir(user_id)
-    found = {"has_arima": False, "has_lstm": False, "categories": {}}
+    found = {"has_arima": False, "has_lstm": False, "categories": {}, "bundle": None}
+    header = read_header(bundle_path(user_id, MODELS_ROOT))
+    if header is not None:
+        found["bundle"] = {"version": header.get("version"), "created_at": header.get("created_at")}
+        for cat, cat_meta in header.get("categories", {}).items():
+            found["categories"][cat] = {
+                "arima_exists": bool(cat_meta.get("arima")),
+                "lstm_exists": bool(cat_meta.get("lstm")),
+            }
     if os.path.isdir(mdir):
         arima_dir = os.path.join(mdir, "category_arima")
         lstm_dir = os.path.join(mdir, "category_lstm")
@@ -86,24 +93,37 @@ def model_status():
         "logs": logs
     }), 200
 
-# ... (imports stay same)
-
 @bp.route("/list_users", methods=["GET"])
 def list_users():
+    """One page of users, ordered by id. Query params: limit (default
+    LIST_USERS_PAGE_SIZE, at most LIST_USERS_MAX_PAGE_SIZE) and cursor (the
+    previous page's next_cursor). next_cursor is null on the last page."""
+    try:
+        limit = int(request.args.get("limit", LIST_USERS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, LIST_USERS_MAX_PAGE_SIZE))
+    cursor = request.args.get("cursor")
+
     try:
-        users = []
         users_ref = db.collection("users")
-        docs = users_ref.stream()
+        query = users_ref.order_by("__name__").select(["displayName", "email"]).limit(limit)
+        if cursor:
+            query = query.start_after({"__name__": users_ref.document(cursor)})
+        docs = list(query.stream())
+
+        meta = get_index().get_many([d.id for d in docs])
+        users = []
         for d in docs:
             data = d.to_dict() or {}
-            meta = safe_read_json(metadata_path(d.id))
             users.append({
                 "user_id": d.id,
                 "displayName": data.get("displayName"),
                 "email": data.get("email"),
-                "last_trained": meta.get("last_trained")
+                "last_trained": meta.get(d.id, {}).get("last_trained")
             })
-        return jsonify({"users": users}), 200
+        next_cursor = docs[-1].id if len(docs) == limit else None
+        return jsonify({"users": users, "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -118,36 +138,23 @@ def retrain_user():
         return jsonify({"error": "user_id required"}), 400
 
     try:
-        script_path = os.path.abspath(os.path.join(
-            os.path.dirname(__file__), "..", "future_prediction", "train_forcaster.py"
-        ))
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        python_venv_path = r"C:\Users\Abid computers\Desktop\finance_manager_backend\venv\Scripts\python.exe"
+        queue = get_queue()
+        queue.start_workers()
+        job, created = queue.enqueue(user_id)
 
         if background:
-            subprocess.Popen(
-                [python_venv_path, script_path, user_id],
-                cwd=project_root,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            # update metadata immediately
-            with open(metadata_path(user_id), "w") as f:
-                json.dump({"last_trained": datetime.datetime.utcnow().isoformat()}, f)
-            return jsonify({"status": "training started (background)"}), 200
+            return jsonify({
+                "status": "training started (background)" if created else "already queued",
+                "job_id": job["id"]
+            }), 200
         else:
-            result = subprocess.run(
-                [python_venv_path, script_path, user_id],
-                cwd=project_root,
-                capture_output=True,
-                text=True
-            )
-            with open(metadata_path(user_id), "w") as f:
-                json.dump({"last_trained": datetime.datetime.utcnow().isoformat()}, f)
+            job = queue.wait(job["id"], timeout=RETRAIN_WAIT_TIMEOUT)
             return jsonify({
-                "status": "finished",
-                "stdout": result.stdout,
-                "stderr": result.stderr
+                "status": "finished" if job["status"] in ("done", "failed") else job["status"],
+                "job_id": job["id"],
+                "job_status": job["status"],
+                "stdout": job.get("output"),
+                "stderr": job.get("error")
             }), 200
 
     except Exception as e:
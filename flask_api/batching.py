@@ -0,0 +1,81 @@
+# batching.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collects concurrent single-item calls into one batched call.
+
+    `batch_fn` receives a list of items and must return a list of results in
+    the same order. A batch is flushed as soon as `max_batch_size` items are
+    waiting or `max_wait_ms` has passed since the first item arrived.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # threads do not survive fork(), so (re)start the worker per process
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, item) -> Future:
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError("batch_fn returned wrong number of results")
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+
+
+def length_buckets(lengths: list[int], batch_size: int) -> list[list[int]]:
+    """Group indices into batches of at most `batch_size`, sorted by length,
+    so that each batch only pads to a similar longest item."""
+    batch_size = max(1, int(batch_size))
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
@@ -0,0 +1,236 @@
+"""Pure budget logic behind /generate_budget (no Firestore, no Flask).
+
+Next-month category recommendations are linear-trend forecasts. Instead
+of one sklearn LinearRegression per category, every history of every user
+is padded into one matrix and the least-squares line is solved in closed
+form for all rows at once, so a whole fleet of users costs a few NumPy
+operations. Savings-goal allocation is greedy: each goal is capped by what
+earlier (more urgent) goals left of the safe saving limit, so it stays a
+short loop over a user's goals.
+"""
+from datetime import datetime
+
+import numpy as np
+
+ESSENTIAL_BUFFER_RATIO = 0.25  # Keep 25% for essentials
+SAFE_SAVING_RATIO = 0.4        # Max safe save % of income
+
+
+# ───── Trend forecasts ─────
+def trend_forecasts(histories: list[list[float]]) -> np.ndarray:
+    """Next value of each history from its least-squares line over
+    x = 0..n-1 (same as LinearRegression().fit(x, y).predict([[n]])),
+    clipped at 0 and rounded to 2 decimals. Histories of length 1 repeat
+    their value, empty ones give 0."""
+    count = len(histories)
+    lengths = np.fromiter((len(h) for h in histories), dtype=np.int64, count=count)
+    if count == 0:
+        return np.zeros(0)
+    width = max(int(lengths.max()), 1)
+
+    y = np.zeros((count, width))
+    mask = np.arange(width) < lengths[:, None]
+    y[mask] = np.fromiter((v for h in histories for v in h), dtype=float, count=int(lengths.sum()))
+
+    n = lengths.astype(float)
+    x = np.arange(width, dtype=float)
+    sum_x = n * (n - 1) / 2
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6
+    sum_y = y.sum(axis=1)
+    sum_xy = (y * x).sum(axis=1)
+
+    denom = n * sum_xx - sum_x ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (n * sum_xy - sum_x * sum_y) / denom, 0.0)
+        intercept = np.where(n > 0, (sum_y - slope * sum_x) / n, 0.0)
+    trend = np.round(np.maximum(intercept + slope * n, 0), 2)
+
+    last = y[np.arange(count), np.maximum(lengths - 1, 0)]
+    return np.where(lengths >= 2, trend, np.where(lengths == 1, np.round(last, 2), 0.0))
+
+
+def category_histories(records_data: list[dict]) -> dict:
+    """{category: [amount per month]} from month-sorted record dicts."""
+    cat_hist = {}
+    for r in records_data:
+        for cat, amt in r.get("categoryExpenses", {}).items():
+            cat_hist.setdefault(cat, []).append(amt)
+    return cat_hist
+
+
+def recommend_many(cat_hists: list[dict]) -> list[dict]:
+    """recommended_budget_next_month for many users in one vectorized pass."""
+    keys = [(i, cat) for i, hist in enumerate(cat_hists) for cat in hist]
+    preds = trend_forecasts([cat_hists[i][cat] for i, cat in keys])
+    out = [{} for _ in cat_hists]
+    for (i, cat), pred in zip(keys, preds.tolist()):
+        out[i][cat] = pred
+    return out
+
+
+# ───── Savings goals ─────
+def months_left_until(target_date, now: datetime) -> int:
+    months_left = 1
+    if target_date:
+        try:
+            dt = datetime.fromisoformat(target_date)
+            if dt.year == now.year and dt.month == now.month + 1:
+                months_left = 2
+            else:
+                months_left = max(
+                    1,
+                    (dt.year - now.year) * 12 + (dt.month - now.month) +
+                    (1 if dt.day > now.day else 0)
+                )
+        except (TypeError, ValueError):
+            pass
+    return months_left
+
+
+def allocate_goals(income: float, spent: float, savings_goals: dict, now: datetime):
+    """Returns (monthly_savings_plan, suggestions, income_left)."""
+    monthly_savings_plan = {}
+    suggestions = {}
+    income_left = max(income - spent, 0)
+
+    if not savings_goals:
+        suggestions["ℹ️ Savings"] = "You don’t have any savings goals yet. Add one to start tracking your progress!"
+        return monthly_savings_plan, suggestions, income_left
+
+    essential_buffer = ESSENTIAL_BUFFER_RATIO * income
+    available_this_month = max(income_left - essential_buffer, 0)
+    max_safe_save_month = income * SAFE_SAVING_RATIO
+
+    urgent_goals_this_month = []
+    processed_goals = []
+    for doc_id, goal in savings_goals.items():
+        target = goal.get("target_amount", 0)
+        saved = goal.get("amount_saved", 0)
+        processed_goals.append({
+            "id": doc_id,
+            "name": goal.get("goal_name", doc_id),
+            "saved": saved,
+            "remaining": max(target - saved, 0),
+            "months_left": months_left_until(goal.get("end_date"), now)
+        })
+
+    remaining_safe_saving = min(max_safe_save_month, available_this_month)
+    processed_goals.sort(key=lambda g: g["months_left"])
+
+    for g in processed_goals:
+        name = g["name"]
+        amount_remaining = g["remaining"]
+        saved = g["saved"]
+        months_left = g["months_left"]
+
+        already_saved_str = f"₹{saved:,.0f} already saved. " if saved > 0 else ""
+
+        if amount_remaining <= 0:
+            suggestions[f"✅ {name}"] = f"Goal '{name}' is already completed."
+            monthly_savings_plan[name] = 0
+            continue
+
+        if months_left == 1:
+            urgent_goals_this_month.append((name, amount_remaining))
+            alloc = min(amount_remaining, remaining_safe_saving)
+            if amount_remaining > income_left:
+                suggestions[f"⚠️ {name}"] = f"{already_saved_str}Goal '{name}' needs ₹{amount_remaining:,.0f} but only ₹{income_left:,.0f} left. Extend deadline or increase income."
+            elif amount_remaining <= alloc:
+                suggestions[f"🎯 {name}"] = f"{already_saved_str}Save ₹{amount_remaining:,.0f} now to complete goal '{name}' this month."
+            else:
+                suggestions[f"⚠️ {name}"] = f"{already_saved_str}Goal '{name}' requires more than safe saving limit. Save ₹{alloc:,.0f} now and extend deadline."
+            monthly_savings_plan[name] = round(alloc, 2)
+            remaining_safe_saving -= alloc
+
+        elif months_left == 2:
+            next_month_safe_limit = income * SAFE_SAVING_RATIO
+            half_now = min(amount_remaining / 2, remaining_safe_saving)
+            rest_next = amount_remaining - half_now
+
+            if rest_next <= next_month_safe_limit:
+                suggestions[f"📅 {name}"] = (
+                    f"{already_saved_str}Save ₹{half_now:,.0f} this month "
+                    f"and ₹{rest_next:,.0f} next month to complete goal '{name}'."
+                )
+            else:
+                suggestions[f"⚠️ {name}"] = (
+                    f"{already_saved_str}Even splitting for goal '{name}' is not safe — "
+                    f"next month's safe limit is ₹{next_month_safe_limit:,.0f}, "
+                    f"but you'd need ₹{rest_next:,.0f}. Extend deadline or increase income."
+                )
+                half_now = min(amount_remaining, remaining_safe_saving)
+
+            monthly_savings_plan[name] = round(half_now, 2)
+            remaining_safe_saving -= half_now
+
+        else:
+            monthly_needed = amount_remaining / months_left
+            alloc = min(monthly_needed, remaining_safe_saving)
+            if monthly_needed <= max_safe_save_month:
+                suggestions[f"📅 {name}"] = f"{already_saved_str}Save about ₹{monthly_needed:,.0f} per month for {months_left} months to complete goal '{name}'."
+            else:
+                suggestions[f"⚠️ {name}"] = f"{already_saved_str}Goal '{name}' needs ₹{monthly_needed:,.0f}/month which is above safe saving limit (₹{max_safe_save_month:,.0f}). Extend deadline."
+            monthly_savings_plan[name] = round(alloc, 2)
+            remaining_safe_saving -= alloc
+
+    if len(urgent_goals_this_month) > 1:
+        total_needed = sum(amt for _, amt in urgent_goals_this_month)
+        if total_needed > income_left:
+            goal_list = ", ".join([g for g, _ in urgent_goals_this_month])
+            suggestions["⚠️ Urgent Goals Conflict"] = (
+                f"You have multiple urgent goals this month ({goal_list}) totaling ₹{total_needed:,.0f}, "
+                f"but only ₹{income_left:,.0f} left. Complete one and extend the others."
+            )
+
+    return monthly_savings_plan, suggestions, income_left
+
+
+# ───── Budget ─────
+def assemble_budget(current_record: dict, savings_goals: dict, recommended: dict, now: datetime) -> dict:
+    """The /generate_budget response from the latest month's record, the
+    user's goals ({doc_id: goal}) and the recommended category budgets."""
+    income = current_record.get("totalIncome", 0)
+    spent = current_record.get("spentAmount", 0)
+    category_exp = current_record.get("categoryExpenses", {})
+
+    monthly_savings_plan, suggestions, income_left = allocate_goals(income, spent, savings_goals, now)
+
+    # ---------- Dynamic Expense Insights ----------
+    if category_exp:
+        top_categories = sorted(category_exp.items(), key=lambda x: x[1], reverse=True)
+        if top_categories:
+            top_text = ", ".join([f"{cat} (₹{amt:,.0f})" for cat, amt in top_categories[:2]])
+            suggestions["💡 Spending Insight"] = f"Your highest spending was in {top_text}. Consider reducing these next month."
+
+    # ---------- Alerts ----------
+    if spent >= income:
+        suggestions["🚨 Overspending"] = f"You’ve already spent ₹{spent:,.2f} of ₹{income:,.2f} this month."
+    if income > 0 and income_left / income < 0.10:
+        suggestions["⚠️ Low Balance"] = "Your remaining balance is very low. Avoid non-essential spending."
+
+    return {
+        "recommended_budget_next_month": recommended,
+        "suggestions": suggestions,
+        "total_income": income,
+        "spent": spent,
+        "income_left": income_left,
+        "savings_goals": monthly_savings_plan,
+        "leftover_budget_after_savings": round(income_left - sum(monthly_savings_plan.values()), 2),
+    }
+
+
+def generate_budgets(users: dict, now: datetime | None = None) -> dict:
+    """Budgets for many users at once.
+
+    users: {user_id: {"records": [record dicts with "month"], "goals": {doc_id: goal}}}
+    Returns {user_id: budget}, or {user_id: None} for users without records.
+    """
+    now = now or datetime.now()
+    ids = [uid for uid, data in users.items() if data.get("records")]
+    sorted_records = {uid: sorted(users[uid]["records"], key=lambda r: r["month"]) for uid in ids}
+    recommended = recommend_many([category_histories(sorted_records[uid]) for uid in ids])
+
+    out = {uid: None for uid in users}
+    for uid, rec in zip(ids, recommended):
+        out[uid] = assemble_budget(sorted_records[uid][-1], users[uid].get("goals") or {}, rec, now)
+    return out
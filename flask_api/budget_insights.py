@@ -1,201 +1,104 @@
 from flask import Blueprint, request, jsonify
-from firebase_admin import firestore
-from sklearn.linear_model import LinearRegression
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import firebase_admin
+import asyncio
+import os
 
-if not firebase_admin._apps:
-    raise RuntimeError("Firebase app not initialized.")
+from budget_engine import generate_budgets
+from future_prediction.datastore import get_db, get_async_db, DESCENDING
+from future_prediction.records_mirror import RECORDS_SOURCE, get_mirror
 
-db = firestore.client()
+db = get_db()
 bp = Blueprint('budget', __name__)
 
+BUDGET_BATCH_MAX_USERS = int(os.environ.get("BUDGET_BATCH_MAX_USERS", 1000))
+BUDGET_BATCH_FETCH_THREADS = int(os.environ.get("BUDGET_BATCH_FETCH_THREADS", 8))
+# trailing months read per user for the trends (0 = whole history)
+BUDGET_HISTORY_MONTHS = int(os.environ.get("BUDGET_HISTORY_MONTHS", 24))
+
+RECORD_FIELDS = ["totalIncome", "spentAmount", "categoryExpenses"]
+GOAL_FIELDS = ["goal_name", "target_amount", "amount_saved", "end_date"]
+
+
+def fetch_budget_inputs(user_id: str) -> dict:
+    """The user's latest BUDGET_HISTORY_MONTHS monthly records (month ids are
+    YYYY-MM, so ordering by document id is chronological) and savings goals,
+    reading only the fields the budget uses."""
+    user_ref = db.collection("users").document(user_id)
+    query = user_ref.collection("records").select(RECORD_FIELDS)
+    if BUDGET_HISTORY_MONTHS > 0:
+        query = query.order_by("__name__", direction=DESCENDING).limit(BUDGET_HISTORY_MONTHS)
+    records = [r.to_dict() | {"month": r.id} for r in query.stream()]
+    return {"records": records, "goals": _fetch_goals(user_id)}
+
+
+def _fetch_goals(user_id: str) -> dict:
+    goals_ref = db.collection("users").document(user_id).collection("savings_goals")
+    return {doc.id: doc.to_dict() for doc in goals_ref.select(GOAL_FIELDS).stream()}
+
+
+async def fetch_budget_inputs_async(user_id: str) -> dict:
+    """fetch_budget_inputs on the async client, reading records and goals concurrently."""
+    user_ref = get_async_db().collection("users").document(user_id)
+    query = user_ref.collection("records").select(RECORD_FIELDS)
+    if BUDGET_HISTORY_MONTHS > 0:
+        query = query.order_by("__name__", direction=DESCENDING).limit(BUDGET_HISTORY_MONTHS)
+
+    async def records():
+        return [r.to_dict() | {"month": r.id} async for r in query.stream()]
+
+    goals_query = user_ref.collection("savings_goals").select(GOAL_FIELDS)
+
+    async def goals():
+        return {doc.id: doc.to_dict() async for doc in goals_query.stream()}
+
+    records, goals = await asyncio.gather(records(), goals())
+    return {"records": records, "goals": goals}
+
+
+def fetch_many_budget_inputs(user_ids: list[str]) -> dict:
+    """Batch inputs. With RECORDS_SOURCE=mirror the records come from the
+    local records mirror in one query and only goals are read from Firestore."""
+    with ThreadPoolExecutor(max_workers=BUDGET_BATCH_FETCH_THREADS) as pool:
+        if RECORDS_SOURCE != "mirror":
+            return dict(zip(user_ids, pool.map(fetch_budget_inputs, user_ids)))
+        records = get_mirror().budget_records(user_ids, BUDGET_HISTORY_MONTHS)
+        goals = dict(zip(user_ids, pool.map(_fetch_goals, user_ids)))
+    return {uid: {"records": records[uid], "goals": goals[uid]} for uid in user_ids}
+
+
 @bp.route("/generate_budget", methods=["GET"])
 def generate_budget():
     user_id = request.args.get("user_id")
     if not user_id:
         return jsonify({"error": "user_id required"}), 400
 
-    user_ref = db.collection("users").document(user_id)
-    records_ref = user_ref.collection("records")
-    records = list(records_ref.stream())
-    if not records:
+    budget = generate_budgets({user_id: fetch_budget_inputs(user_id)}, datetime.now())[user_id]
+    if budget is None:
         return jsonify({"error": "No financial records found"}), 404
-
-    # Sort and get latest month
-    records_data = [r.to_dict() | {"month": r.id} for r in records]
-    records_data.sort(key=lambda r: r["month"])
-    latest_month = records_data[-1]["month"]
-    current_record = records_ref.document(latest_month).get().to_dict()
-
-    income = current_record.get("totalIncome", 0)
-    spent = current_record.get("spentAmount", 0)
-    category_exp = current_record.get("categoryExpenses", {})
-
-    now = datetime.now()
-    goals_ref = user_ref.collection("savings_goals")
-    goals = list(goals_ref.stream())
-
-    # Initialize containers
-    savings_goals = {}
-    monthly_savings_plan = {}
-    suggestions = {}
-
-    # ---------- Savings Goals Handling ----------
-    if goals:
-        savings_goals = {doc.id: doc.to_dict() for doc in goals}
-        income_left = max(income - spent, 0)
-
-        # Safe saving parameters
-        ESSENTIAL_BUFFER_RATIO = 0.25  # Keep 25% for essentials
-        SAFE_SAVING_RATIO = 0.4        # Max safe save % of income
-
-        essential_buffer = ESSENTIAL_BUFFER_RATIO * income
-        available_this_month = max(income_left - essential_buffer, 0)
-        max_safe_save_month = income * SAFE_SAVING_RATIO
-
-        urgent_goals_this_month = []
-        processed_goals = []
-        for doc_id, goal in savings_goals.items():
-            name = goal.get("goal_name", doc_id)
-            target = goal.get("target_amount", 0)
-            saved = goal.get("amount_saved", 0)
-            target_date = goal.get("end_date")
-            amount_remaining = max(target - saved, 0)
-
-            months_left = 1
-            if target_date:
-                try:
-                    dt = datetime.fromisoformat(target_date)
-                    if dt.year == now.year and dt.month == now.month + 1:
-                        months_left = 2
-                    else:
-                        months_left = max(
-                            1,
-                            (dt.year - now.year) * 12 + (dt.month - now.month) +
-                            (1 if dt.day > now.day else 0)
-                        )
-                except:
-                    pass
-
-            processed_goals.append({
-                "id": doc_id,
-                "name": name,
-                "saved": saved,
-                "remaining": amount_remaining,
-                "months_left": months_left
-            })
-
-        remaining_safe_saving = min(max_safe_save_month, available_this_month)
-        processed_goals.sort(key=lambda g: g["months_left"])
-
-        for g in processed_goals:
-            name = g["name"]
-            amount_remaining = g["remaining"]
-            saved = g["saved"]
-            months_left = g["months_left"]
-
-            already_saved_str = f"₹{saved:,.0f} already saved. " if saved > 0 else ""
-
-            if amount_remaining <= 0:
-                suggestions[f"✅ {name}"] = f"Goal '{name}' is already completed."
-                monthly_savings_plan[name] = 0
-                continue
-
-            if months_left == 1:
-                urgent_goals_this_month.append((name, amount_remaining))
-                alloc = min(amount_remaining, remaining_safe_saving)
-                if amount_remaining > income_left:
-                    suggestions[f"⚠️ {name}"] = f"{already_saved_str}Goal '{name}' needs ₹{amount_remaining:,.0f} but only ₹{income_left:,.0f} left. Extend deadline or increase income."
-                elif amount_remaining <= alloc:
-                    suggestions[f"🎯 {name}"] = f"{already_saved_str}Save ₹{amount_remaining:,.0f} now to complete goal '{name}' this month."
-                else:
-                    suggestions[f"⚠️ {name}"] = f"{already_saved_str}Goal '{name}' requires more than safe saving limit. Save ₹{alloc:,.0f} now and extend deadline."
-                monthly_savings_plan[name] = round(alloc, 2)
-                remaining_safe_saving -= alloc
-
-            elif months_left == 2:
-                next_month_safe_limit = income * SAFE_SAVING_RATIO
-                half_now = min(amount_remaining / 2, remaining_safe_saving)
-                rest_next = amount_remaining - half_now
-
-                if rest_next <= next_month_safe_limit:
-                    suggestions[f"📅 {name}"] = (
-                        f"{already_saved_str}Save ₹{half_now:,.0f} this month "
-                        f"and ₹{rest_next:,.0f} next month to complete goal '{name}'."
-                    )
-                else:
-                    suggestions[f"⚠️ {name}"] = (
-                        f"{already_saved_str}Even splitting for goal '{name}' is not safe — "
-                        f"next month's safe limit is ₹{next_month_safe_limit:,.0f}, "
-                        f"but you'd need ₹{rest_next:,.0f}. Extend deadline or increase income."
-                    )
-                    half_now = min(amount_remaining, remaining_safe_saving)
-
-                monthly_savings_plan[name] = round(half_now, 2)
-                remaining_safe_saving -= half_now
-
-            else:
-                monthly_needed = amount_remaining / months_left
-                alloc = min(monthly_needed, remaining_safe_saving)
-                if monthly_needed <= max_safe_save_month:
-                    suggestions[f"📅 {name}"] = f"{already_saved_str}Save about ₹{monthly_needed:,.0f} per month for {months_left} months to complete goal '{name}'."
-                else:
-                    suggestions[f"⚠️ {name}"] = f"{already_saved_str}Goal '{name}' needs ₹{monthly_needed:,.0f}/month which is above safe saving limit (₹{max_safe_save_month:,.0f}). Extend deadline."
-                monthly_savings_plan[name] = round(alloc, 2)
-                remaining_safe_saving -= alloc
-
-        if len(urgent_goals_this_month) > 1:
-            total_needed = sum(amt for _, amt in urgent_goals_this_month)
-            if total_needed > income_left:
-                goal_list = ", ".join([g for g, _ in urgent_goals_this_month])
-                suggestions["⚠️ Urgent Goals Conflict"] = (
-                    f"You have multiple urgent goals this month ({goal_list}) totaling ₹{total_needed:,.0f}, "
-                    f"but only ₹{income_left:,.0f} left. Complete one and extend the others."
-                )
-
-    else:
-        # No savings goals: still return budget insights
-        income_left = max(income - spent, 0)
-        suggestions["ℹ️ Savings"] = "You don’t have any savings goals yet. Add one to start tracking your progress!"
-
-    # ---------- Predict Next Month’s Expenses ----------
-    cat_hist = {}
-    for r in records_data:
-        for cat, amt in r.get("categoryExpenses", {}).items():
-            cat_hist.setdefault(cat, []).append(amt)
-
-    recommended = {}
-    for cat, history in cat_hist.items():
-        if len(history) >= 2:
-            X = np.arange(len(history)).reshape(-1, 1)
-            y = np.array(history)
-            model = LinearRegression().fit(X, y)
-            predicted = round(max(model.predict([[len(history)]])[0], 0), 2)
-        else:
-            predicted = round(history[-1], 2) if history else 0
-        recommended[cat] = predicted
-
-    # ---------- Dynamic Expense Insights ----------
-    if category_exp:
-        top_categories = sorted(category_exp.items(), key=lambda x: x[1], reverse=True)
-        if top_categories:
-            top_text = ", ".join([f"{cat} (₹{amt:,.0f})" for cat, amt in top_categories[:2]])
-            suggestions["💡 Spending Insight"] = f"Your highest spending was in {top_text}. Consider reducing these next month."
-
-    # ---------- Alerts ----------
-    if spent >= income:
-        suggestions["🚨 Overspending"] = f"You’ve already spent ₹{spent:,.2f} of ₹{income:,.2f} this month."
-    if income > 0 and income_left / income < 0.10:
-        suggestions["⚠️ Low Balance"] = "Your remaining balance is very low. Avoid non-essential spending."
-
-    return jsonify({
-        "recommended_budget_next_month": recommended,
-        "suggestions": suggestions,
-        "total_income": income,
-        "spent": spent,
-        "income_left": income_left,
-        "savings_goals": monthly_savings_plan,
-        "leftover_budget_after_savings": round(income_left - sum(monthly_savings_plan.values()), 2),
-    })
+    return jsonify(budget)
+
+
+@bp.route("/generate_budgets", methods=["POST"])
+def generate_budgets_batch():
+    """Budgets for many users in one call. Body: {"user_ids": [...]}
+
+    Inputs are fetched concurrently and all users' category trends are
+    fitted in one vectorized pass.
+    """
+    body = request.get_json(silent=True)
+    user_ids = body.get("user_ids") if isinstance(body, dict) else None
+    if not isinstance(user_ids, list) or not user_ids:
+        return jsonify({"error": "user_ids must be a non-empty list"}), 400
+    if not all(isinstance(uid, str) and uid for uid in user_ids):
+        return jsonify({"error": "every user_id must be a non-empty string"}), 400
+    if len(user_ids) > BUDGET_BATCH_MAX_USERS:
+        return jsonify({"error": f"at most {BUDGET_BATCH_MAX_USERS} users per call"}), 413
+
+    user_ids = list(dict.fromkeys(user_ids))
+    budgets = generate_budgets(fetch_many_budget_inputs(user_ids), datetime.now())
+    results = {
+        uid: budget if budget is not None else {"error": "No financial records found"}
+        for uid, budget in budgets.items()
+    }
+    return jsonify({"results": results}), 200
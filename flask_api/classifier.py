@@ -0,0 +1,211 @@
+# classifier.py
+"""DistilBERT expense classifier, loaded lazily and off the startup path.
+
+Importing this module is cheap: torch / transformers are only imported by
+load(). The tokenizer and model config are read from SAVED_MODELS_DIR/
+distilbert-base-uncased (see scripts/export_classifier_artifacts.py), so
+no hub access is needed at runtime.
+"""
+import os
+import pickle
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAVED_MODELS_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "saved_models"))
+CATEGORY_MAP_PATH = os.path.join(SAVED_MODELS_DIR, "category_map.pkl")
+MODEL_PATH = os.path.join(SAVED_MODELS_DIR, "distilbert_model.pth")
+PRETRAINED_NAME = "distilbert-base-uncased"
+LOCAL_ARTIFACTS_DIR = os.environ.get(
+    "CLASSIFIER_ARTIFACTS_DIR", os.path.join(SAVED_MODELS_DIR, PRETRAINED_NAME)
+)
+
+# CLASSIFIER_BACKEND=onnx serves an int8-quantized ONNX export through ONNX Runtime
+# (exported from the eager model on first load if the .onnx file is missing).
+CLASSIFIER_BACKEND = os.environ.get("CLASSIFIER_BACKEND", "torch").lower()
+
+CONFIDENCE_THRESHOLD = 0.4
+MAX_TOKENS = 64  # match training
+
+# populated by load()
+model = None
+tokenizer = None
+onnx_classifier = None
+device = None
+category_map = None
+reverse_category_map = None
+
+_load_lock = threading.Lock()
+_ready = threading.Event()
+_load_error = None
+_load_seconds = None
+_loader_thread = None
+
+
+def _artifact_source() -> str:
+    if os.path.isfile(os.path.join(LOCAL_ARTIFACTS_DIR, "config.json")):
+        return LOCAL_ARTIFACTS_DIR
+    print(f"⚠️ {LOCAL_ARTIFACTS_DIR} not found, falling back to the hub for {PRETRAINED_NAME}. "
+          f"Run scripts/export_classifier_artifacts.py once to load offline.")
+    return PRETRAINED_NAME
+
+
+def load_category_map() -> dict:
+    with open(CATEGORY_MAP_PATH, "rb") as f:
+        return pickle.load(f)
+
+
+def load_tokenizer():
+    from transformers import DistilBertTokenizerFast
+    return DistilBertTokenizerFast.from_pretrained(_artifact_source())
+
+
+def load_torch_model(num_labels: int, map_location="cpu"):
+    """Build the classifier from the local config and load the fine-tuned weights.
+
+    The architecture is instantiated from config only, so the pretrained
+    base weights are never downloaded or loaded just to be overwritten.
+    """
+    import torch
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+    config = DistilBertConfig.from_pretrained(_artifact_source(), num_labels=num_labels)
+    net = DistilBertForSequenceClassification(config)
+    net.load_state_dict(torch.load(MODEL_PATH, map_location=map_location))
+    return net.eval()
+
+
+def load():
+    """Load tokenizer, category map and model. Safe to call from many threads."""
+    global model, tokenizer, onnx_classifier, device, category_map, reverse_category_map
+    global _load_error, _load_seconds
+    if _ready.is_set():
+        return
+    with _load_lock:
+        if _ready.is_set():
+            return
+        t0 = time.perf_counter()
+        try:
+            category_map = load_category_map()
+            reverse_category_map = {v: k for k, v in category_map.items()}
+            tokenizer = load_tokenizer()
+
+            if CLASSIFIER_BACKEND == "onnx":
+                from onnx_backend import OnnxClassifier, export_quantized_onnx, ONNX_MODEL_PATH
+                if not os.path.exists(ONNX_MODEL_PATH):
+                    export_quantized_onnx(load_torch_model(len(category_map)), ONNX_MODEL_PATH)
+                onnx_classifier = OnnxClassifier(ONNX_MODEL_PATH)
+            elif CLASSIFIER_BACKEND == "torch":
+                import torch
+                device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+                model = load_torch_model(len(category_map), map_location=device).to(device)
+            else:
+                raise RuntimeError(f"Unknown CLASSIFIER_BACKEND: {CLASSIFIER_BACKEND}")
+
+            # one tiny forward pass so the first real request doesn't pay for lazy init
+            _classify_loaded(["warmup"])
+        except Exception as e:
+            _load_error = e
+            print(f"[ERROR] Classifier load failed: {e}")
+            raise
+        _load_error = None
+        _load_seconds = round(time.perf_counter() - t0, 2)
+        _ready.set()
+        print(f"Classifier ready ({CLASSIFIER_BACKEND}) in {_load_seconds}s")
+
+
+def start_background_load():
+    """Warm the classifier in a daemon thread; returns immediately."""
+    global _loader_thread
+    if _ready.is_set() or (_loader_thread is not None and _loader_thread.is_alive()):
+        return
+
+    def _run():
+        try:
+            load()
+        except Exception:
+            pass  # recorded in _load_error and reported by status()
+
+    _loader_thread = threading.Thread(target=_run, name="classifier-loader", daemon=True)
+    _loader_thread.start()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def ensure_loaded(timeout: float | None = None) -> bool:
+    """Block until loaded (starting the load if nobody has). False on timeout."""
+    if _ready.is_set():
+        return True
+    if _load_error is not None:
+        raise RuntimeError(f"Classifier failed to load: {_load_error}")
+    if timeout is None:
+        load()
+        return True
+    start_background_load()
+    return _ready.wait(timeout)
+
+
+def status() -> dict:
+    if _ready.is_set():
+        return {"status": "ready", "backend": CLASSIFIER_BACKEND, "load_seconds": _load_seconds}
+    if _load_error is not None:
+        return {"status": "error", "backend": CLASSIFIER_BACKEND, "error": str(_load_error)}
+    loading = _loader_thread is not None and _loader_thread.is_alive()
+    return {"status": "loading" if loading else "not_loaded", "backend": CLASSIFIER_BACKEND}
+
+
+def watched_files() -> list[str]:
+    """Files whose change should invalidate cached predictions."""
+    files = [MODEL_PATH, CATEGORY_MAP_PATH]
+    if CLASSIFIER_BACKEND == "onnx":
+        from onnx_backend import ONNX_MODEL_PATH
+        files.append(ONNX_MODEL_PATH)
+    return files
+
+
+def classify_batch(texts: list[str], batch_size: int | None = None) -> list[tuple[str, float]]:
+    """Classify (already lowercased) expense texts, returning results in input order.
+
+    Texts are sorted into buckets of similar token length and each bucket is
+    padded only to its own longest item.
+    """
+    ensure_loaded()
+    return _classify_loaded(texts, batch_size)
+
+
+def _classify_loaded(texts, batch_size=None):
+    from batching import length_buckets
+
+    input_ids = tokenizer(texts, truncation=True, max_length=MAX_TOKENS)["input_ids"]
+    results = [None] * len(texts)
+
+    for bucket in length_buckets([len(ids) for ids in input_ids], batch_size or len(texts)):
+        if onnx_classifier is not None:
+            from onnx_backend import softmax
+            encoding = tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in bucket]},
+                padding="longest",
+                return_tensors="np"
+            )
+            probs = softmax(onnx_classifier.logits(encoding["input_ids"], encoding["attention_mask"]))
+            labels, confidences = probs.argmax(axis=1), probs.max(axis=1)
+        else:
+            import torch
+            encoding = tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in bucket]},
+                padding="longest",
+                return_tensors="pt"
+            )
+            encoding = {k: v.to(device) for k, v in encoding.items()}
+
+            with torch.no_grad():
+                outputs = model(**encoding)
+                probs = torch.nn.functional.softmax(outputs.logits, dim=1)
+                confidences, labels = probs.max(dim=1)
+
+        for i, label, confidence in zip(bucket, labels.tolist(), confidences.tolist()):
+            category = reverse_category_map.get(label, "unknown") if confidence >= CONFIDENCE_THRESHOLD else "unknown"
+            results[i] = (category, confidence)
+    return results
@@ -2,14 +2,9 @@ from flask import Flask, request, jsonify
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import torch
-from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
-import pickle
-from firebase_admin import credentials, initialize_app, firestore
 import requests
 from dotenv import load_dotenv
 from datetime import datetime
-import subprocess
 
 # Load environment variables
 load_dotenv()
@@ -17,13 +12,10 @@ load_dotenv()
 app = Flask(__name__)
 
 # ───── Firebase Initialization ─────
-firebase_key_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-if not firebase_key_path or not os.path.exists(firebase_key_path):
-    raise RuntimeError("Firebase key not found or invalid path.")
+# DATASTORE=fake swaps in the in-memory Firestore (see future_prediction/datastore.py)
+from future_prediction.datastore import get_db
 
-cred = credentials.Certificate(firebase_key_path)
-initialize_app(cred)
-db = firestore.client()
+db = get_db()
 
 from budget_insights import bp as budget_bp
 app.register_blueprint(budget_bp)
@@ -31,25 +23,91 @@ from admin_monitor import bp as admin_bp
 app.register_blueprint(admin_bp)
 
 # ───── Category Classifier (DistilBERT) ─────
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CATEGORY_MAP_PATH = os.path.join(BASE_DIR, "..", "saved_models", "category_map.pkl")
-MODEL_PATH = os.path.join(BASE_DIR, "..", "saved_models", "distilbert_model.pth")
-
-with open(CATEGORY_MAP_PATH, "rb") as f:
-    category_map = pickle.load(f)
-reverse_category_map = {v: k for k, v in category_map.items()}
-
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# torch/transformers are imported and the model is loaded by classifier.load(),
+# not at import time. CLASSIFIER_WARMUP controls when that happens:
+#   background (default) - warm in a daemon thread right after startup
+#   lazy                 - on the first categorization request or the first
+#                          /ready probe, whichever comes first (so a pod behind
+#                          a readiness probe still warms up)
+#   eager                - synchronously, before the app serves anything
+import classifier
+from batching import MicroBatcher
+
+CLASSIFIER_WARMUP = os.environ.get("CLASSIFIER_WARMUP", "background").lower()
+CLASSIFIER_READY_TIMEOUT = float(os.environ.get("CLASSIFIER_READY_TIMEOUT", 2))
+
+if CLASSIFIER_WARMUP == "eager":
+    classifier.load()
+elif CLASSIFIER_WARMUP == "background":
+    classifier.start_background_load()
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 once the classifier can serve requests.
+
+    Starts the load if nothing has yet (CLASSIFIER_WARMUP=lazy)."""
+    status = classifier.status()
+    if status["status"] == "not_loaded":
+        classifier.start_background_load()
+        status = classifier.status()
+    code = 200 if status["status"] == "ready" else 500 if status["status"] == "error" else 503
+    return jsonify(status), code
+
+def classifier_unavailable():
+    """Returns a 503 response while the model is still warming, else None."""
+    try:
+        if classifier.ensure_loaded(timeout=CLASSIFIER_READY_TIMEOUT):
+            return None
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"status": "model_loading"}), 503, {"Retry-After": "5"}
+
+# ───── Micro-batching ─────
+# Concurrent /categorize_expense calls are merged into a single forward pass.
+# CLASSIFIER_MAX_BATCH=1 disables batching.
+classifier_batcher = MicroBatcher(
+    classifier.classify_batch,
+    max_batch_size=int(os.environ.get("CLASSIFIER_MAX_BATCH", 16)),
+    max_wait_ms=float(os.environ.get("CLASSIFIER_MAX_WAIT_MS", 5)),
+)
 
-model = DistilBertForSequenceClassification.from_pretrained(
-    "distilbert-base-uncased",
-    num_labels=len(category_map)
+# ───── Result cache ─────
+# Keyed on normalized text; cleared whenever the model or category map file
+# changes on disk. The loaded model is not reloaded, so restart the process to
+# serve a new one.
+# CLASSIFIER_CACHE_SIZE=0 disables it, CLASSIFIER_CACHE_TTL is in seconds.
+from result_cache import ClassificationCache, normalize_expense_text
+
+classifier_cache = ClassificationCache(
+    maxsize=int(os.environ.get("CLASSIFIER_CACHE_SIZE", 10_000)),
+    ttl=float(os.environ.get("CLASSIFIER_CACHE_TTL", 0)) or None,
+    watched_files=classifier.watched_files(),
 )
-model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
-model.to(device)
-model.eval()
 
-tokenizer = DistilBertTokenizerFast.from_pretrained("distilbert-base-uncased")
+def classify_cached(texts: list[str], batch_size: int | None = None) -> list[tuple[str, float]]:
+    """Cache-aware classify_batch; only unseen texts reach the model."""
+    keys = [normalize_expense_text(t) for t in texts]
+    found = {}
+    for key in keys:
+        if key not in found:
+            hit = classifier_cache.get(key)
+            if hit is not None:
+                found[key] = hit
+
+    missing = [k for k in dict.fromkeys(keys) if k not in found]
+    if missing:
+        if len(missing) == 1 and batch_size is None:
+            fresh = [classifier_batcher(missing[0])]
+        else:
+            fresh = classifier.classify_batch(missing, batch_size=batch_size)
+        for key, res in zip(missing, fresh):
+            classifier_cache.put(key, res)
+            found[key] = res
+    return [found[k] for k in keys]
+
+@app.route("/classifier_cache_stats", methods=["GET"])
+def classifier_cache_stats():
+    return jsonify(classifier_cache.stats())
 
 @app.route("/categorize_expense", methods=["POST"])
 def categorize_expense():
@@ -58,23 +116,12 @@ def categorize_expense():
     if not expense_text:
         return jsonify({"error": "Expense text is required"}), 400
 
-    expense_text = expense_text.lower()
-    encoding = tokenizer(
-        expense_text,
-        padding="max_length",
-        truncation=True,
-        max_length=64,  # match training
-        return_tensors="pt"
-    )
-    encoding = {k: v.to(device) for k, v in encoding.items()}
-
-    with torch.no_grad():
-        outputs = model(**encoding)
-        probs = torch.nn.functional.softmax(outputs.logits, dim=1)
-        predicted_label = torch.argmax(probs).item()
-        confidence = probs[0, predicted_label].item()
+    unavailable = classifier_unavailable()
+    if unavailable:
+        return unavailable
 
-    category = reverse_category_map.get(predicted_label, "unknown") if confidence >= 0.4 else "unknown"
+    expense_text = expense_text.lower()
+    category, confidence = classify_cached([expense_text])[0]
 
     return jsonify({
         "expense": expense_text,
@@ -82,6 +129,78 @@ def categorize_expense():
         "confidence": round(confidence, 2)
     })
 
+BULK_MAX_ITEMS = int(os.environ.get("CATEGORIZE_BULK_MAX_ITEMS", 1000))
+BULK_BATCH_SIZE = int(os.environ.get("CATEGORIZE_BULK_BATCH_SIZE", 32))
+
+@app.route("/categorize_expenses", methods=["POST"])
+def categorize_expenses():
+    """Bulk version of /categorize_expense. Body: {"expenses": ["...", ...]}"""
+    data = request.json or {}
+    expenses = data.get("expenses")
+    if not isinstance(expenses, list) or not expenses:
+        return jsonify({"error": "expenses must be a non-empty list"}), 400
+    if len(expenses) > BULK_MAX_ITEMS:
+        return jsonify({"error": f"at most {BULK_MAX_ITEMS} expenses per call"}), 413
+
+    results = [None] * len(expenses)
+    valid_idx, valid_texts = [], []
+    for i, text in enumerate(expenses):
+        if isinstance(text, str) and text.strip():
+            valid_idx.append(i)
+            valid_texts.append(text.lower())
+        else:
+            results[i] = {"expense": text, "error": "Expense text is required"}
+
+    if valid_texts:
+        unavailable = classifier_unavailable()
+        if unavailable:
+            return unavailable
+        for i, text, (category, confidence) in zip(
+            valid_idx, valid_texts, classify_cached(valid_texts, batch_size=BULK_BATCH_SIZE)
+        ):
+            results[i] = {
+                "expense": text,
+                "category": category,
+                "confidence": round(confidence, 2)
+            }
+
+    return jsonify({"results": results})
+
+# ───── Forecast dispatch ─────
+# By default the prediction service runs in this process. When it is deployed
+# as its own service (render.yaml), PREDICT_API_HOSTPORT points at it instead.
+# Either way, concurrent requests for the same user share one computation.
+from future_prediction.coalesce import SingleFlight
+
+PREDICT_API_HOSTPORT = os.environ.get("PREDICT_API_HOSTPORT")
+PREDICT_API_TIMEOUT = float(os.environ.get("PREDICT_API_TIMEOUT", 60))
+_remote_predict_flight = SingleFlight()
+
+def _fetch_remote_prediction(user_id: str) -> dict:
+    response = requests.get(
+        f"http://{PREDICT_API_HOSTPORT}/predict",
+        params={"user_id": user_id},
+        timeout=PREDICT_API_TIMEOUT
+    )
+    return response.json()
+
+def fetch_prediction(user_id: str) -> dict:
+    if PREDICT_API_HOSTPORT:
+        return _remote_predict_flight.do(user_id, _fetch_remote_prediction, user_id)
+    from future_prediction.predict_api import predict_user
+    result, _ = predict_user(user_id)
+    return result
+
+def prediction_response(result: dict) -> tuple[dict, int]:
+    """(payload, http_status) for /predict_future_expense from a /predict result."""
+    if "categoryExpenses" not in result or not result["categoryExpenses"]:
+        if result.get("status") == "not_enough_data":
+            return {"status": "not_enough_data"}, 422
+        if result.get("status") == "model_pending":
+            return {"status": "model_pending"}, 202
+        return {"status": "unknown_error"}, 500
+    return result, 200
+
 @app.route("/predict_future_expense", methods=["GET"])
 def predict_future_expense():
     user_id = request.args.get("user_id")
@@ -89,26 +208,21 @@ def predict_future_expense():
         return jsonify({"error": "user_id is required"}), 400
 
     try:
-        response = requests.get(
-            "http://127.0.0.1:7860/predict",   # <-- use LAN IP, not localhost
-            params={"user_id": user_id},
-            timeout=60                           # <-- give more time
-        )
-        result = response.json()
-
-        if "categoryExpenses" not in result or not result["categoryExpenses"]:
-            if result.get("status") == "not_enough_data":
-                return jsonify({"status": "not_enough_data"}), 422
-            if result.get("status") == "model_pending":
-                return jsonify({"status": "model_pending"}), 202
-            return jsonify({"status": "unknown_error"}), 500
-
-        return jsonify(result), 200
+        payload, status = prediction_response(fetch_prediction(user_id))
+        return jsonify(payload), status
 
     except Exception as e:
-        print(f"[ERROR] Proxy to /predict failed: {e}")  # <-- log real error
+        print(f"[ERROR] Prediction for {user_id} failed: {e}")  # <-- log real error
         return jsonify({"error": str(e)}), 500
 
+# ───── Training queue ─────
+# Training runs through a persistent job queue with a fixed-size worker pool
+# (TRAINING_WORKERS, 0 = only enqueue and let a dedicated worker process run them).
+from future_prediction.training_queue import get_queue
+
+training_queue = get_queue()
+training_queue.start_workers()
+
 @app.route("/train_user_models", methods=["POST"])
 def train_user_models():
     data = request.json
@@ -117,33 +231,38 @@ def train_user_models():
         return jsonify({"error": "user_id is required"}), 400
 
     try:
-        script_path = os.path.abspath(os.path.join(
-            os.path.dirname(__file__), "..", "future_prediction", "train_forcaster.py"
-        ))
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-
-        # 🔹 Always use venv python
-        python_venv_path = r"C:\Users\Abid computers\Desktop\finance_manager_backend\venv\Scripts\python.exe"
-
-        # 1. Run script once synchronously to check retraining status
-        check_cmd = [python_venv_path, script_path, user_id]
-        result = subprocess.run(check_cmd, cwd=project_root, capture_output=True, text=True)
-
-        if "already up to date" in result.stdout:
-            return jsonify({"status": "up_to_date"}), 200
-
-        # 2. Otherwise, spawn training async in background
-        subprocess.Popen(
-            [python_venv_path, script_path, user_id],
-            cwd=project_root,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        return jsonify({"status": "training started"}), 200
+        training_queue.start_workers()
+        job, created = training_queue.enqueue(user_id)
+        return jsonify({
+            "status": "training started" if created else "already queued",
+            "job_id": job["id"],
+            "job_status": job["status"]
+        }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/training_jobs/<int:job_id>", methods=["GET"])
+def training_job_status(job_id):
+    job = training_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job), 200
+
+@app.route("/training_jobs", methods=["GET"])
+def list_training_jobs():
+    """Query params: user_id, status, limit (all optional)"""
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    jobs = training_queue.list(
+        user_id=request.args.get("user_id"),
+        status=request.args.get("status"),
+        limit=max(1, min(limit, 500))
+    )
+    return jsonify({"jobs": jobs}), 200
+
 
 
 
@@ -161,7 +280,9 @@ def track_goal_progress():
     if not goal.exists:
         return jsonify({"error": "Goal not found"}), 404
 
-    goal_data = goal.to_dict()
+    return jsonify(goal_progress(goal.to_dict()))
+
+def goal_progress(goal_data: dict) -> dict:
     target_amount = goal_data.get("target_amount", 0)
     amount_saved = goal_data.get("amount_saved", 0)
     progress_percentage = (amount_saved / target_amount) * 100 if target_amount else 0
@@ -175,13 +296,13 @@ def track_goal_progress():
     else:
         suggestion = "🔵 You can do it! Stay focused and save regularly."
 
-    return jsonify({
+    return {
         "goal_name": goal_data.get("goal_name"),
         "target_amount": target_amount,
         "amount_saved": amount_saved,
         "progress_percentage": round(progress_percentage, 2),
         "suggestion": suggestion
-    })
+    }
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
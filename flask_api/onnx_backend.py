@@ -0,0 +1,92 @@
+# onnx_backend.py
+"""Optional ONNX Runtime backend for the DistilBERT expense classifier.
+
+The eager PyTorch model is exported to ONNX once, quantized to int8 with
+dynamic quantization, and then served through an ONNX Runtime CPU session.
+onnx / onnxruntime are only needed when CLASSIFIER_BACKEND=onnx.
+"""
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ONNX_MODEL_PATH = os.environ.get(
+    "CLASSIFIER_ONNX_PATH",
+    os.path.join(BASE_DIR, "..", "saved_models", "distilbert_int8.onnx")
+)
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError("CLASSIFIER_BACKEND=onnx requires `pip install onnx onnxruntime`.")
+    return onnxruntime
+
+
+def export_quantized_onnx(model, out_path: str = ONNX_MODEL_PATH, opset: int = 14) -> str:
+    """Export an eager DistilBertForSequenceClassification to int8 ONNX."""
+    import torch
+    _require_onnxruntime()
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    fp32_path = out_path + ".fp32.tmp"
+    model = model.to("cpu").eval()
+    dummy_ids = torch.ones((2, 8), dtype=torch.long)
+    dummy_mask = torch.ones((2, 8), dtype=torch.long)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy_ids, dummy_mask),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+
+    try:
+        quantize_dynamic(fp32_path, out_path, weight_type=QuantType.QInt8)
+    finally:
+        if os.path.exists(fp32_path):
+            os.remove(fp32_path)
+    print(f"Quantized ONNX classifier written to {out_path}")
+    return out_path
+
+
+class OnnxClassifier:
+    """Thin wrapper around an ONNX Runtime session returning logits."""
+
+    def __init__(self, path: str = ONNX_MODEL_PATH, intra_op_threads: int | None = None):
+        ort = _require_onnxruntime()
+        if not os.path.exists(path):
+            raise RuntimeError(f"ONNX classifier not found at {path}. Export it first.")
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = intra_op_threads or int(os.environ.get("CLASSIFIER_ONNX_THREADS", 0))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+    def logits(self, input_ids, attention_mask) -> np.ndarray:
+        (logits,) = self.session.run(
+            ["logits"],
+            {
+                "input_ids": np.asarray(input_ids, dtype=np.int64),
+                "attention_mask": np.asarray(attention_mask, dtype=np.int64),
+            },
+        )
+        return logits
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -0,0 +1,111 @@
+# result_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_expense_text(text: str) -> str:
+    """Lowercase and collapse whitespace; the tokenizer treats these the same."""
+    return " ".join(text.lower().split())
+
+
+class ClassificationCache:
+    """Bounded LRU cache of classifier results with optional TTL.
+
+    The cache is cleared automatically when any of `watched_files` changes
+    on disk (mtime or size). This does not reload the classifier: the old
+    weights stay in memory, so a new model or category map still needs a
+    process restart to take effect.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=None, watched_files=(), check_interval=5.0):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl) if ttl else None
+        self.watched_files = [os.path.abspath(p) for p in watched_files]
+        self.check_interval = check_interval
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = self._files_fingerprint()
+        self._next_check = time.monotonic() + check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def _files_fingerprint(self):
+        fp = []
+        for path in self.watched_files:
+            try:
+                st = os.stat(path)
+                fp.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                fp.append((path, None, None))
+        return tuple(fp)
+
+    def _check_files(self, now):
+        # called with the lock held
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        fingerprint = self._files_fingerprint()
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._data.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_files(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,140 @@
+"""ARIMA order selection for the per-category forecasters.
+
+pm.auto_arima's stepwise seasonal search dominates training time. The fast
+mode (ARIMA_SEARCH=fast, default) instead:
+
+  1. reuses the (p,d,q)(P,D,Q,m) order kept in the user's model bundle by
+     the previous run and fits it first,
+  2. then fits the orders one step away from it (p, q <= 2, P, Q <= 1),
+     for at most ARIMA_SEARCH_BUDGET seconds; first runs start from
+     auto_arima's stepwise starting orders and hill-climb from there,
+  3. keeps the best order found, which is the cached order itself when the
+     budget runs out before anything better is fitted.
+
+ARIMA_SEARCH=full keeps the previous behaviour (auto_arima on every run).
+"""
+import os
+import time
+
+import pmdarima as pm
+from pmdarima.arima import ndiffs, nsdiffs
+
+ARIMA_SEARCH = os.environ.get("ARIMA_SEARCH", "fast").lower()
+ARIMA_SEARCH_BUDGET = float(os.environ.get("ARIMA_SEARCH_BUDGET", 10))
+SEASONAL_PERIOD = 12
+MAX_P, MAX_Q = 2, 2
+MAX_SP, MAX_SQ = 1, 1
+
+
+def _differencing(ts, m: int, cached: dict | None) -> tuple[int, int]:
+    """(d, D). Reuses the cached d/D; otherwise runs the same unit-root
+    tests auto_arima does."""
+    if cached is not None:
+        return cached["order"][1], cached["seasonal_order"][1]
+    D = 0
+    if m > 1:
+        try:
+            D = nsdiffs(ts, m=m, max_D=1, test="ocsb")
+        except Exception:
+            D = 0
+    d = ndiffs(ts.diff(m).dropna() if D else ts, max_d=2, test="kpss")
+    return int(d), int(D)
+
+
+def _starts(d: int, D: int, m: int, cached: dict | None) -> list[tuple]:
+    """Initial orders: the cached one, or auto_arima's stepwise starting set."""
+    sm = m if m > 1 else 0
+    if cached is not None:
+        cp, _, cq = cached["order"]
+        cP, _, cQ, _ = cached["seasonal_order"]
+        return [((cp, d, cq), (cP, D, cQ, sm))]
+    s = 1 if m > 1 else 0
+    return [((2, d, 2), (s, D, s, sm)), ((0, d, 0), (0, D, 0, sm)),
+            ((1, d, 0), (s, D, 0, sm)), ((0, d, 1), (0, D, s, sm))]
+
+
+def _neighbours(candidate: tuple, m: int) -> list[tuple]:
+    """Orders one step away in p, q, P or Q, within the MAX_* bounds."""
+    (p, d, q), (P, D, Q, sm) = candidate
+    limits = (MAX_P, MAX_Q, MAX_SP if m > 1 else 0, MAX_SQ if m > 1 else 0)
+    out = []
+    for i in range(4):
+        for step in (-1, 1):
+            v = [p, q, P, Q]
+            v[i] += step
+            if 0 <= v[i] <= limits[i]:
+                out.append(((v[0], d, v[1]), (v[2], D, v[3], sm)))
+    return out
+
+
+def _fit(ts, order, seasonal_order):
+    return pm.ARIMA(
+        order=order, seasonal_order=seasonal_order,
+        with_intercept=(order[1] + seasonal_order[1]) < 2,
+        suppress_warnings=True,
+    ).fit(ts)
+
+
+def full_search(ts):
+    return pm.auto_arima(
+        ts, seasonal=True, m=SEASONAL_PERIOD, suppress_warnings=True,
+        error_action='ignore', trace=False
+    )
+
+
+def select_arima(ts, cached: dict | None = None, budget: float | None = None,
+                 search: str | None = None):
+    """Fit an ARIMA for `ts`. Returns (model, info) where info records the
+    method used, how many candidates were fitted and the time taken."""
+    search = (search or ARIMA_SEARCH).lower()
+    budget = ARIMA_SEARCH_BUDGET if budget is None else budget
+    started = time.perf_counter()
+
+    if search == "full":
+        model = full_search(ts)
+        return model, {"method": "full", "fitted": None,
+                       "seconds": round(time.perf_counter() - started, 3)}
+
+    # series shorter than two seasons are fitted non-seasonally
+    m = SEASONAL_PERIOD if len(ts) >= 2 * SEASONAL_PERIOD else 1
+    if cached is not None and (cached["seasonal_order"][3] or 1) != m:
+        cached = None
+    d, D = _differencing(ts, m, cached)
+    best, best_aic, best_key, fitted, method = None, float("inf"), None, 0, "search"
+    seen = set()
+
+    def out_of_time():
+        return best is not None and time.perf_counter() - started > budget
+
+    # fit the start orders, then their neighbours. First runs keep climbing
+    # while a neighbour improves; warm starts check one ring around the cached
+    # order, so the order drifts towards the optimum across retrains instead.
+    queue = _starts(d, D, m, cached)
+    queue += _neighbours(queue[0], m) if cached is not None else []
+    while queue:
+        key = queue.pop(0)
+        if key in seen:
+            continue
+        if out_of_time():
+            method = "budget"
+            break
+        seen.add(key)
+        try:
+            model = _fit(ts, *key)
+        except Exception:
+            continue
+        fitted += 1
+        aic = model.aic()
+        if aic < best_aic:
+            best, best_aic, best_key = model, aic, key
+        if not queue and cached is None:
+            queue = [n for n in _neighbours(best_key, m) if n not in seen] if best_key else []
+
+    if best is None:  # no candidate converged
+        best, method = full_search(ts), "full_fallback"
+    elif cached is not None and tuple(best.order) == tuple(cached["order"]) \
+            and tuple(best.seasonal_order) == tuple(cached["seasonal_order"]):
+        method = "cached" if method == "search" else "cached_budget"
+
+    return best, {"method": method, "fitted": fitted,
+                  "seconds": round(time.perf_counter() - started, 3)}
@@ -0,0 +1,121 @@
+"""Cheap "which users' records changed" checks for retraining sweeps.
+
+A per-user watermark (last_expense_update in models/{uid}/metadata.json) is
+compared against record update times fetched with one collection-group
+query across all users, instead of one stream (plus a get() per document)
+per user.
+
+If the app stamps record documents with an update timestamp field, set
+RECORDS_UPDATED_FIELD to its name (e.g. "updatedAt"): the query then
+filters on it server-side and only changed documents are read. This needs a
+collection-group index on that field. Without it, every record document is
+listed once with an empty field mask and its update_time is compared here.
+"""
+import json
+import os
+from datetime import datetime
+
+from future_prediction.utils import db, count_reads, fetch_records_watermark
+from future_prediction.records_mirror import RECORDS_SOURCE, get_mirror
+
+MODELS_ROOT = "./models"
+SWEEP_STATE_PATH = os.path.join(MODELS_ROOT, "change_sweep.json")
+RECORDS_UPDATED_FIELD = os.environ.get("RECORDS_UPDATED_FIELD")
+
+
+def _naive_utc(dt):
+    return dt.replace(tzinfo=None) if dt is not None and dt.tzinfo is not None else dt
+
+
+def load_watermark(user_id: str) -> datetime | None:
+    path = os.path.join(MODELS_ROOT, user_id, "metadata.json")
+    try:
+        with open(path, "r") as f:
+            value = json.load(f).get("last_expense_update")
+    except (OSError, ValueError):
+        return None
+    return datetime.fromisoformat(value) if value else None
+
+
+def changed_users_since(since: datetime | None, user_ids=None) -> dict:
+    """{user_id: latest record update (naive UTC)} for users with records
+    updated after `since` (all users with records when since is None)."""
+    since = _naive_utc(since)
+    if RECORDS_SOURCE == "mirror":  # sync the mirror first (monthlytrainer does)
+        return {u: t for u, t in get_mirror().last_updates(user_ids).items() if since is None or t > since}
+
+    wanted = set(user_ids) if user_ids is not None else None
+    query = db.collection_group("records")
+
+    if RECORDS_UPDATED_FIELD and since is not None:
+        query = query.where(RECORDS_UPDATED_FIELD, ">", since).select([RECORDS_UPDATED_FIELD])
+    else:
+        query = query.select([])  # names and update times only
+
+    latest = {}
+    for doc in query.stream():
+        count_reads()
+        user_ref = doc.reference.parent.parent
+        if user_ref is None or (wanted is not None and user_ref.id not in wanted):
+            continue
+        updated = _naive_utc(doc.update_time)
+        if updated is None or (since is not None and updated <= since):
+            continue
+        if user_ref.id not in latest or updated > latest[user_ref.id]:
+            latest[user_ref.id] = updated
+    return latest
+
+
+def users_needing_retraining(since: datetime | None = None, user_ids=None) -> list[str]:
+    """Users whose records changed after both `since` and their own watermark."""
+    changed = changed_users_since(since, user_ids)
+    stale = []
+    for user_id, updated in changed.items():
+        watermark = load_watermark(user_id)
+        if watermark is None or updated.replace(microsecond=0) > watermark.replace(microsecond=0):
+            stale.append(user_id)
+    return sorted(stale)
+
+
+def stale_users(user_ids) -> list[str]:
+    """Of `user_ids`, those whose records changed after their own watermark,
+    checked one user at a time (for the few users a sweep must retry)."""
+    stale = []
+    for user_id in user_ids:
+        updated = fetch_records_watermark(user_id)
+        watermark = load_watermark(user_id)
+        if updated is not None and (watermark is None
+                                    or updated.replace(microsecond=0) > watermark.replace(microsecond=0)):
+            stale.append(user_id)
+    return sorted(stale)
+
+
+def _load_sweep_state() -> dict:
+    try:
+        with open(SWEEP_STATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_last_sweep() -> datetime | None:
+    try:
+        return datetime.fromisoformat(_load_sweep_state()["last_sweep"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def load_retry_users() -> list[str]:
+    """Users whose training did not finish in the last sweep."""
+    return list(_load_sweep_state().get("retry", []))
+
+
+def save_last_sweep(started_at: datetime, retry=()):
+    """Record a finished sweep. `retry` lists the users whose jobs did not
+    succeed; the next sweep rechecks them against their own watermark
+    instead of `started_at`."""
+    os.makedirs(os.path.dirname(SWEEP_STATE_PATH), exist_ok=True)
+    tmp = f"{SWEEP_STATE_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_sweep": started_at.isoformat(), "retry": sorted(retry)}, f)
+    os.replace(tmp, SWEEP_STATE_PATH)
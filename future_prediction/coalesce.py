@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Merges concurrent calls with the same key into one computation.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return fut.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop."""
+
+    def __init__(self):
+        self._inflight = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # a cancelled waiter must not cancel the shared call
+        return await asyncio.shield(task)
@@ -0,0 +1,94 @@
+"""Where the Firestore client comes from.
+
+Every module gets its client from get_db() instead of calling
+firestore.client() itself. DATASTORE selects the backend:
+  firestore (default) - firebase_admin, initialized from GOOGLE_APPLICATION_CREDENTIALS
+  fake                - an in-memory FakeFirestore (no credentials needed), with
+                        FAKE_FIRESTORE_LATENCY_MS per call, FAKE_FIRESTORE_DOC_LATENCY_MS
+                        per returned document and optional FAKE_FIRESTORE_SEED
+                        (a JSON dump) loaded at startup
+
+get_async_db() is the matching firestore_async client for the ASGI
+handlers (asgi_app.py); with DATASTORE=fake it reads the same documents.
+set_db() installs a client before the app modules are imported (load tests).
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+load_dotenv()
+
+DATASTORE = os.environ.get("DATASTORE", "firestore").lower()
+ASCENDING = "ASCENDING"    # same values as firestore.Query.ASCENDING/DESCENDING
+DESCENDING = "DESCENDING"
+
+_db = None
+_async_db = None
+_db_lock = threading.Lock()
+
+
+def _init_firebase():
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        firebase_key_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+        if not firebase_key_path or not os.path.exists(firebase_key_path):
+            raise RuntimeError("Firebase key not found or invalid path.")
+        firebase_admin.initialize_app(credentials.Certificate(firebase_key_path))
+
+
+def _firestore_client():
+    from firebase_admin import firestore
+
+    _init_firebase()
+    return firestore.client()
+
+
+def _fake_client():
+    from future_prediction.fake_firestore import FakeFirestore
+
+    client = FakeFirestore(
+        latency_ms=float(os.environ.get("FAKE_FIRESTORE_LATENCY_MS", 0)),
+        per_doc_ms=float(os.environ.get("FAKE_FIRESTORE_DOC_LATENCY_MS", 0)),
+    )
+    seed = os.environ.get("FAKE_FIRESTORE_SEED")
+    if seed:
+        client.load_json(seed)
+    return client
+
+
+def get_db():
+    global _db
+    with _db_lock:
+        if _db is None:
+            if DATASTORE == "fake":
+                _db = _fake_client()
+            elif DATASTORE == "firestore":
+                _db = _firestore_client()
+            else:
+                raise RuntimeError(f"Unknown DATASTORE {DATASTORE!r} (expected firestore or fake)")
+        return _db
+
+
+def get_async_db():
+    global _async_db
+    if _async_db is None:
+        from future_prediction.fake_firestore import FakeFirestore, AsyncFakeFirestore
+
+        db = get_db()
+        if isinstance(db, FakeFirestore):  # DATASTORE=fake or a client from set_db()
+            client = AsyncFakeFirestore(db)
+        else:
+            from firebase_admin import firestore_async
+            client = firestore_async.client()
+        with _db_lock:
+            if _async_db is None:
+                _async_db = client
+    return _async_db
+
+
+def set_db(client):
+    global _db, _async_db
+    with _db_lock:
+        _db, _async_db = client, None
@@ -0,0 +1,481 @@
+"""In-memory stand-in for the Firestore client, for load tests and local runs.
+
+Implements the part of the google-cloud-firestore surface this repo uses:
+collection/document/collection_group references, stream/get/get_all,
+select (field masks), where, order_by (including "__name__"), limit,
+start_after, set/update/delete and DocumentSnapshot.update_time.
+
+Every RPC sleeps latency_ms (+ per_doc_ms per returned document) so
+endpoint timings include a realistic network cost, and reads are counted
+the way Firestore bills them: one per returned document, and one for a
+query that returns nothing. `reads` is the running total.
+
+Documents can be seeded from a JSON file of {"users/u1/records/2024-01": {...}}
+(dump_json writes one), so separate processes can share the same data.
+AsyncFakeFirestore is the firestore_async counterpart over the same store.
+"""
+import asyncio
+import copy
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _utc(value):
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _field(data: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _masked(data: dict, fields) -> dict:
+    if fields is None:
+        return copy.deepcopy(data)
+    out = {}
+    for path in fields:
+        value = _field(data, path)
+        if value is None:
+            continue
+        target = out
+        *parents, last = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[last] = copy.deepcopy(value)
+    return out
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, update_time=None, create_time=None):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+        self.create_time = create_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _field(self._data or {}, field_path)
+
+
+class DocumentReference:
+    def __init__(self, client, path: tuple):
+        self._client = client
+        self._path = path
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def path(self):
+        return "/".join(self._path)
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._path[:-1])
+
+    def collection(self, name):
+        return CollectionReference(self._client, self._path + (name,))
+
+    def collections(self):
+        return [self.collection(name) for name in self._client._subcollections(self._path)]
+
+    def get(self, field_paths=None):
+        self._client._rpc(1)
+        return self._client._snapshot(self._path, field_paths)
+
+    def set(self, data, merge=False):
+        self._client._write(self._path, data, merge)
+
+    def update(self, data):
+        if self._client._doc(self._path) is None:
+            raise KeyError(f"No document to update: {self.path}")
+        self._client._write(self._path, data, merge=True)
+
+    def delete(self):
+        self._client._delete(self._path)
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other._path == self._path
+
+    def __hash__(self):
+        return hash(self._path)
+
+
+class Query:
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(self, client, parent: tuple, all_descendants=False, fields=None,
+                 filters=(), orders=(), limit_to=None, cursor=None):
+        self._client = client
+        self._parent = parent
+        self._all_descendants = all_descendants
+        self._fields = fields
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_to
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = dict(fields=self._fields, filters=self._filters, orders=self._orders,
+                     limit_to=self._limit, cursor=self._cursor)
+        state.update(changes)
+        return Query(self._client, self._parent, self._all_descendants, **state)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:  # FieldFilter(field_path, op_string, value)
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, _utc(value)),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit_to=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    @staticmethod
+    def _order_key(field):
+        def key(doc):
+            value = "/".join(doc[0]) if field == "__name__" else _field(doc[1], field)
+            return (value is not None, value if value is not None else 0)  # missing fields sort first
+        return key
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            current = _field(data, field)
+            if current is None:
+                return False
+            try:
+                if not _OPS[op](_utc(current), value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _results(self):
+        docs = [d for d in self._client._query_docs(self._parent, self._all_descendants) if self._matches(d[1])]
+        orders = self._orders or (("__name__", ASCENDING),)
+        for field, direction in reversed(orders):
+            docs.sort(key=self._order_key(field), reverse=direction == DESCENDING)
+        if self._cursor is not None:
+            docs = self._after_cursor(docs, orders)
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return docs
+
+    def _after_cursor(self, docs, orders):
+        cursor = self._cursor
+        if isinstance(cursor, DocumentSnapshot):
+            names = ["/".join(p) for p, _, _ in docs]
+            target = cursor.reference.path
+            return docs[names.index(target) + 1:] if target in names else [
+                d for d in docs if "/".join(d[0]) > target
+            ]
+        values = cursor if isinstance(cursor, dict) else {"__name__": cursor}
+        field, direction = orders[0]
+        value = values.get(field)
+        if isinstance(value, DocumentReference):
+            value = value.path
+        elif field == "__name__" and value is not None and "/" not in str(value):
+            value = "/".join(self._parent + (str(value),))
+        key = (lambda d: "/".join(d[0])) if field == "__name__" else (lambda d: _field(d[1], field))
+        if direction == DESCENDING:
+            return [d for d in docs if key(d) is not None and key(d) < value]
+        return [d for d in docs if key(d) is not None and key(d) > value]
+
+    def _snapshots(self):
+        return [DocumentSnapshot(DocumentReference(self._client, path), _masked(data, self._fields),
+                                 meta["update_time"], meta["create_time"])
+                for path, data, meta in self._results()]
+
+    def stream(self):
+        snapshots = self._snapshots()
+        self._client._rpc(len(snapshots))
+        yield from snapshots
+
+    def get(self):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path: tuple):
+        super().__init__(client, path)
+
+    @property
+    def id(self):
+        return self._parent[-1]
+
+    @property
+    def parent(self):
+        return DocumentReference(self._client, self._parent[:-1]) if len(self._parent) > 1 else None
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = self._client._auto_id()
+        return DocumentReference(self._client, self._parent + (document_id,))
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self):
+        return [DocumentReference(self._client, p) for p, _, _ in self._client._query_docs(self._parent, False)]
+
+
+class FakeFirestore:
+    def __init__(self, latency_ms: float = 0.0, per_doc_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.per_doc_ms = per_doc_ms
+        self._docs = {}  # path tuple -> (data, {"update_time", "create_time"})
+        self._children = {}  # collection path tuple -> {document path tuple: None}, in insertion order
+        self._lock = threading.RLock()
+        self._reads = 0
+        self._calls = 0
+        self._counter = 0
+
+    # ───── Client surface ─────
+    def collection(self, name):
+        return CollectionReference(self, (name,))
+
+    def document(self, path):
+        return DocumentReference(self, tuple(path.split("/")))
+
+    def collection_group(self, collection_id):
+        return Query(self, (collection_id,), all_descendants=True)
+
+    def collections(self):
+        return [self.collection(name) for name in self._subcollections(())]
+
+    def get_all(self, references, field_paths=None):
+        references = list(references)
+        self._rpc(len(references))
+        for ref in references:
+            yield self._snapshot(ref._path, field_paths)
+
+    # ───── Accounting ─────
+    @property
+    def reads(self) -> int:
+        return self._reads
+
+    @property
+    def calls(self) -> int:
+        """Read calls made (streams, gets and get_all batches)."""
+        return self._calls
+
+    def _charge(self, docs: int) -> float:
+        """Counts the reads of one call and returns its simulated latency (s)."""
+        with self._lock:
+            self._reads += max(docs, 1)
+            self._calls += 1
+        return (self.latency_ms + self.per_doc_ms * docs) / 1000
+
+    def _rpc(self, docs: int):
+        delay = self._charge(docs)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ───── Storage ─────
+    def _auto_id(self):
+        with self._lock:
+            self._counter += 1
+            return f"auto{self._counter:012d}"
+
+    def _doc(self, path):
+        with self._lock:
+            return self._docs.get(path)
+
+    def _snapshot(self, path, field_paths=None):
+        entry = self._doc(path)
+        ref = DocumentReference(self, path)
+        if entry is None:
+            return DocumentSnapshot(ref, None)
+        data, meta = entry
+        return DocumentSnapshot(ref, _masked(data, field_paths), meta["update_time"], meta["create_time"])
+
+    def _write(self, path, data, merge=False):
+        if len(path) % 2:
+            raise ValueError(f"Not a document path: {'/'.join(path)}")
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            current = self._docs.get(path)
+            new = copy.deepcopy(current[0]) if merge and current else {}
+            for key, value in data.items():
+                target = new
+                *parents, last = key.split(".") if merge else (key,)
+                for part in parents:
+                    target = target.setdefault(part, {})
+                target[last] = copy.deepcopy(value)
+            created = current[1]["create_time"] if current else now
+            self._docs[path] = (new, {"update_time": now, "create_time": created})
+            self._children.setdefault(path[:-1], {})[path] = None
+
+    def _delete(self, path):
+        with self._lock:
+            self._docs.pop(path, None)
+            children = self._children.get(path[:-1])
+            if children is not None:
+                children.pop(path, None)
+                if not children:
+                    del self._children[path[:-1]]
+
+    def _query_docs(self, parent, all_descendants):
+        with self._lock:
+            if all_descendants:
+                paths = [p for coll, children in self._children.items() if coll[-1] == parent[-1] for p in children]
+            else:
+                paths = list(self._children.get(parent, ()))
+            items = [(p, *self._docs[p]) for p in paths]
+        yield from items
+
+    def _subcollections(self, path):
+        depth = len(path)
+        with self._lock:
+            return sorted({coll[depth] for coll in self._children if len(coll) == depth + 1 and coll[:depth] == path})
+
+    # ───── Seeding ─────
+    def seed(self, documents: dict, update_time=None):
+        """Write {"users/u1/records/2024-01": {...}} without counting reads or sleeping."""
+        with self._lock:
+            for doc_path, data in documents.items():
+                self._write(tuple(doc_path.split("/")), data)
+                if update_time is not None:
+                    self._docs[tuple(doc_path.split("/"))][1]["update_time"] = _utc(update_time)
+
+    def load_json(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            self.seed(json.load(f))
+
+    def dump_json(self, path: str):
+        with self._lock:
+            documents = {"/".join(p): data for p, (data, _) in self._docs.items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(documents, f, default=str)
+
+    def __len__(self):
+        return len(self._docs)
+
+
+# ───── Async client ─────
+class AsyncDocumentReference:
+    def __init__(self, ref: DocumentReference):
+        self._ref = ref
+
+    @property
+    def id(self):
+        return self._ref.id
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    def collection(self, name):
+        return AsyncQuery(self._ref.collection(name))
+
+    async def get(self, field_paths=None):
+        client = self._ref._client
+        await asyncio.sleep(client._charge(1))
+        return client._snapshot(self._ref._path, field_paths)
+
+    async def set(self, data, merge=False):
+        self._ref.set(data, merge)
+
+    async def update(self, data):
+        self._ref.update(data)
+
+    async def delete(self):
+        self._ref.delete()
+
+
+class AsyncQuery:
+    """Wraps a Query/CollectionReference; stream() is an async generator."""
+    _BUILDERS = ("select", "where", "order_by", "limit", "start_after")
+
+    def __init__(self, query: Query):
+        self._query = query
+
+    def __getattr__(self, name):
+        if name in self._BUILDERS:
+            return lambda *args, **kwargs: AsyncQuery(getattr(self._query, name)(*args, **kwargs))
+        raise AttributeError(name)
+
+    @property
+    def id(self):
+        return self._query.id
+
+    def document(self, document_id=None):
+        return AsyncDocumentReference(self._query.document(document_id))
+
+    async def stream(self):
+        snapshots = self._query._snapshots()
+        await asyncio.sleep(self._query._client._charge(len(snapshots)))
+        for snapshot in snapshots:
+            yield snapshot
+
+    async def get(self):
+        return [snapshot async for snapshot in self.stream()]
+
+
+class AsyncFakeFirestore:
+    """firestore_async-style client over a FakeFirestore's documents and read counter."""
+
+    def __init__(self, client: FakeFirestore):
+        self.sync_client = client
+
+    @property
+    def reads(self) -> int:
+        return self.sync_client.reads
+
+    def collection(self, name):
+        return AsyncQuery(self.sync_client.collection(name))
+
+    def document(self, path):
+        return AsyncDocumentReference(self.sync_client.document(path))
+
+    def collection_group(self, collection_id):
+        return AsyncQuery(self.sync_client.collection_group(collection_id))
+
+    async def get_all(self, references, field_paths=None):
+        references = [getattr(ref, "_ref", ref) for ref in references]
+        await asyncio.sleep(self.sync_client._charge(len(references)))
+        for ref in references:
+            yield self.sync_client._snapshot(ref._path, field_paths)
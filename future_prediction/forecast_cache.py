@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ForecastCache:
+    """Per-user cache of /predict results tagged with the data version they
+    were computed from (records watermark + model artifact fingerprint)."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = int(maxsize)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+            return entry
+
+    def lookup(self, user_id: str, version) -> dict | None:
+        """Entry for user_id if it was computed from exactly `version`."""
+        entry = self.get(user_id)
+        with self._lock:
+            if entry is not None and entry["version"] == version:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, user_id: str, version, result: dict, status: int):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = {
+                "version": version,
+                "result": result,
+                "status": status,
+                "stored_at": time.monotonic(),
+                "checked_at": time.monotonic(),
+            }
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def mark_checked(self, user_id: str):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry["checked_at"] = time.monotonic()
+
+    def count_stale_hit(self):
+        with self._lock:
+            self.stale_hits += 1
+
+    def invalidate(self, user_id: str | None = None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale_hits
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
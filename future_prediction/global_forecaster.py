@@ -0,0 +1,228 @@
+"""One LSTM forecaster shared by every user and category.
+
+Instead of a small LSTMRegressor per (user, category), GlobalLSTM is
+trained once on the windows of all users and categories together and
+conditioned on a category embedding (plus, optionally, a hashed user
+embedding). Each window is divided by the mean of its observed months, so
+users with very different spending levels share the same weights, and
+windows shorter than SEQ_LEN are left-padded with a 0/1 mask channel. That
+also lets it forecast users with only a few months of history.
+
+GLOBAL_FORECASTER selects how predictor.py uses it:
+    off        (default) per-user models only
+    coldstart  users/categories with < 12 months or no trained models
+    all        every category, replacing the per-user models
+
+Train it with:
+    python future_prediction/train_global.py
+"""
+import os
+import threading
+import zlib
+from datetime import datetime
+
+import numpy as np
+import torch
+from torch import nn
+
+GLOBAL_FORECASTER = os.environ.get("GLOBAL_FORECASTER", "off").lower()
+GLOBAL_MODEL_PATH = os.environ.get("GLOBAL_MODEL_PATH", "./models/global/global_lstm.pt")
+GLOBAL_MIN_HISTORY = int(os.environ.get("GLOBAL_MIN_HISTORY", 3))
+GLOBAL_USER_BUCKETS = int(os.environ.get("GLOBAL_USER_BUCKETS", 0))  # 0 = no user embedding
+GLOBAL_EPOCHS = int(os.environ.get("GLOBAL_EPOCHS", 30))
+GLOBAL_BATCH_SIZE = int(os.environ.get("GLOBAL_BATCH_SIZE", 1024))
+SEQ_LEN = 12
+USER_DROPOUT = 0.1  # share of training windows shown as "unknown user"
+
+
+class GlobalLSTM(nn.Module):
+    def __init__(self, num_categories: int, hidden: int = 64, cat_dim: int = 8,
+                 user_buckets: int = 0, user_dim: int = 8):
+        super().__init__()
+        self.cat_emb = nn.Embedding(num_categories, cat_dim)
+        # bucket 0 is "unknown user"
+        self.user_emb = nn.Embedding(user_buckets + 1, user_dim) if user_buckets else None
+        in_dim = 2 + cat_dim + (user_dim if user_buckets else 0)
+        self.lstm = nn.LSTM(in_dim, hidden, batch_first=True)
+        self.fc = nn.Linear(hidden, 1)
+
+    def forward(self, x, cat, user=None):
+        """x: (B, T, 2) normalised values and mask; cat, user: (B,) indices."""
+        cond = [self.cat_emb(cat)]
+        if self.user_emb is not None:
+            cond.append(self.user_emb(user if user is not None else torch.zeros_like(cat)))
+        cond = torch.cat(cond, dim=-1).unsqueeze(1).expand(-1, x.shape[1], -1)
+        _, (h, _) = self.lstm(torch.cat([x, cond], dim=-1))
+        return self.fc(h[-1]).squeeze(-1)
+
+
+def user_bucket(user_id: str, buckets: int) -> int:
+    return 1 + zlib.crc32(user_id.encode("utf-8")) % buckets if buckets else 0
+
+
+def _normalise(windows: np.ndarray, masks: np.ndarray):
+    counts = masks.sum(axis=1)
+    scale = np.maximum((windows * masks).sum(axis=1) / np.maximum(counts, 1), 1.0)
+    x = np.stack([windows / scale[:, None], masks], axis=-1).astype(np.float32)
+    return x, scale.astype(np.float32)
+
+
+def make_windows(values: np.ndarray, min_history: int = GLOBAL_MIN_HISTORY):
+    """Every (history -> next month) window of one series with at least
+    `min_history` observed months. Returns (x, y, scale)."""
+    values = np.asarray(values, dtype=np.float32)
+    n = len(values)
+    if n <= min_history:
+        return None
+    padded = np.concatenate([np.zeros(SEQ_LEN, np.float32), values[:-1]])
+    observed = np.concatenate([np.zeros(SEQ_LEN, np.float32), np.ones(n - 1, np.float32)])
+    # window i holds the SEQ_LEN months before values[i]
+    windows = np.lib.stride_tricks.sliding_window_view(padded, SEQ_LEN)[min_history:]
+    masks = np.lib.stride_tricks.sliding_window_view(observed, SEQ_LEN)[min_history:]
+    x, scale = _normalise(windows, masks)
+    return x, values[min_history:] / scale, scale
+
+
+def forecast_window(values: np.ndarray):
+    """Input window for forecasting the month after `values`."""
+    values = np.asarray(values, dtype=np.float32)[-SEQ_LEN:]
+    window = np.zeros(SEQ_LEN, np.float32)
+    mask = np.zeros(SEQ_LEN, np.float32)
+    if len(values):
+        window[-len(values):] = values
+        mask[-len(values):] = 1.0
+    x, scale = _normalise(window[None], mask[None])
+    return x[0], scale[0]
+
+
+def train_global(series: list[tuple[str, str, np.ndarray]], categories: list[str],
+                 epochs: int = GLOBAL_EPOCHS, batch_size: int = GLOBAL_BATCH_SIZE,
+                 user_buckets: int = GLOBAL_USER_BUCKETS, hidden: int = 64, seed: int = 0):
+    """Train on [(user_id, category, monthly values)]. Returns (model, stats)."""
+    cat_index = {c: i for i, c in enumerate(categories)}
+    xs, ys, cats, users = [], [], [], []
+    for user_id, category, values in series:
+        if category not in cat_index:
+            continue
+        built = make_windows(values)
+        if built is None:
+            continue
+        x, y, _ = built
+        xs.append(x)
+        ys.append(y)
+        cats.append(np.full(len(x), cat_index[category], np.int64))
+        users.append(np.full(len(x), user_bucket(user_id, user_buckets), np.int64))
+    if not xs:
+        raise ValueError("no series long enough to train the global forecaster")
+
+    torch.manual_seed(seed)
+    x = torch.from_numpy(np.concatenate(xs))
+    y = torch.from_numpy(np.concatenate(ys).astype(np.float32))
+    cat = torch.from_numpy(np.concatenate(cats))
+    user = torch.from_numpy(np.concatenate(users))
+
+    model = GlobalLSTM(len(categories), hidden=hidden, user_buckets=user_buckets)
+    opt = torch.optim.Adam(model.parameters(), lr=2e-3)
+    loss_fn = nn.HuberLoss(delta=1.0)
+
+    model.train()
+    for epoch in range(epochs):
+        order = torch.randperm(len(x))
+        total = 0.0
+        for i in range(0, len(x), batch_size):
+            idx = order[i:i + batch_size]
+            u = user[idx]
+            if user_buckets:
+                u = torch.where(torch.rand(len(idx)) < USER_DROPOUT, torch.zeros_like(u), u)
+            opt.zero_grad()
+            loss = loss_fn(model(x[idx], cat[idx], u), y[idx])
+            loss.backward()
+            opt.step()
+            total += loss.item() * len(idx)
+        print(f"Global LSTM epoch {epoch + 1}/{epochs}: loss {total / len(x):.4f}")
+    model.eval()
+
+    stats = {"windows": int(len(x)), "series": len(xs), "epochs": epochs}
+    return model, stats
+
+
+def save_global(model: GlobalLSTM, categories: list[str], stats: dict, path: str = GLOBAL_MODEL_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    torch.save({
+        "model": model.state_dict(),
+        "categories": list(categories),
+        "config": {
+            "hidden": model.lstm.hidden_size,
+            "user_buckets": model.user_emb.num_embeddings - 1 if model.user_emb is not None else 0,
+        },
+        "stats": stats,
+        "trained_at": datetime.utcnow().isoformat(),
+    }, tmp)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+class GlobalForecaster:
+    def __init__(self, path: str = GLOBAL_MODEL_PATH):
+        ckpt = torch.load(path, map_location="cpu")
+        self.categories = ckpt["categories"]
+        self.cat_index = {c: i for i, c in enumerate(self.categories)}
+        self.user_buckets = ckpt["config"]["user_buckets"]
+        self.model = GlobalLSTM(len(self.categories), hidden=ckpt["config"]["hidden"],
+                                user_buckets=self.user_buckets)
+        self.model.load_state_dict(ckpt["model"])
+        self.model.eval()
+        self.trained_at = ckpt.get("trained_at")
+
+    def predict(self, items: list[tuple[str, str, np.ndarray]]) -> list[float | None]:
+        """Next-month forecast for each (user_id, category, values), in one
+        forward pass. None for categories the model wasn't trained on."""
+        out = [None] * len(items)
+        rows = [i for i, (_, cat, _) in enumerate(items) if cat in self.cat_index]
+        if not rows:
+            return out
+        windows = [forecast_window(items[i][2]) for i in rows]
+        x = torch.from_numpy(np.stack([w for w, _ in windows]))
+        scale = np.array([s for _, s in windows], dtype=np.float32)
+        cat = torch.tensor([self.cat_index[items[i][1]] for i in rows])
+        user = torch.tensor([user_bucket(items[i][0], self.user_buckets) for i in rows])
+        with torch.no_grad():
+            pred = self.model(x, cat, user).numpy() * scale
+        for i, value in zip(rows, pred):
+            out[i] = max(float(value), 0.0)
+        return out
+
+
+_loaded = {"stamp": None, "forecaster": None}
+_load_lock = threading.Lock()
+
+def _stamp(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def model_version():
+    """(mtime, size) of the global model file, or None when it isn't used."""
+    return _stamp(GLOBAL_MODEL_PATH) if GLOBAL_FORECASTER != "off" else None
+
+
+def get_global_forecaster() -> GlobalForecaster | None:
+    """The loaded model (reloaded when the file changes), or None when
+    GLOBAL_FORECASTER=off or no model has been trained yet."""
+    if GLOBAL_FORECASTER == "off":
+        return None
+    stamp = _stamp(GLOBAL_MODEL_PATH)
+    if stamp is None:
+        return None
+    with _load_lock:
+        if _loaded["stamp"] != stamp:
+            try:
+                _loaded["forecaster"] = GlobalForecaster(GLOBAL_MODEL_PATH)
+            except Exception as e:
+                print(f" Global forecaster load failed: {e}")
+                _loaded["forecaster"] = None
+            _loaded["stamp"] = stamp
+        return _loaded["forecaster"]
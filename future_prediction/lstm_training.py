@@ -0,0 +1,119 @@
+"""Training engine for the per-category LSTMRegressor.
+
+Sliding windows are strided views over the scaled series (no Python loop,
+no DataLoader). The series are tiny (tens of windows), so each epoch is a
+single full-batch step by default (LSTM_TRAIN_BATCH > 0 switches to
+mini-batches), and full fits stop early once the loss on the held-out last
+windows stops improving. The best weights are then trained for TAIL_EPOCHS
+more epochs on all windows, held-out ones included, so the most recent months
+are still learned. Series too short to hold out MIN_VAL_WINDOWS windows have
+no stopping criterion and run at most LSTM_SHORT_SERIES_EPOCHS epochs.
+"""
+import copy
+import os
+
+import numpy as np
+import torch
+from torch import nn
+
+LSTM_MAX_EPOCHS = int(os.environ.get("LSTM_MAX_EPOCHS", 300))
+LSTM_LR = float(os.environ.get("LSTM_LR", 1e-2))
+LSTM_TRAIN_BATCH = int(os.environ.get("LSTM_TRAIN_BATCH", 0))  # 0 = full batch
+EARLY_STOP_PATIENCE = int(os.environ.get("EARLY_STOP_PATIENCE", 20))
+VAL_FRACTION = float(os.environ.get("LSTM_VAL_FRACTION", 0.2))
+MIN_VAL_WINDOWS = 2
+TAIL_EPOCHS = int(os.environ.get("LSTM_TAIL_EPOCHS", 5))
+SHORT_SERIES_EPOCHS = int(os.environ.get("LSTM_SHORT_SERIES_EPOCHS", 50))
+
+
+class LSTMRegressor(nn.Module):
+    def __init__(self, hidden=32):
+        super().__init__()
+        self.lstm = nn.LSTM(1, hidden, batch_first=True)
+        self.fc = nn.Linear(hidden, 1)
+
+    def forward(self, x):
+        _, (h, _) = self.lstm(x)
+        return self.fc(h[-1]).squeeze(-1)
+
+
+def make_windows(data: np.ndarray, seq_len: int = 12) -> tuple[torch.Tensor, torch.Tensor]:
+    """(x, y) with x[i] = data[i:i+seq_len] as (n, seq_len, 1) and y[i] = data[i+seq_len]."""
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    if len(data) <= seq_len:
+        return torch.empty(0, seq_len, 1), torch.empty(0)
+    x = np.lib.stride_tricks.sliding_window_view(data[:-1], seq_len)
+    return torch.from_numpy(x.copy()).unsqueeze(-1), torch.from_numpy(data[seq_len:].copy())
+
+
+def _run_epochs(model, opt, loss_fn, x, y, epochs, batch_size, on_epoch=None):
+    n = len(x)
+    full_batch = batch_size <= 0 or batch_size >= n
+    for epoch in range(epochs):
+        model.train()
+        if full_batch:
+            opt.zero_grad()
+            loss_fn(model(x), y).backward()
+            opt.step()
+        else:
+            order = torch.randperm(n)
+            for i in range(0, n, batch_size):
+                idx = order[i:i + batch_size]
+                opt.zero_grad()
+                loss_fn(model(x[idx]), y[idx]).backward()
+                opt.step()
+        if on_epoch is not None and on_epoch(epoch + 1):
+            return epoch + 1
+    return epochs
+
+
+def fit_lstm(model: nn.Module, scaled: np.ndarray, max_epochs: int = LSTM_MAX_EPOCHS,
+             seq_len: int = 12, windows: int | None = None, early_stopping: bool = True,
+             lr: float = LSTM_LR, batch_size: int = LSTM_TRAIN_BATCH) -> dict:
+    """Train `model` in place. `windows` keeps only the most recent windows
+    (fine-tuning, no early stopping).
+
+    Returns {"epochs": total epochs run (tail refresh included),
+    "max_epochs", "stopped_at": last epoch of the early-stopping loop (None
+    without validation windows), "early_stopped": whether it ended before
+    max_epochs, "best_epoch", "tail_epochs", "val_loss"}."""
+    x, y = make_windows(scaled, seq_len)
+    if windows is not None and len(x) > windows:
+        x, y = x[-windows:], y[-windows:]
+    report = {"epochs": 0, "max_epochs": max_epochs, "stopped_at": None, "early_stopped": False,
+              "best_epoch": None, "tail_epochs": 0, "val_loss": None}
+    if len(x) == 0:
+        return report
+
+    opt = torch.optim.Adam(model.parameters(), lr=lr)
+    loss_fn = nn.MSELoss()
+
+    n_val = int(round(len(x) * VAL_FRACTION)) if early_stopping else 0
+    if n_val < MIN_VAL_WINDOWS or len(x) - n_val < MIN_VAL_WINDOWS:
+        # a full fit of a short series has nothing to stop on: fixed short budget
+        epochs = min(max_epochs, SHORT_SERIES_EPOCHS) if early_stopping else max_epochs
+        report["epochs"] = _run_epochs(model, opt, loss_fn, x, y, epochs, batch_size)
+        model.eval()
+        return report
+
+    x_train, y_train, x_val, y_val = x[:-n_val], y[:-n_val], x[-n_val:], y[-n_val:]
+    best = {"loss": float("inf"), "epoch": 0, "state": None}
+
+    def check(epoch):
+        model.eval()
+        with torch.no_grad():
+            val = loss_fn(model(x_val), y_val).item()
+        if val < best["loss"] - 1e-6:
+            best.update(loss=val, epoch=epoch, state=copy.deepcopy(model.state_dict()))
+        return epoch - best["epoch"] >= EARLY_STOP_PATIENCE
+
+    epochs = _run_epochs(model, opt, loss_fn, x_train, y_train, max_epochs, batch_size, on_epoch=check)
+    if best["state"] is not None:
+        model.load_state_dict(best["state"])
+    # the held-out months are the most recent ones; learn them before saving
+    tail = _run_epochs(model, opt, loss_fn, x, y, TAIL_EPOCHS, batch_size)
+    model.eval()
+
+    report.update(epochs=epochs + tail, stopped_at=epochs, early_stopped=epochs < max_epochs,
+                  best_epoch=best["epoch"], tail_epochs=tail, val_loss=round(best["loss"], 6))
+    return report
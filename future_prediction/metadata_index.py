@@ -0,0 +1,139 @@
+"""Consolidated index of per-user training metadata.
+
+models/{uid}/metadata.json stays the trainer's source of truth; this SQLite
+file keeps one row per user with the summary fields (last_trained,
+last_expense_update, bundle_version), so listing pages of users costs one
+SQL query instead of one file open per user. train_forcaster.save_metadata
+upserts the row right after writing metadata.json.
+
+Users trained before the index existed are added by backfill(), which the
+training worker and the monthly trainer run once at startup (never a
+request handler). It only inserts users missing from the index, so it
+cannot overwrite a concurrent upsert. Run it by hand (e.g. after restoring
+models/ from a backup) with:
+    python future_prediction/metadata_index.py
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODELS_ROOT = os.path.join(PROJECT_ROOT, "models")
+METADATA_INDEX_DB_PATH = os.environ.get(
+    "METADATA_INDEX_DB", os.path.join(MODELS_ROOT, "metadata_index.sqlite3")
+)
+
+FIELDS = ("last_trained", "last_expense_update", "bundle_version")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_metadata (
+    user_id             TEXT PRIMARY KEY,
+    last_trained        TEXT,
+    last_expense_update TEXT,
+    bundle_version      INTEGER,
+    updated_at          TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS index_state (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class MetadataIndex:
+    def __init__(self, db_path: str = METADATA_INDEX_DB_PATH, models_root: str = MODELS_ROOT):
+        self.db_path = db_path
+        self.models_root = models_root
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(user_id: str, meta: dict) -> tuple:
+        return (user_id, meta.get("last_trained"), meta.get("last_expense_update"), meta.get("bundle_version"),
+                datetime.utcnow().isoformat())
+
+    # ───── Writes ─────
+    def upsert(self, user_id: str, meta: dict):
+        """Index the summary fields of a user's metadata.json contents."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO user_metadata "
+                "(user_id, last_trained, last_expense_update, bundle_version, updated_at) VALUES (?, ?, ?, ?, ?)",
+                self._row(user_id, meta)
+            )
+
+    def backfill(self, force: bool = False) -> int | None:
+        """Index every models/{uid}/metadata.json whose user has no row yet.
+        Runs once per index file unless `force`; returns the number of users
+        added, or None when it had already run."""
+        with self._connect() as conn:
+            if not force and conn.execute("SELECT 1 FROM index_state WHERE key = 'backfilled_at'").fetchone():
+                return None
+        rows = []
+        if os.path.isdir(self.models_root):
+            for user_id in os.listdir(self.models_root):
+                path = os.path.join(self.models_root, user_id, "metadata.json")
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        rows.append(self._row(user_id, json.load(f)))
+                except (OSError, ValueError) as e:
+                    print(f"[metadata_index] skipping {path}: {e}")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO user_metadata "
+                "(user_id, last_trained, last_expense_update, bundle_version, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            added = conn.total_changes - before
+            conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES ('backfilled_at', ?)",
+                         (datetime.utcnow().isoformat(),))
+            conn.execute("COMMIT")
+        return added
+
+    # ───── Reads ─────
+    def get_many(self, user_ids: list[str]) -> dict[str, dict]:
+        """{user_id: {last_trained, last_expense_update, bundle_version}} for the indexed ids."""
+        if not user_ids:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT user_id, {', '.join(FIELDS)} FROM user_metadata "
+                f"WHERE user_id IN ({','.join('?' * len(user_ids))})",
+                list(user_ids)
+            ).fetchall()
+        return {row["user_id"]: {field: row[field] for field in FIELDS} for row in rows}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> MetadataIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MetadataIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    added = MetadataIndex().backfill(force=True)
+    print(f"Indexed metadata for {added} more users in {METADATA_INDEX_DB_PATH}")
@@ -0,0 +1,274 @@
+"""Single-file, versioned bundle of a user's forecaster models.
+
+models/{uid}/forecaster.bundle replaces the per-category
+category_arima/*.pkl, category_lstm/*.pt and scaler_*.pkl files. Layout:
+
+    b"FPBUNDL1" | uint64 header length | JSON header | raw arrays
+
+The header holds the bundle version, each category's ARIMA spec (orders,
+trend), LSTM size, scaler range and training state, plus the offset, dtype
+and shape of every array. Arrays are little-endian and 64-byte aligned, so
+a reader mmaps the file and views only the arrays it needs.
+
+Bundles are written to a temp file in the same directory, fsynced and
+swapped in with os.replace. A reader that opened the previous version
+keeps its mapping of the old inode until it is done; new readers see the
+new version. Nothing here imports torch/pmdarima until a model is decoded.
+"""
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b"FPBUNDL1"
+BUNDLE_NAME = "forecaster.bundle"
+ALIGN = 64
+
+
+def bundle_path(user_id: str, models_root: str = "./models") -> str:
+    return os.path.join(models_root, user_id, BUNDLE_NAME)
+
+
+# ───── Encoding: models -> (meta, arrays) ─────
+def encode_arima(model) -> tuple[dict, dict]:
+    res = model.arima_res_
+    meta = {
+        "order": list(model.order),
+        "seasonal_order": list(model.seasonal_order),
+        "trend": model.trend,
+        "with_intercept": bool(model.with_intercept),
+        "method": model.method,
+        "maxiter": model.maxiter,
+    }
+    arrays = {
+        "params": np.asarray(res.params, dtype="<f8"),
+        "endog": np.asarray(res.model.endog, dtype="<f8").ravel(),
+    }
+    return meta, arrays
+
+
+def encode_lstm(state_dict) -> tuple[dict, dict]:
+    arrays = {k: v.detach().cpu().numpy().astype("<f4") for k, v in state_dict.items()}
+    return {"hidden": int(arrays["lstm.weight_hh_l0"].shape[1])}, arrays
+
+
+def encode_scaler(scaler) -> tuple[dict, dict]:
+    meta = {"feature_range": list(scaler.feature_range), "n_samples_seen": int(scaler.n_samples_seen_)}
+    arrays = {k: np.asarray(getattr(scaler, k), dtype="<f8")
+              for k in ("min_", "scale_", "data_min_", "data_max_", "data_range_")}
+    return meta, arrays
+
+
+def encode_category(arima=None, lstm_state=None, scaler=None, state=None, extra=None) -> dict:
+    """Everything stored for one category, as {"meta": {...}, "arrays": {...}}.
+    Arrays are keyed "<part>/<name>" with part in arima, lstm, scaler."""
+    meta = {"state": state, **(extra or {})}
+    arrays = {}
+    for part, obj, encoder in (("arima", arima, encode_arima), ("lstm", lstm_state, encode_lstm),
+                               ("scaler", scaler, encode_scaler)):
+        if obj is None:
+            meta[part] = None
+            continue
+        meta[part], part_arrays = encoder(obj)
+        arrays.update({f"{part}/{k}": v for k, v in part_arrays.items()})
+    return {"meta": meta, "arrays": arrays}
+
+
+# ───── Decoding ─────
+def decode_arima(meta: dict, arrays: dict):
+    """Rebuild a fitted pmdarima ARIMA from its parameters without refitting
+    (smoothing the stored series with the stored params)."""
+    import warnings
+    import pmdarima as pm
+    import statsmodels.api as sm
+    from pmdarima.compat import statsmodels as sm_compat
+
+    model = pm.ARIMA(order=tuple(meta["order"]), seasonal_order=tuple(meta["seasonal_order"]),
+                     trend=meta["trend"], with_intercept=meta["with_intercept"], method=meta["method"],
+                     maxiter=meta["maxiter"], suppress_warnings=True)
+    # same trend resolution as pmdarima's own fit
+    trend = meta["trend"] if meta["trend"] is not None else ("c" if meta["with_intercept"] else None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        sarimax = sm.tsa.statespace.SARIMAX(
+            endog=np.array(arrays["endog"]), order=model.order,
+            seasonal_order=sm_compat.check_seasonal_order(model.seasonal_order), trend=trend,
+        )
+        model.arima_res_ = sarimax.smooth(np.array(arrays["params"]))
+    sm_compat.bind_df_model(sarimax, model.arima_res_)
+    model.fit_with_exog_ = False
+    model.nobs_ = len(arrays["endog"])
+    model.pkg_version_ = pm.__version__
+    return model
+
+
+def decode_lstm(meta: dict, arrays: dict):
+    import torch
+    from future_prediction.lstm_training import LSTMRegressor
+
+    model = LSTMRegressor(hidden=meta["hidden"])
+    model.load_state_dict({k: torch.from_numpy(np.array(v)) for k, v in arrays.items()})
+    model.eval()
+    return model
+
+
+def decode_scaler(meta: dict, arrays: dict):
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler(feature_range=tuple(meta["feature_range"]))
+    for k, v in arrays.items():
+        setattr(scaler, k, np.array(v))
+    scaler.n_samples_seen_ = meta["n_samples_seen"]
+    scaler.n_features_in_ = len(arrays["scale_"])
+    return scaler
+
+
+_DECODERS = {"arima": decode_arima, "lstm": decode_lstm, "scaler": decode_scaler}
+
+def decode_part(entry: dict | None, part: str):
+    """Decode one part ("arima", "lstm" or "scaler") of an encode_category entry."""
+    if entry is None or not entry["meta"].get(part):
+        return None
+    prefix = f"{part}/"
+    arrays = {k[len(prefix):]: v for k, v in entry["arrays"].items() if k.startswith(prefix)}
+    return _DECODERS[part](entry["meta"][part], arrays)
+
+
+# ───── File I/O ─────
+def write_bundle(path: str, categories: dict, user_id: str | None = None, version: int | None = None) -> int:
+    """Atomically write {category: encode_category(...)}. Returns the version,
+    by default one more than the bundle being replaced."""
+    if version is None:
+        version = (read_header(path) or {}).get("version", 0) + 1
+
+    entries, blobs, offset = {}, [], 0
+    cat_meta = {}
+    for cat, encoded in categories.items():
+        cat_meta[cat] = encoded["meta"]
+        for name, arr in encoded["arrays"].items():
+            arr = np.ascontiguousarray(arr)
+            if arr.dtype.byteorder == ">" or (arr.dtype.byteorder == "=" and not np.little_endian):
+                arr = arr.astype(arr.dtype.newbyteorder("<"))
+            entries[f"{cat}/{name}"] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+            blobs.append((offset, arr))
+            offset += -(-arr.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({
+        "format": 1,
+        "version": version,
+        "user_id": user_id,
+        "created_at": datetime.utcnow().isoformat(),
+        "categories": cat_meta,
+        "arrays": entries,
+    }).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for blob_offset, arr in blobs:
+                f.seek(data_start + blob_offset)
+                f.write(arr.tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return version
+
+
+class ModelBundle:
+    """Read-only view of a bundle file (mmapped)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a forecaster bundle")
+        (header_len,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._mm[start:start + header_len])
+        self._data_start = -(-(start + header_len) // ALIGN) * ALIGN
+        self.stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @property
+    def version(self) -> int:
+        return self.header["version"]
+
+    @property
+    def categories(self) -> dict:
+        return self.header["categories"]
+
+    def _arrays(self, prefix: str) -> dict:
+        out = {}
+        for name, e in self.header["arrays"].items():
+            if name.startswith(prefix):
+                dtype = np.dtype(e["dtype"])
+                count = int(np.prod(e["shape"])) if e["shape"] else 1
+                arr = np.frombuffer(self._mm, dtype=dtype, count=count, offset=self._data_start + e["offset"])
+                out[name[len(prefix):]] = arr.reshape(e["shape"])
+        return out
+
+    def nbytes(self, category: str) -> int:
+        return sum(a.nbytes for a in self._arrays(f"{category}/").values())
+
+    def encoded(self, category: str) -> dict | None:
+        """The category as stored, in encode_category form (arrays copied out
+        of the mapping), for carrying it over into the next bundle."""
+        if category not in self.categories:
+            return None
+        arrays = {k: np.array(v) for k, v in self._arrays(f"{category}/").items()}
+        return {"meta": self.categories[category], "arrays": arrays}
+
+    def load(self, category: str, parts=("arima", "lstm", "scaler")) -> dict | None:
+        """{"arima", "lstm", "scaler", "state"} for a category (None when absent)."""
+        meta = self.categories.get(category)
+        if meta is None:
+            return None
+        out = {"state": meta.get("state")}
+        for part in parts:
+            out[part] = _DECODERS[part](meta[part], self._arrays(f"{category}/{part}/")) if meta.get(part) else None
+        return out
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # arrays still viewing the mapping; freed with them
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_bundle(path: str) -> ModelBundle | None:
+    try:
+        return ModelBundle(path)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_header(path: str) -> dict | None:
+    """Just the JSON header (version, categories' meta), without mapping arrays."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            return json.loads(f.read(header_len))
+    except (OSError, ValueError, struct.error):
+        return None
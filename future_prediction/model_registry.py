@@ -0,0 +1,185 @@
+import os
+import threading
+from collections import OrderedDict
+
+from future_prediction.model_bundle import bundle_path, open_bundle, read_header
+
+
+class ModelRegistry:
+    """In-process cache of per-(user, category) forecaster artifacts.
+
+    Holds the decoded ARIMA model, the LSTM and its scaler so /predict
+    doesn't deserialize them on every call. Models come from the user's
+    single-file bundle (model_bundle.py), or from the older per-category
+    files for users not retrained since. Entries are reloaded when the
+    bundle (or any legacy file) changes on disk and evicted
+    least-recently-used once the resident size (approximated by array/file
+    sizes) exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int, models_root: str = "./models"):
+        self.max_bytes = int(max_bytes)
+        self.models_root = models_root
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def paths(self, user_id: str, category: str) -> dict:
+        base = os.path.join(self.models_root, user_id)
+        return {
+            "arima": os.path.join(base, "category_arima", f"{category}_arima.pkl"),
+            "lstm": os.path.join(base, "category_lstm", f"{category}_lstm.pt"),
+            "scaler": os.path.join(base, "category_lstm", f"scaler_{category}.pkl"),
+        }
+
+    def bundle_path(self, user_id: str) -> str:
+        return bundle_path(user_id, self.models_root)
+
+    @staticmethod
+    def _bundle_stamp(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return ("bundle", st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _stamp(paths: dict):
+        stamp = []
+        for path in paths.values():
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _load_bundle(self, user_id: str, category: str, stamp) -> dict | None:
+        bundle = open_bundle(self.bundle_path(user_id))
+        if bundle is None:
+            return None
+        try:
+            meta = bundle.categories.get(category)
+            if not meta or not meta.get("lstm") or not meta.get("scaler"):
+                return None  # no LSTM trained for this category yet
+            models = bundle.load(category)
+            arima = models["arima"]
+            nbytes = bundle.nbytes(category)
+        finally:
+            bundle.close()
+        return {
+            "arima": arima,
+            "lstm": models["lstm"],
+            "scaler": models["scaler"],
+            "stamp": stamp,
+            "nbytes": nbytes,
+        }
+
+    def _load(self, user_id: str, category: str, paths: dict, stamp) -> dict | None:
+        if stamp[0] == "bundle":
+            return self._load_bundle(user_id, category, stamp)
+
+        import joblib, torch
+        from future_prediction.lstm_training import LSTMRegressor
+
+        if stamp[1] is None or stamp[2] is None:
+            return None  # no LSTM trained for this category yet
+
+        arima = None
+        if stamp[0] is not None:
+            try:
+                arima = joblib.load(paths["arima"])
+            except Exception as e:
+                print(f" ARIMA load failed for {user_id}/{category}: {e}")
+
+        lstm = LSTMRegressor()
+        lstm.load_state_dict(torch.load(paths["lstm"], map_location="cpu")["model"])
+        lstm.eval()
+        scaler = joblib.load(paths["scaler"])
+
+        return {
+            "arima": arima,
+            "lstm": lstm,
+            "scaler": scaler,
+            "stamp": stamp,
+            "nbytes": sum(s[1] for s in stamp if s is not None),
+        }
+
+    def get(self, user_id: str, category: str) -> dict | None:
+        """Returns {"arima", "lstm", "scaler"} for the category, or None if not trained."""
+        key = (user_id, category)
+        paths = self.paths(user_id, category)
+        stamp = self._bundle_stamp(self.bundle_path(user_id)) or self._stamp(paths)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["stamp"] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            if entry is not None:
+                self.reloads += 1
+                self._drop(key)
+
+        entry = self._load(user_id, category, paths, stamp)
+        if entry is None:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self.resident_bytes += entry["nbytes"]
+            while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return entry
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.resident_bytes -= entry["nbytes"]
+
+    def artifact_version(self, user_id: str, categories: list[str]):
+        """Cheap fingerprint (inode/mtime, size) of a user's forecaster files."""
+        stamp = self._bundle_stamp(self.bundle_path(user_id))
+        if stamp is not None:
+            return stamp
+        return tuple(self._stamp(self.paths(user_id, cat)) for cat in categories)
+
+    def has_models(self, user_id: str, categories: list[str]) -> bool:
+        """True if any category has a trained LSTM (bundle or legacy files)."""
+        header = read_header(self.bundle_path(user_id))
+        if header is not None:
+            return any((header["categories"].get(cat) or {}).get("lstm") for cat in categories)
+        return any(os.path.exists(self.paths(user_id, cat)["lstm"]) for cat in categories)
+
+    def invalidate(self, user_id: str | None = None):
+        with self._lock:
+            for key in [k for k in self._entries if user_id is None or k[0] == user_id]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+            }
+
+
+registry = ModelRegistry(
+    max_bytes=int(float(os.environ.get("FORECASTER_CACHE_MAX_MB", 256)) * 2**20)
+)
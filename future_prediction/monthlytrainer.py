@@ -1,33 +1,62 @@
-import os, subprocess, datetime
-import firebase_admin
-from firebase_admin import credentials, firestore
+import os, sys
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from future_prediction.training_queue import get_queue
+from future_prediction.change_detection import (
+    users_needing_retraining, stale_users, load_last_sweep, load_retry_users, save_last_sweep
+)
+from future_prediction.records_mirror import RECORDS_SOURCE, get_mirror
+from future_prediction.datastore import get_db
+from future_prediction.metadata_index import get_index
 
 # Firebase init
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.environ["GOOGLE_APPLICATION_CREDENTIALS"])
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-def train_all_users():
-    users_ref = db.collection("users").stream()
-    script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "future_prediction", "train_forcaster.py"))
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    python_venv_path = r"C:\Users\Abid computers\Desktop\finance_manager_backend\venv\Scripts\python.exe"
-
-    for doc in users_ref:
-        user_id = doc.id
-        print(f"Training for user {user_id}")
-        subprocess.Popen(
-            [python_venv_path, script_path, user_id],
-            cwd=project_root,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        meta_path = os.path.join("models", user_id, "metadata.json")
-        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
-        with open(meta_path, "w") as f:
-            f.write(json.dumps({"last_trained": datetime.datetime.utcnow().isoformat()}))
+db = get_db()
+
+def train_all_users(all_users: bool = False):
+    """Queue training for every user whose records changed since the last
+    sweep (or every user with all_users=True) and work through them with the
+    bounded pool (TRAINING_WORKERS). Users already queued or training are skipped.
+
+    The sweep is recorded only after the queue is drained. Users whose jobs
+    did not finish as done are kept for a retry: the next sweep checks them
+    against their metadata.json watermark instead of the sweep time, so a
+    failed or interrupted job is picked up again."""
+    queue = get_queue()
+    sweep_started = datetime.utcnow()
+    get_index().backfill()  # once per index file: users trained before it existed
+
+    if RECORDS_SOURCE == "mirror":
+        print(f"Records mirror synced: {get_mirror().sync()}")
+
+    if all_users:
+        user_ids = [doc.id for doc in db.collection("users").select([]).stream()]
+    else:
+        since = load_last_sweep()
+        user_ids = users_needing_retraining(since=since)
+        print(f"{len(user_ids)} user(s) changed since {since.isoformat() if since else 'the beginning'}")
+        changed = set(user_ids)
+        retry = stale_users([u for u in load_retry_users() if u not in changed])
+        if retry:
+            print(f"{len(retry)} user(s) retried from the last sweep")
+        user_ids += retry
+
+    jobs = {}
+    for user_id in user_ids:
+        job, created = queue.enqueue(user_id)
+        jobs[user_id] = job["id"]
+        if created:
+            print(f"Queued training for user {user_id} (job {job['id']})")
+        else:
+            print(f"User {user_id} already has job {job['id']} {job['status']}, skipping")
+
+    queue.drain()
+
+    unfinished = [u for u, job_id in jobs.items() if (queue.get(job_id) or {}).get("status") != "done"]
+    if unfinished:
+        print(f"{len(unfinished)} user(s) not trained, retried next sweep: {', '.join(unfinished)}")
+    save_last_sweep(sweep_started, retry=unfinished)
 
 if __name__ == "__main__":
     print("Running monthly training job...")
-    train_all_users()
+    train_all_users(all_users="--all" in sys.argv)
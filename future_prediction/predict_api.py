@@ -1,50 +1,183 @@
 from flask import Flask, request, jsonify
-import sys, os
+import sys, os, time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from future_prediction.predictor import predict_all_categories
-from future_prediction.utils import fetch_category_monthly_series
+from future_prediction.coalesce import SingleFlight
+from future_prediction.forecast_cache import ForecastCache
+from future_prediction.model_registry import registry
+from future_prediction.utils import fetch_monthly_category_frame, category_series, track_reads
+from future_prediction.records_mirror import RECORDS_SOURCE, get_mirror
 
 app = Flask(__name__)
 
+CATEGORIES = ["Food", "Utilities", "Travel", "Shopping", "Health"]
+
 @app.route("/predict", methods=["GET"])
 def predict():
     user_id = request.args.get("user_id")
     if not user_id:
         return jsonify({"error": "user_id is required"}), 400
 
-    categories = ["Food", "Utilities", "Travel", "Shopping", "Health"]
+    with track_reads() as reads:
+        result, status = predict_user(user_id)
+    return jsonify(result), status, {"X-Firestore-Reads": str(reads["reads"])}
+
+
+# ───── Forecast cache ─────
+# Results are cached per user and reused while the records version (digest of
+# every record document's id and update_time, see utils.records_version) and
+# the model artifacts are unchanged.
+# PREDICT_CACHE_SWR=1 serves a cached result immediately and revalidates it in
+# the background, at most every PREDICT_CACHE_REVALIDATE_SECONDS per user and
+# never serving anything older than PREDICT_CACHE_MAX_STALE_SECONDS.
+PREDICT_CACHE_SIZE = int(os.environ.get("PREDICT_CACHE_SIZE", 10_000))
+PREDICT_CACHE_SWR = os.environ.get("PREDICT_CACHE_SWR", "0") == "1"
+PREDICT_CACHE_REVALIDATE_SECONDS = float(os.environ.get("PREDICT_CACHE_REVALIDATE_SECONDS", 30))
+PREDICT_CACHE_MAX_STALE_SECONDS = float(os.environ.get("PREDICT_CACHE_MAX_STALE_SECONDS", 3600))
+
+forecast_cache = ForecastCache(PREDICT_CACHE_SIZE)
+_predict_flight = SingleFlight()
+_revalidate_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="forecast-revalidate")
+
+def predict_user(user_id: str, frame: pd.DataFrame | None = None) -> tuple[dict, int]:
+    """In-process entry point for /predict; returns (payload, http_status).
+
+    Concurrent calls for the same user share a single computation. `frame`
+    is the user's records when the caller already read them (the async
+    handlers do), otherwise they are read here.
+    """
+    categories = CATEGORIES
+
+    if PREDICT_CACHE_SWR:
+        entry = forecast_cache.get(user_id)
+        now = time.monotonic()
+        if entry is not None and now - entry["stored_at"] < PREDICT_CACHE_MAX_STALE_SECONDS:
+            forecast_cache.count_stale_hit()
+            if now - entry["checked_at"] >= PREDICT_CACHE_REVALIDATE_SECONDS:
+                forecast_cache.mark_checked(user_id)
+                _revalidate_pool.submit(_revalidate, user_id, categories)
+            return entry["result"], entry["status"]
+
+    return _predict_flight.do(user_id, _predict, user_id, categories, frame)
+
+
+def _revalidate(user_id, categories):
+    try:
+        _predict_flight.do(user_id, _predict, user_id, categories)
+    except Exception as e:
+        print(f"[ERROR] Background forecast refresh failed for {user_id}: {e}")
+
+
+def _predict(user_id, categories, frame=None):
+    from future_prediction.global_forecaster import model_version as global_model_version
+
+    # 🔹 Read the user's records once and count months of available data
+    if frame is None:
+        frame = fetch_monthly_category_frame(user_id, categories)
+    version = (frame.attrs.get("records_version"), registry.artifact_version(user_id, categories),
+               global_model_version())
+
+    cached = forecast_cache.lookup(user_id, version)
+    if cached is not None:
+        forecast_cache.mark_checked(user_id)
+        return cached["result"], cached["status"]
 
-    # 🔹 Count months of available data
-    total_months = 0
-    for cat in categories:
-        ts = fetch_category_monthly_series(user_id, cat)
-        total_months = max(total_months, len(ts))
+    result, status = _compute(user_id, categories, frame)
+    forecast_cache.put(user_id, version, result, status)
+    return result, status
+
+
+def _compute(user_id, categories, frame):
+    # imported here so torch is only loaded by processes that actually forecast
+    from future_prediction.predictor import predict_all_categories
+
+    total_months = max((len(category_series(frame, cat)) for cat in categories), default=0)
 
     # 🔹 Case 1: Enough data (>=12) → prefer trained models, fallback if missing
     if total_months >= 12:
-        models_ready = False
-        for cat in categories:
-            lstm_path = f"./models/{user_id}/category_lstm/{cat}_lstm.pt"
-            if os.path.exists(lstm_path):
-                models_ready = True
-                break
-        if not models_ready:
+        if not registry.has_models(user_id, categories):
             # ✅ Instead of returning "model_pending", give fallback
-            result = predict_all_categories(user_id, categories)
+            result = predict_all_categories(user_id, categories, frame=frame)
             if result.get("categoryExpenses"):
-                return jsonify(result), 200
-            return jsonify({"status": "model_pending"}), 202
+                return result, 200
+            return {"status": "model_pending"}, 202
 
     # 🔹 Case 2: Less than 12 months → fallback predictions
-    result = predict_all_categories(user_id, categories)
+    result = predict_all_categories(user_id, categories, frame=frame)
 
     if not result.get("categoryExpenses"):
-        return jsonify({"status": "not_enough_data"}), 422
+        return {"status": "not_enough_data"}, 422
+
+    return result, 200
+
+
+PREDICT_BATCH_MAX_USERS = int(os.environ.get("PREDICT_BATCH_MAX_USERS", 1000))
+PREDICT_BATCH_FETCH_THREADS = int(os.environ.get("PREDICT_BATCH_FETCH_THREADS", 8))
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Forecast many users in one call. Body: {"user_ids": [...]}
+
+    Records are fetched concurrently, then every user's LSTM windows are
+    forecast together in batched forward passes. A user whose records or
+    forecast fail gets {"status": "error", "error": ...} in the results; the
+    other users are unaffected.
+    """
+    from future_prediction.predictor import predict_users
+
+    body = request.get_json(silent=True)
+    user_ids = body.get("user_ids") if isinstance(body, dict) else None
+    if not isinstance(user_ids, list) or not user_ids:
+        return jsonify({"error": "user_ids must be a non-empty list"}), 400
+    if not all(isinstance(uid, str) and uid for uid in user_ids):
+        return jsonify({"error": "every user_id must be a non-empty string"}), 400
+    if len(user_ids) > PREDICT_BATCH_MAX_USERS:
+        return jsonify({"error": f"at most {PREDICT_BATCH_MAX_USERS} users per call"}), 413
+
+    categories = CATEGORIES
+    user_ids = list(dict.fromkeys(user_ids))
+
+    def load(uid):
+        with track_reads() as reads:
+            try:
+                frame = fetch_monthly_category_frame(uid, categories)
+            except Exception as e:
+                print(f"[ERROR] /predict_batch: reading records for {uid} failed: {e}")
+                frame = e
+        return frame, reads["reads"]
+
+    if RECORDS_SOURCE == "mirror":
+        # one local scan for every user, no Firestore reads
+        frames = get_mirror().monthly_category_frames(user_ids, categories)
+        loaded = {uid: (frames[uid], 0) for uid in user_ids}
+    else:
+        with ThreadPoolExecutor(max_workers=PREDICT_BATCH_FETCH_THREADS) as pool:
+            loaded = dict(zip(user_ids, pool.map(load, user_ids)))
+
+    errors = {uid: frame for uid, (frame, _) in loaded.items() if isinstance(frame, Exception)}
+    forecasts = predict_users(
+        {uid: frame for uid, (frame, _) in loaded.items() if uid not in errors}, categories, errors=errors
+    )
+    results = {}
+    for uid in user_ids:
+        if uid in errors:
+            print(f"[ERROR] /predict_batch: forecast for {uid} failed: {errors[uid]}")
+            results[uid] = {"status": "error", "error": str(errors[uid])}
+        elif forecasts[uid].get("categoryExpenses"):
+            results[uid] = forecasts[uid]
+        else:
+            results[uid] = {"status": "not_enough_data"}
+    total_reads = sum(reads for _, reads in loaded.values())
+    return jsonify({"results": results}), 200, {"X-Firestore-Reads": str(total_reads)}
+
 
-    return jsonify(result), 200
+@app.route("/model_cache_stats", methods=["GET"])
+def model_cache_stats():
+    """Hit rates of the forecaster registry and the forecast result cache."""
+    return jsonify({"models": registry.stats(), "forecasts": forecast_cache.stats()}), 200
 
 
 if __name__ == "__main__":
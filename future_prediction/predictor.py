@@ -1,65 +1,166 @@
-import joblib, torch
+import torch
 import numpy as np
-from future_prediction.utils import fetch_category_monthly_series
-from future_prediction.train_forcaster import LSTMRegressor
+from future_prediction.utils import fetch_category_monthly_series, fetch_monthly_category_frame, category_series
+from future_prediction.model_registry import registry
+from future_prediction.global_forecaster import get_global_forecaster, GLOBAL_FORECASTER, GLOBAL_MIN_HISTORY
 import pandas as pd 
 from sklearn.preprocessing import MinMaxScaler
 import os
 
-def predict_for_category(user_id: str, category: str):
-    ts = fetch_category_monthly_series(user_id, category)
+def _prepare_category(user_id: str, category: str, ts: pd.Series):
+    """Everything for one category up to the LSTM forward pass.
+
+    Returns ("done", (pred, source)) when no LSTM is needed, ("pending", job)
+    where job carries the input window for the batched pass, or ("global",
+    job) for the shared global forecaster.
+    """
     if len(ts) == 0:
-        return None, None
+        return "done", (None, None)
+
+    use_global = len(ts) >= GLOBAL_MIN_HISTORY and (
+        GLOBAL_FORECASTER == "all" or (GLOBAL_FORECASTER == "coldstart" and len(ts) < 12)
+    )
+    if use_global and get_global_forecaster() is not None:
+        return "global", {"user_id": user_id, "category": category, "values": ts.values}
 
     # ── Fallback for new users (<12 months) ──
     if len(ts) < 12:
         last_n = ts[-3:] if len(ts) >= 3 else ts
         avg_pred = float(last_n.mean()) if not last_n.empty else 0.0
         print(f" Using fallback avg for {user_id}/{category}: {avg_pred}")
-        return round(avg_pred, 2), "fallback"
+        return "done", (round(avg_pred, 2), "fallback")
 
     # ── Normal ARIMA+LSTM path ──
     ts.index = pd.to_datetime(ts.index)
     ts = ts.asfreq("MS")
 
-    arima_path = f"./models/{user_id}/category_arima/{category}_arima.pkl"
-    lstm_path = f"./models/{user_id}/category_lstm/{category}_lstm.pt"
-    scaler_path = f"./models/{user_id}/category_lstm/scaler_{category}.pkl"
+    models = registry.get(user_id, category)
+    if models is None:
+        if GLOBAL_FORECASTER == "coldstart" and get_global_forecaster() is not None:
+            return "global", {"user_id": user_id, "category": category, "values": ts.dropna().values}
+        last_n = ts[-3:]
+        avg_pred = float(last_n.mean())
+        print(f" No trained models for {user_id}/{category}, using fallback avg: {avg_pred}")
+        return "done", (round(avg_pred, 2), "fallback")
 
     ar_pred = None
-    if os.path.exists(arima_path):
+    if models["arima"] is not None:
         try:
-            arima = joblib.load(arima_path)
-            ar_pred = float(arima.predict(n_periods=1).iloc[0])
+            ar_pred = float(np.asarray(models["arima"].predict(n_periods=1))[0])
         except Exception as e:
             print(f" ARIMA failed for {category}: {e}")
 
-    lstm_model = LSTMRegressor()
-    lstm_model.load_state_dict(torch.load(lstm_path, map_location="cpu")["model"])
-    lstm_model.eval()
-    scaler: MinMaxScaler = joblib.load(scaler_path)
-
+    scaler: MinMaxScaler = models["scaler"]
     seq = scaler.transform(ts.values.reshape(-1, 1)).flatten()
     seq = np.pad(seq, (max(0, 12 - len(seq)), 0), mode="constant")[-12:]
-    x = torch.tensor(seq, dtype=torch.float32).unsqueeze(0).unsqueeze(-1)
 
-    with torch.no_grad():
-        lstm_scaled = lstm_model(x).item()
-    lstm_pred = float(scaler.inverse_transform([[lstm_scaled]])[0][0])
+    return "pending", {
+        "ar_pred": ar_pred,
+        "lstm": models["lstm"],
+        "scaler": scaler,
+        "seq": seq.astype(np.float32),
+    }
 
-    if ar_pred is not None:
-        return round((ar_pred + lstm_pred) / 2, 2), "ARIMA+LSTM"
+
+def _finish_category(job: dict):
+    lstm_pred = float(job["scaler"].inverse_transform([[job["lstm_scaled"]]])[0][0])
+    if job["ar_pred"] is not None:
+        return round((job["ar_pred"] + lstm_pred) / 2, 2), "ARIMA+LSTM"
     return round(lstm_pred, 2), "LSTM_only"
 
 
-def predict_all_categories(user_id: str, categories: list[str]):
+# ───── Batched LSTM inference ─────
+def stacked_lstm_forward(models: list, x: torch.Tensor) -> torch.Tensor:
+    """One forward pass of n different single-layer LSTMRegressors on x[i].
+
+    x is (n, seq_len, 1). Weights are stacked so every time step is a
+    single batched matmul across all models, with the same gate math as
+    nn.LSTM (gate order i, f, g, o).
+    """
+    w_ih = torch.stack([m.lstm.weight_ih_l0 for m in models])            # (n, 4H, 1)
+    w_hh = torch.stack([m.lstm.weight_hh_l0 for m in models])            # (n, 4H, H)
+    bias = torch.stack([m.lstm.bias_ih_l0 + m.lstm.bias_hh_l0 for m in models])
+    fc_w = torch.stack([m.fc.weight for m in models])                    # (n, 1, H)
+    fc_b = torch.stack([m.fc.bias for m in models])                      # (n, 1)
+
+    n, hidden = w_hh.shape[0], w_hh.shape[2]
+    h = x.new_zeros(n, hidden)
+    c = x.new_zeros(n, hidden)
+    x_proj = torch.bmm(x, w_ih.transpose(1, 2)) + bias.unsqueeze(1)    # (n, T, 4H)
+    for t in range(x.shape[1]):
+        gates = x_proj[:, t] + torch.bmm(w_hh, h.unsqueeze(-1)).squeeze(-1)
+        i, f, g, o = gates.chunk(4, dim=1)
+        c = torch.sigmoid(f) * c + torch.sigmoid(i) * torch.tanh(g)
+        h = torch.sigmoid(o) * torch.tanh(c)
+    return (torch.bmm(fc_w, h.unsqueeze(-1)).squeeze(-1) + fc_b).squeeze(-1)
+
+
+LSTM_BATCH_CHUNK = int(os.environ.get("LSTM_BATCH_CHUNK", 4096))
+
+def run_lstm_jobs(jobs: list[dict]):
+    """Fills job["lstm_scaled"] for every job, one forward pass per group of
+    architecturally compatible models (same hidden size, single layer)."""
+    groups = {}
+    for job in jobs:
+        lstm = job["lstm"].lstm
+        key = (lstm.hidden_size, lstm.num_layers, lstm.input_size)
+        groups.setdefault(key, []).append(job)
+
+    with torch.no_grad():
+        for (hidden, num_layers, input_size), group in groups.items():
+            if num_layers != 1 or input_size != 1:
+                for job in group:  # not stackable, run one by one
+                    x = torch.from_numpy(job["seq"]).unsqueeze(0).unsqueeze(-1)
+                    job["lstm_scaled"] = job["lstm"](x).item()
+                continue
+            for i in range(0, len(group), LSTM_BATCH_CHUNK):
+                chunk = group[i:i + LSTM_BATCH_CHUNK]
+                x = torch.from_numpy(np.stack([job["seq"] for job in chunk])).unsqueeze(-1)
+                if len(chunk) == 1:
+                    out = chunk[0]["lstm"](x)
+                else:
+                    out = stacked_lstm_forward([job["lstm"] for job in chunk], x)
+                for job, value in zip(chunk, out.tolist()):
+                    job["lstm_scaled"] = value
+
+
+def run_global_jobs(jobs: list[dict]):
+    """Fills job["result"] for every global-forecaster job in one forward pass."""
+    if not jobs:
+        return
+    forecaster = get_global_forecaster()
+    preds = forecaster.predict([(j["user_id"], j["category"], j["values"]) for j in jobs]) \
+        if forecaster is not None else [None] * len(jobs)
+    for job, pred in zip(jobs, preds):
+        if pred is None:  # model gone or category unknown to it
+            last_n = job["values"][-3:]
+            job["result"] = (round(float(np.mean(last_n)), 2), "fallback")
+        else:
+            job["result"] = (round(pred, 2), "global_LSTM")
+
+
+# ───── Public API ─────
+def predict_for_category(user_id: str, category: str, ts: pd.Series | None = None):
+    """Next-month forecast for one category. Pass `ts` to skip the Firestore read."""
+    if ts is None:
+        ts = fetch_category_monthly_series(user_id, category)
+    state, value = _prepare_category(user_id, category, ts)
+    if state == "done":
+        return value
+    if state == "global":
+        run_global_jobs([value])
+        return value["result"]
+    run_lstm_jobs([value])
+    return _finish_category(value)
+
+
+def _assemble(results: dict) -> dict:
     category_preds = {}
     sources = {}
     total = 0.0
     final_source = "ARIMA+LSTM"  # assume best, downgrade if fallback used
 
-    for cat in categories:
-        pred, source = predict_for_category(user_id, cat)
+    for cat, (pred, source) in results.items():
         if pred is not None:
             category_preds[cat] = pred
             sources[cat] = source
@@ -74,3 +175,84 @@ def predict_all_categories(user_id: str, categories: list[str]):
         "source": final_source,      # overall source
         "sources": sources           # per-category source (optional but useful)
     }
+
+
+def predict_users(frames: dict, categories: list[str], errors: dict | None = None) -> dict:
+    """Forecast many users at once: {user_id: frame} -> {user_id: result}.
+
+    All users' LSTM windows go through run_lstm_jobs together, so compatible
+    models share one batched forward pass; global-forecaster categories share
+    another. With `errors` given, a user whose forecast raises is left out of
+    the result and recorded as errors[user_id] = exception (a failed batched
+    pass is retried job by job) instead of failing every user.
+    """
+    per_user = {}
+    jobs, global_jobs = [], []
+
+    def failed(user_id, exc):
+        if errors is None:
+            raise exc
+        errors[user_id] = exc
+        per_user.pop(user_id, None)
+
+    for user_id, frame in frames.items():
+        results, user_jobs, user_global = {}, [], []
+        try:
+            for cat in categories:
+                state, value = _prepare_category(user_id, cat, category_series(frame, cat))
+                if state == "done":
+                    results[cat] = value
+                else:
+                    value["key"] = (user_id, cat)
+                    results[cat] = value
+                    (user_global if state == "global" else user_jobs).append(value)
+        except Exception as e:
+            failed(user_id, e)
+            continue
+        per_user[user_id] = results
+        jobs += user_jobs
+        global_jobs += user_global
+
+    def run_batched(runner, batch):
+        try:
+            runner(batch)
+            return batch
+        except Exception:
+            if errors is None:
+                raise
+        done = []
+        for job in batch:  # find the user(s) that broke the batch
+            try:
+                runner([job])
+                done.append(job)
+            except Exception as e:
+                failed(job["key"][0], e)
+        return done
+
+    for job in run_batched(run_lstm_jobs, jobs):
+        user_id, cat = job["key"]
+        if user_id in per_user:
+            try:
+                per_user[user_id][cat] = _finish_category(job)
+            except Exception as e:
+                failed(user_id, e)
+
+    for job in run_batched(run_global_jobs, global_jobs):
+        user_id, cat = job["key"]
+        if user_id in per_user:
+            per_user[user_id][cat] = job["result"]
+
+    out = {}
+    for user_id, results in list(per_user.items()):
+        try:
+            out[user_id] = _assemble(results)
+        except Exception as e:
+            failed(user_id, e)
+    return out
+
+
+def predict_all_categories(user_id: str, categories: list[str], frame: pd.DataFrame | None = None):
+    """Forecast every category from one month x category frame (read once if not given)."""
+    if frame is None:
+        frame = fetch_monthly_category_frame(user_id, categories)
+    return predict_users({user_id: frame}, categories)[user_id]
@@ -0,0 +1,334 @@
+"""Local SQLite mirror of users/*/records for fleet-wide reads.
+
+Every users/{uid}/records/{YYYY-MM} document becomes one `records` row
+plus one `category_expenses` row per category. Rows are keyed and indexed
+by month, so cross-user scans ("every user's Food spend since 2024-01")
+are one indexed SQL query instead of one Firestore stream per user.
+
+sync() refreshes the mirror incrementally from document update times:
+  - with RECORDS_UPDATED_FIELD set (see change_detection.py) only documents
+    updated after the last sync are read, filtered server-side;
+  - otherwise a field-masked collection-group scan lists every document's
+    update_time, and only new/changed documents are fetched in full
+    (get_all, in batches). The scan also drops rows whose documents were
+    deleted.
+
+The Firestore client is injectable, so the sync can run against a client
+pointed at the Firestore emulator or any in-memory stand-in with the same
+collection_group/select/where/stream/get_all surface.
+
+    python future_prediction/records_mirror.py [--full]
+
+RECORDS_SOURCE=mirror makes the batch readers use the mirror: /predict_batch,
+train_global.py, the monthly trainer's change detection (it syncs first) and
+batch budgets (pregenerate_budgets.py). Per-user request paths (/predict,
+/generate_budget, ...) and the per-user trainer always read Firestore, since
+the mirror is only as fresh as its last sync.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MIRROR_DB_PATH = os.environ.get(
+    "RECORDS_MIRROR_DB", os.path.join(PROJECT_ROOT, "models", "records_mirror.sqlite3")
+)
+RECORDS_SOURCE = os.environ.get("RECORDS_SOURCE", "firestore").lower()
+RECORDS_UPDATED_FIELD = os.environ.get("RECORDS_UPDATED_FIELD")
+SYNC_FETCH_BATCH = int(os.environ.get("MIRROR_SYNC_FETCH_BATCH", 300))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    user_id       TEXT NOT NULL,
+    month         TEXT NOT NULL,
+    total_income  REAL,
+    spent_amount  REAL,
+    is_empty      INTEGER NOT NULL DEFAULT 0,
+    update_time   TEXT,
+    PRIMARY KEY (user_id, month)
+);
+CREATE TABLE IF NOT EXISTS category_expenses (
+    user_id   TEXT NOT NULL,
+    month     TEXT NOT NULL,
+    category  TEXT NOT NULL,
+    amount    REAL NOT NULL,
+    PRIMARY KEY (user_id, month, category)
+);
+CREATE INDEX IF NOT EXISTS records_month ON records(month);
+CREATE INDEX IF NOT EXISTS category_expenses_month ON category_expenses(month, category);
+CREATE TABLE IF NOT EXISTS deletions (
+    user_id     TEXT PRIMARY KEY,
+    deleted_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _naive_utc(dt):
+    return dt.replace(tzinfo=None) if dt is not None and dt.tzinfo is not None else dt
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RecordsMirror:
+    def __init__(self, db_path: str = MIRROR_DB_PATH, client=None):
+        self.db_path = db_path
+        self._client = client
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @property
+    def client(self):
+        if self._client is None:
+            from future_prediction.datastore import get_db  # Firestore, emulator or DATASTORE=fake
+            self._client = get_db()
+        return self._client
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ───── Sync ─────
+    def _state(self, conn, key):
+        row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _write_doc(conn, user_id: str, snap):
+        data = snap.to_dict() or {}
+        month = snap.id
+        conn.execute("DELETE FROM category_expenses WHERE user_id = ? AND month = ?", (user_id, month))
+        conn.execute(
+            "INSERT OR REPLACE INTO records (user_id, month, total_income, spent_amount, is_empty, update_time) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, month, _float(data.get("totalIncome")), _float(data.get("spentAmount")), int(not data),
+             _naive_utc(snap.update_time).isoformat() if snap.update_time is not None else None)
+        )
+        rows = [(user_id, month, cat, _float(amount))
+                for cat, amount in (data.get("categoryExpenses") or {}).items() if _float(amount) is not None]
+        conn.executemany(
+            "INSERT OR REPLACE INTO category_expenses (user_id, month, category, amount) VALUES (?, ?, ?, ?)", rows
+        )
+
+    def sync(self, full: bool = False) -> dict:
+        """Bring the mirror up to date. `full` ignores RECORDS_UPDATED_FIELD and
+        rescans every document (which also removes deleted ones)."""
+        started = time.perf_counter()
+        sync_started = datetime.utcnow()
+        stats = {"mode": None, "scanned": 0, "upserted": 0, "deleted": 0}
+
+        with self._connect() as conn:
+            last_sync = self._state(conn, "last_sync")
+            query = self.client.collection_group("records")
+
+            if RECORDS_UPDATED_FIELD and last_sync and not full:
+                stats["mode"] = "server_filter"
+                since = datetime.fromisoformat(last_sync)
+                changed = list(query.where(RECORDS_UPDATED_FIELD, ">", since).stream())
+                stats["scanned"] = len(changed)
+                conn.execute("BEGIN")
+                for snap in changed:
+                    self._write_doc(conn, snap.reference.parent.parent.id, snap)
+                conn.execute("COMMIT")
+                stats["upserted"] = len(changed)
+            else:
+                stats["mode"] = "scan"
+                known = {
+                    (u, m): t for u, m, t in conn.execute("SELECT user_id, month, update_time FROM records")
+                }
+                seen, stale = set(), []
+                for snap in query.select([]).stream():  # names and update times only
+                    user_ref = snap.reference.parent.parent
+                    if user_ref is None:
+                        continue
+                    key = (user_ref.id, snap.id)
+                    seen.add(key)
+                    updated = _naive_utc(snap.update_time)
+                    if known.get(key) != (updated.isoformat() if updated is not None else None):
+                        stale.append(snap.reference)
+                stats["scanned"] = len(seen)
+
+                for i in range(0, len(stale), SYNC_FETCH_BATCH):
+                    batch = list(self.client.get_all(stale[i:i + SYNC_FETCH_BATCH]))
+                    conn.execute("BEGIN")
+                    for snap in batch:
+                        if snap.exists:
+                            self._write_doc(conn, snap.reference.parent.parent.id, snap)
+                    conn.execute("COMMIT")
+                    stats["upserted"] += sum(1 for s in batch if s.exists)
+
+                gone = [key for key in known if key not in seen]
+                conn.execute("BEGIN")
+                for user_id, month in gone:
+                    conn.execute("DELETE FROM records WHERE user_id = ? AND month = ?", (user_id, month))
+                    conn.execute("DELETE FROM category_expenses WHERE user_id = ? AND month = ?", (user_id, month))
+                    conn.execute("INSERT OR REPLACE INTO deletions (user_id, deleted_at) VALUES (?, ?)",
+                                 (user_id, sync_started.isoformat()))
+                conn.execute("COMMIT")
+                stats["deleted"] = len(gone)
+
+            conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_sync', ?)",
+                         (sync_started.isoformat(),))
+
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    # ───── Reads ─────
+    def category_long(self, categories=None, user_ids=None, months_back=None) -> pd.DataFrame:
+        """One scan: rows of (user_id, month, category, amount)."""
+        query, params = "SELECT user_id, month, category, amount FROM category_expenses WHERE 1=1", []
+        if categories is not None:
+            query += f" AND category IN ({','.join('?' * len(categories))})"
+            params += list(categories)
+        if user_ids is not None:
+            query += f" AND user_id IN ({','.join('?' * len(user_ids))})"
+            params += list(user_ids)
+        if months_back is not None:
+            cutoff = pd.to_datetime(datetime.now()) - pd.DateOffset(months=months_back)
+            query += " AND month >= ?"
+            params.append(cutoff.strftime("%Y-%m-%d"))  # "YYYY-MM" ids sort before their own month's days
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    @staticmethod
+    def _users_filter(user_ids, column="user_id"):
+        if user_ids is None:
+            return "", []
+        return f" AND {column} IN ({','.join('?' * len(user_ids))})", list(user_ids)
+
+    def watermarks(self, user_ids=None) -> dict:
+        """{user_id: latest update_time (naive UTC) of non-empty records}, the
+        same watermark utils.fetch_records_watermark computes."""
+        where, params = self._users_filter(user_ids)
+        query = f"SELECT user_id, MAX(update_time) FROM records WHERE is_empty = 0{where} GROUP BY user_id"
+        with self._connect() as conn:
+            return {u: datetime.fromisoformat(t) for u, t in conn.execute(query, params) if t}
+
+    def last_updates(self, user_ids=None) -> dict:
+        """{user_id: latest change (naive UTC)}: the newest update_time of any
+        record document, cleared ones included, or the sync that found one of
+        the user's documents deleted. Deleting or clearing an older month
+        therefore moves it too, unlike the records watermark."""
+        where, params = self._users_filter(user_ids)
+        query = f"""
+            SELECT user_id, MAX(t) FROM (
+                SELECT user_id, update_time AS t FROM records WHERE 1=1{where}
+                UNION ALL
+                SELECT user_id, deleted_at AS t FROM deletions WHERE 1=1{where}
+            ) GROUP BY user_id
+        """
+        with self._connect() as conn:
+            return {u: datetime.fromisoformat(t) for u, t in conn.execute(query, params + params) if t}
+
+    def record_versions(self, user_ids=None) -> dict:
+        """{user_id: utils.records_version of the user's mirrored documents}."""
+        from future_prediction.utils import records_version
+
+        where, params = self._users_filter(user_ids)
+        pairs = {}
+        with self._connect() as conn:
+            for u, month, updated in conn.execute(
+                f"SELECT user_id, month, update_time FROM records WHERE 1=1{where}", params
+            ):
+                pairs.setdefault(u, []).append((month, updated))
+        wanted = list(user_ids) if user_ids is not None else list(pairs)
+        return {u: records_version(pairs.get(u, [])) for u in wanted}
+
+    def user_ids(self) -> list[str]:
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT DISTINCT user_id FROM records ORDER BY user_id")]
+
+    def budget_records(self, user_ids, months: int = 0) -> dict:
+        """{user_id: [record dicts with month, totalIncome, spentAmount,
+        categoryExpenses]} for the latest `months` months (0 = all)."""
+        placeholders = ",".join("?" * len(user_ids))
+        query = f"""
+            SELECT user_id, month, total_income, spent_amount FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY month DESC) AS rn
+                FROM records WHERE user_id IN ({placeholders})
+            ) WHERE ? = 0 OR rn <= ?
+        """
+        out = {uid: [] for uid in user_ids}
+        with self._connect() as conn:
+            rows = conn.execute(query, [*user_ids, months, months]).fetchall()
+            cats = conn.execute(
+                f"SELECT user_id, month, category, amount FROM category_expenses WHERE user_id IN ({placeholders})",
+                list(user_ids)
+            ).fetchall()
+        by_month = {}
+        for uid, month, cat, amount in cats:
+            by_month.setdefault((uid, month), {})[cat] = amount
+        for uid, month, income, spent in rows:
+            record = {"month": month, "categoryExpenses": by_month.get((uid, month), {})}
+            if income is not None:
+                record["totalIncome"] = income
+            if spent is not None:
+                record["spentAmount"] = spent
+            out[uid].append(record)
+        return out
+
+    def monthly_category_frames(self, user_ids=None, categories=None, months_back=None) -> dict:
+        """{user_id: month x category frame}, shaped like
+        utils.fetch_monthly_category_frame, from one scan."""
+        long = self.category_long(categories, user_ids, months_back)
+        watermarks = self.watermarks(user_ids)
+        versions = self.record_versions(user_ids)
+        wanted = list(user_ids) if user_ids is not None else sorted(set(long["user_id"]) | set(versions))
+
+        frames = {}
+        grouped = dict(tuple(long.groupby("user_id"))) if not long.empty else {}
+        for uid in wanted:
+            part = grouped.get(uid)
+            if part is None:
+                frame = pd.DataFrame(index=pd.DatetimeIndex([], name="month"), dtype=float)
+            else:
+                frame = part.pivot(index="month", columns="category", values="amount")
+                frame.index = pd.DatetimeIndex(pd.to_datetime(frame.index), name="month")
+                frame.columns.name = None
+            if categories is not None:
+                frame = frame.reindex(columns=list(categories))
+            frame = frame.sort_index()
+            frame.attrs["last_update"] = watermarks.get(uid)
+            frame.attrs["records_version"] = versions[uid]
+            frames[uid] = frame
+        return frames
+
+    def monthly_category_frame(self, user_id: str, categories=None, months_back=None) -> pd.DataFrame:
+        return self.monthly_category_frames([user_id], categories, months_back)[user_id]
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+def get_mirror() -> RecordsMirror:
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = RecordsMirror()
+        return _mirror
+
+
+if __name__ == "__main__":
+    sys.path.append(PROJECT_ROOT)
+    stats = get_mirror().sync(full="--full" in sys.argv)
+    print(f"Records mirror synced to {MIRROR_DB_PATH}: {stats}")
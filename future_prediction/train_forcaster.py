@@ -1,51 +1,26 @@
 from dotenv import load_dotenv
 load_dotenv()
-import os, sys, torch, joblib, json
+import os, sys, torch, joblib, json, hashlib, shutil
 from datetime import datetime
 import numpy as np
 import pandas as pd
-from torch import nn
-from torch.utils.data import DataLoader
 from sklearn.preprocessing import MinMaxScaler
-import pmdarima as pm
 import pathlib
-
-from utils import fetch_category_monthly_series
-
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from future_prediction.utils import fetch_category_monthly_series, fetch_monthly_category_frame, category_series, fetch_records_watermark
+
+from future_prediction.arima_order import select_arima
+from future_prediction.model_bundle import bundle_path, open_bundle, write_bundle, encode_category, decode_part
+from future_prediction.lstm_training import LSTMRegressor, fit_lstm, LSTM_MAX_EPOCHS
+from future_prediction.metadata_index import get_index
 
 # ───── Firebase ─────
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.environ["GOOGLE_APPLICATION_CREDENTIALS"])
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-# ───── Torch dataset/model ─────
-class SeqDataset(torch.utils.data.Dataset):
-    def __init__(self, data, seq_len=12):
-        self.x, self.y = [], []
-        for i in range(len(data) - seq_len):
-            self.x.append(data[i:i + seq_len])
-            self.y.append(data[i + seq_len])
-        self.x = torch.tensor(self.x).unsqueeze(-1).float()
-        self.y = torch.tensor(self.y).float()
-
-    def __len__(self): return len(self.x)
-    def __getitem__(self, idx): return self.x[idx], self.y[idx]
-
-class LSTMRegressor(nn.Module):
-    def __init__(self, hidden=32):
-        super().__init__()
-        self.lstm = nn.LSTM(1, hidden, batch_first=True)
-        self.fc = nn.Linear(hidden, 1)
-
-    def forward(self, x):
-        _, (h, _) = self.lstm(x)
-        return self.fc(h[-1]).squeeze(-1)
+from future_prediction.datastore import get_db
+
+db = get_db()
 
 # ───── Helpers ─────
 def get_metadata_path(user_id: str):
@@ -58,33 +33,31 @@ def load_metadata(user_id: str):
             return json.load(f)
     return {}
 
-def save_metadata(user_id: str, last_expense_update: datetime):
+def save_metadata(user_id: str, last_expense_update: datetime | None, categories: dict | None = None,
+                  bundle_version: int | None = None):
+    """Writes metadata.json; `categories` holds per-category training state."""
     path = get_metadata_path(user_id)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    data = {
-        "last_trained": datetime.utcnow().isoformat(),
-        "last_expense_update": last_expense_update.isoformat()
-    }
-    with open(path, "w") as f:
+    data = load_metadata(user_id)
+    data["last_trained"] = datetime.utcnow().isoformat()
+    if last_expense_update is not None:
+        data["last_expense_update"] = last_expense_update.isoformat()
+    if categories is not None:
+        data["categories"] = {**data.get("categories", {}), **categories}
+    if bundle_version is not None:
+        data["bundle_version"] = bundle_version
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
         json.dump(data, f)
+    os.replace(tmp, path)
+    try:
+        get_index().upsert(user_id, data)
+    except Exception as e:  # metadata.json is authoritative; `metadata_index.py` rebuilds the index
+        print(f"[WARN] Metadata index not updated for {user_id}: {e}")
 
 def fetch_last_expense_update(user_id: str) -> datetime | None:
     """Find the latest modified record date from Firestore"""
-    records_ref = db.collection("users").document(user_id).collection("records")
-    docs = records_ref.stream()
-
-    latest = None
-    for doc in docs:
-        data = doc.to_dict()
-        if not data: 
-            continue
-        snapshot = doc._reference.get()
-        update_time = snapshot.update_time
-        if update_time:
-            dt = update_time.replace(tzinfo=None)  # strip tz
-            if latest is None or dt > latest:
-                latest = dt
-    return latest
+    return fetch_records_watermark(user_id)
 
 def needs_retraining(user_id: str) -> bool:
     meta = load_metadata(user_id)
@@ -109,8 +82,6 @@ def needs_retraining(user_id: str) -> bool:
 def ensure_user_dirs(user_id: str):
     base = os.path.join("./models", user_id)
     os.makedirs(base, exist_ok=True)
-    os.makedirs(os.path.join(base, "category_arima"), exist_ok=True)
-    os.makedirs(os.path.join(base, "category_lstm"), exist_ok=True)
     os.makedirs(os.path.join(base, "logs"), exist_ok=True)
     return base
 
@@ -139,79 +110,260 @@ def append_log(user_id: str, text: str):
 
 
 # ───── Training ─────
-def train_for_category(user_id: str, category: str):
-    ts = fetch_category_monthly_series(user_id, category)
+# TRAIN_MODE=auto (default) updates existing models in place when only new
+# months arrived: the saved ARIMA is updated with the new observations under
+# its existing order, and the LSTM checkpoint is fine-tuned for FINETUNE_EPOCHS.
+# A full refit runs when there is no usable previous state, past months were
+# edited, FULL_REFIT_DAYS have passed since the last full refit, or the saved
+# ARIMA's error on the new months exceeds DRIFT_MAPE. TRAIN_MODE=full always refits.
+# Full refits pick the ARIMA order via arima_order.select_arima (ARIMA_SEARCH).
+TRAIN_MODE = os.environ.get("TRAIN_MODE", "auto").lower()
+FULL_REFIT_DAYS = float(os.environ.get("FULL_REFIT_DAYS", 90))
+DRIFT_MAPE = float(os.environ.get("DRIFT_MAPE", 0.35))
+FINETUNE_EPOCHS = int(os.environ.get("FINETUNE_EPOCHS", 5))
+FINETUNE_LR = float(os.environ.get("FINETUNE_LR", 1e-3))
+FINETUNE_REPLAY = int(os.environ.get("FINETUNE_REPLAY", 3))  # older windows replayed while fine-tuning
+SEQ_LEN = 12
+
+def history_checksum(ts: pd.Series) -> str:
+    return hashlib.sha1(np.round(ts.values.astype(float), 2).tobytes()).hexdigest()
+
+def choose_training_mode(ts: pd.Series, state: dict | None, has_models: bool) -> tuple[str, str]:
+    """Returns (mode, reason) with mode in {"full", "incremental", "skip"}."""
+    if TRAIN_MODE == "full":
+        return "full", "TRAIN_MODE=full"
+    if not state or "last_month" not in state:
+        return "full", "no previous training state"
+    if not has_models:
+        return "full", "no saved models"
+
+    last_month = pd.Timestamp(state["last_month"])
+    old = ts[ts.index <= last_month]
+    if len(old) != state.get("n_obs") or history_checksum(old) != state.get("checksum"):
+        return "full", "past months changed"
+
+    last_full = state.get("last_full_refit")
+    if last_full and (datetime.utcnow() - datetime.fromisoformat(last_full)).days >= FULL_REFIT_DAYS:
+        return "full", f"scheduled refit (>{FULL_REFIT_DAYS:g} days)"
+
+    if len(ts) == len(old):
+        return "skip", "no new months"
+    return "incremental", f"{len(ts) - len(old)} new month(s)"
+
+def _log(user_id: str, msg: str):
+    print(msg)
+    append_log(user_id, msg)
+
+def train_for_category(user_id: str, category: str, ts: pd.Series | None = None,
+                       state: dict | None = None, previous: dict | None = None) -> dict | None:
+    """Train (or incrementally update) one category. `previous` is the
+    category's entry in the user's current model bundle. Returns the new
+    bundle entry, whose meta["state"] is the training state for
+    metadata.json, or None if nothing could be trained."""
+    if ts is None:
+        ts = fetch_category_monthly_series(user_id, category)
     if ts is None or len(ts) < 12:
-        msg = f"Not enough data for {user_id}/{category}"
-        print(msg)
-        append_log(user_id, msg)
-        return
+        _log(user_id, f"Not enough data for {user_id}/{category}")
+        return None
 
-    arima_dir = f"./models/{user_id}/category_arima"
-    lstm_dir = f"./models/{user_id}/category_lstm"
-    os.makedirs(arima_dir, exist_ok=True)
-    os.makedirs(lstm_dir, exist_ok=True)
+    has_models = previous is not None and previous["meta"].get("lstm") and previous["meta"].get("scaler")
+    mode, reason = choose_training_mode(ts, state, bool(has_models))
+    _log(user_id, f"{user_id}/{category}: {mode} ({reason})")
+    if mode == "skip":
+        return previous
 
-    arima_path = f"{arima_dir}/{category}_arima.pkl"
-    lstm_path = f"{lstm_dir}/{category}_lstm.pt"
+    new_obs = ts[ts.index > pd.Timestamp(state["last_month"])] if mode == "incremental" else None
 
     # ───── ARIMA ─────
+    arima = None
+    if mode == "incremental":
+        try:
+            arima = decode_part(previous, "arima")
+            forecast = np.asarray(arima.predict(n_periods=len(new_obs)), dtype=float)
+            actual = new_obs.values.astype(float)
+            mape = float(np.mean(np.abs(forecast - actual) / np.maximum(np.abs(actual), 1e-9)))
+            if mape > DRIFT_MAPE:
+                mode, arima = "full", None
+                _log(user_id, f"{user_id}/{category}: drift detected (MAPE {mape:.2f} > {DRIFT_MAPE}), full refit")
+            else:
+                arima.update(new_obs)
+        except Exception as e:
+            mode, arima = "full", None
+            _log(user_id, f"ARIMA update failed for {category} ({e}), full refit")
+
     try:
-        arima = pm.auto_arima(
-            ts, seasonal=True, m=12, suppress_warnings=True,
-            error_action='ignore', trace=False
-        )
-        joblib.dump(arima, arima_path)
-        msg = f"ARIMA saved for {user_id}/{category}"
-        print(msg)
-        append_log(user_id, msg)
+        if arima is None:
+            # ARIMA_SEARCH=fast starts from the order chosen last time
+            last = previous["meta"].get("arima") if previous is not None else None
+            cached = {"order": tuple(last["order"]), "seasonal_order": tuple(last["seasonal_order"])} if last else None
+            arima, info = select_arima(ts, cached=cached)
+            _log(user_id, f"ARIMA order {arima.order}{arima.seasonal_order} for {user_id}/{category} "
+                          f"({info['method']}, {info['seconds']}s)")
+        _log(user_id, f"ARIMA trained for {user_id}/{category} ({mode})")
     except Exception as e:
-        msg = f"ARIMA training failed for {category}: {e}"
-        print(msg)
-        append_log(user_id, msg)
+        arima = None
+        _log(user_id, f"ARIMA training failed for {category}: {e}")
 
     # ───── LSTM ─────
     try:
-        scaler = MinMaxScaler()
-        scaled = scaler.fit_transform(ts.values.reshape(-1, 1)).flatten()
-        joblib.dump(scaler, f"{lstm_dir}/scaler_{category}.pkl")
-
-        dataset = SeqDataset(scaled)
-        if len(dataset) == 0:
-            msg = f"Not enough LSTM data for {user_id}/{category}"
-            print(msg)
-            append_log(user_id, msg)
-            return
-
-        loader = DataLoader(dataset, batch_size=16, shuffle=True)
-        model = LSTMRegressor()
-        opt = torch.optim.Adam(model.parameters(), lr=1e-3)
-        loss_fn = nn.MSELoss()
-
-        for _ in range(50):
-            for x, y in loader:
-                opt.zero_grad()
-                loss = loss_fn(model(x), y)
-                loss.backward()
-                opt.step()
-
-        torch.save({"model": model.state_dict()}, lstm_path)
-        msg = f"LSTM saved for {user_id}/{category}"
-        print(msg)
-        append_log(user_id, msg)
+        if mode == "incremental":
+            # keep the original scaling so the fine-tuned weights stay consistent
+            scaler = decode_part(previous, "scaler")
+            scaled = scaler.transform(ts.values.reshape(-1, 1)).flatten()
+            model = decode_part(previous, "lstm")
+            fit = fit_lstm(model, scaled, FINETUNE_EPOCHS, seq_len=SEQ_LEN, windows=len(new_obs) + FINETUNE_REPLAY,
+                           early_stopping=False, lr=FINETUNE_LR)
+        else:
+            scaler = MinMaxScaler()
+            scaled = scaler.fit_transform(ts.values.reshape(-1, 1)).flatten()
+            if len(scaled) <= SEQ_LEN:
+                _log(user_id, f"Not enough LSTM data for {user_id}/{category}")
+                return None
+            model = LSTMRegressor()
+            fit = fit_lstm(model, scaled, LSTM_MAX_EPOCHS, seq_len=SEQ_LEN)
+
+        if fit["early_stopped"]:
+            stop = f"early-stopped at {fit['stopped_at']}/{fit['max_epochs']}, best {fit['best_epoch']}"
+        elif fit["stopped_at"] is not None:
+            stop = f"no early stop within {fit['max_epochs']}"
+        else:
+            stop = "no validation windows"  # fine-tune or short series
+        _log(user_id, f"LSTM trained for {user_id}/{category} ({mode}, {fit['epochs']} epochs, {stop})")
+    except Exception as e:
+        _log(user_id, f"LSTM training failed for {category}: {e}")
+        return None
+
+    now = datetime.utcnow().isoformat()
+    new_state = {
+        "last_month": ts.index[-1].strftime("%Y-%m-%d"),
+        "n_obs": int(len(ts)),
+        "checksum": history_checksum(ts),
+        "last_full_refit": now if mode == "full" else state.get("last_full_refit"),
+        "last_mode": mode,
+        "last_trained": now,
+        "lstm_epochs": fit["epochs"],
+    }
+    return encode_category(arima, model.state_dict(), scaler, new_state)
+
+
+def legacy_entries(user_id: str, categories: list[str], states: dict) -> dict:
+    """Bundle entries converted from the old per-category pickle/.pt files,
+    so users trained before bundles keep their incremental state."""
+    base = f"./models/{user_id}"
+    entries = {}
+    for cat in categories:
+        lstm_path = f"{base}/category_lstm/{cat}_lstm.pt"
+        scaler_path = f"{base}/category_lstm/scaler_{cat}.pkl"
+        arima_path = f"{base}/category_arima/{cat}_arima.pkl"
+        if not (os.path.exists(lstm_path) and os.path.exists(scaler_path)):
+            continue
+        try:
+            arima = joblib.load(arima_path) if os.path.exists(arima_path) else None
+            lstm_state = torch.load(lstm_path, map_location="cpu")["model"]
+            entries[cat] = encode_category(arima, lstm_state, joblib.load(scaler_path), states.get(cat))
+        except Exception as e:
+            print(f"Could not convert legacy models for {user_id}/{cat}: {e}")
+    return entries
+
+
+def remove_legacy_files(user_id: str):
+    for sub in ("category_arima", "category_lstm"):
+        shutil.rmtree(os.path.join("./models", user_id, sub), ignore_errors=True)
+
+
+# ───── Parallel training ─────
+# Categories are trained in a process pool (TRAIN_WORKERS, default one per
+# category up to the CPU count). Each worker gets TRAIN_TORCH_THREADS intra-op
+# threads (default: cores / workers) so workers don't oversubscribe the CPU.
+def _init_train_worker(torch_threads: int):
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already initialised in this process
+
+def _train_category_job(user_id: str, category: str, ts: pd.Series, state: dict | None,
+                        previous: dict | None, log_path: str | None):
+    """Runs one category (in a worker process when log_path is given, which
+    then gets its own per-category log file). result["entry"] is the
+    category's bundle entry, the previous one when nothing new was trained."""
+    global _current_log_file
+    if log_path is not None:
+        _current_log_file = log_path
+    started = datetime.utcnow()
+    try:
+        append_log(user_id, f"Training for {user_id}/{category}")
+        entry = train_for_category(user_id, category, ts, state, previous)
+        return {"category": category, "ok": True, "error": None,
+                "entry": entry or previous, "state": entry["meta"]["state"] if entry else None,
+                "seconds": (datetime.utcnow() - started).total_seconds()}
     except Exception as e:
-        msg = f"LSTM training failed for {category}: {e}"
+        append_log(user_id, f"Training crashed for {category}: {e}")
+        return {"category": category, "ok": False, "error": str(e), "entry": previous, "state": state,
+                "seconds": (datetime.utcnow() - started).total_seconds()}
+
+def train_all_categories(user_id: str, categories: list[str], states: dict | None = None,
+                         frame: pd.DataFrame | None = None, previous: dict | None = None) -> dict:
+    """Trains every category; returns {category: result} where result["state"]
+    is the category's new training state for metadata.json and result["entry"]
+    its model bundle entry. `previous` holds the current bundle's entries."""
+    global _current_log_file
+    states = states or {}
+    previous = previous or {}
+    # one Firestore read for all categories; workers never touch Firestore
+    if frame is None:
+        frame = fetch_monthly_category_frame(user_id, categories)
+    series = {cat: category_series(frame, cat) for cat in categories}
+
+    cpus = os.cpu_count() or 1
+    workers = min(len(categories), int(os.environ.get("TRAIN_WORKERS", cpus)))
+    torch_threads = int(os.environ.get("TRAIN_TORCH_THREADS", max(1, cpus // max(workers, 1))))
+
+    if workers <= 1:
+        results = {}
+        for cat in categories:
+            print(f"\nTraining for {user_id}/{cat}")
+            results[cat] = _train_category_job(user_id, cat, series[cat], states.get(cat), previous.get(cat), None)
+        return results
+
+    run_log = _current_log_file or start_new_log(user_id)
+    log_root, log_ext = os.path.splitext(run_log)
+    msg = f"Training {len(categories)} categories on {workers} workers x {torch_threads} torch threads"
+    print(msg)
+    append_log(user_id, msg)
+
+    results, crashed = {}, {}
+    ctx = multiprocessing.get_context("spawn")  # torch / gRPC state is not fork-safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_train_worker, initargs=(torch_threads,)) as pool:
+        futures = {
+            pool.submit(_train_category_job, user_id, cat, series[cat], states.get(cat), previous.get(cat),
+                        f"{log_root}_{cat}{log_ext}"): cat
+            for cat in categories
+        }
+        for fut in as_completed(futures):
+            cat = futures[fut]
+            try:
+                results[cat] = fut.result()
+            except Exception as e:  # a worker died; BrokenProcessPool then fails every pending category
+                crashed[cat] = e
+
+    # retry those categories one at a time in this process
+    for cat, e in crashed.items():
+        msg = f"{user_id}/{cat}: training worker crashed ({e!r}), retrying in-process"
         print(msg)
         append_log(user_id, msg)
-        
+        results[cat] = _train_category_job(user_id, cat, series[cat], states.get(cat), previous.get(cat),
+                                           f"{log_root}_{cat}{log_ext}")
+        _current_log_file = run_log  # _train_category_job switched it to the category's log
 
-
-def train_all_categories(user_id: str, categories: list[str]):
     for cat in categories:
-        msg = f"\nTraining for {user_id}/{cat}"
+        res = results[cat]
+        status = "ok" if res["ok"] else f"FAILED ({res['error']})"
+        msg = f"{user_id}/{cat}: {status}, {res['seconds']}s, log: {os.path.basename(log_root)}_{cat}{log_ext}"
         print(msg)
         append_log(user_id, msg)
-        train_for_category(user_id, cat) 
+    return results
 
 
 # ───── Entrypoint ─────
@@ -230,21 +382,38 @@ if __name__ == "__main__":
     print(f"Checking if retraining is needed for {user_id}...")
     append_log(user_id, f"Checking if retraining is needed for {user_id}...")
 
-    # if not needs_retraining(user_id):
-#     msg = "✅ Models are already up to date. Skipping training."
-#     print(msg)
-#     append_log(user_id, msg)
-#     sys.exit(0)
-
     msg = f"Starting training for {user_id}..."
     print(msg)
     append_log(user_id, msg)
 
-    train_all_categories(user_id, categories)
+    states = load_metadata(user_id).get("categories", {})
+    path = bundle_path(user_id)
+    bundle = open_bundle(path)
+    if bundle is not None:
+        previous = {cat: bundle.encoded(cat) for cat in categories if cat in bundle.categories}
+        bundle.close()
+    else:
+        previous = legacy_entries(user_id, categories, states)
+
+    frame = fetch_monthly_category_frame(user_id, categories)
+    results = train_all_categories(user_id, categories, states, frame=frame, previous=previous)
+
+    # one file per user, swapped in atomically; /predict keeps reading the
+    # previous version until the rename
+    entries = {cat: res["entry"] for cat, res in results.items() if res.get("entry")}
+    version = write_bundle(path, entries, user_id)
+    remove_legacy_files(user_id)
+    msg = f"Model bundle v{version} written for {user_id} ({len(entries)} categories)"
+    print(msg)
+    append_log(user_id, msg)
 
-    last_update = fetch_last_expense_update(user_id)
-    if last_update:
-        save_metadata(user_id, last_update)
+    # watermark of the data actually trained on, taken from the same stream
+    last_update = frame.attrs.get("last_update")
+    if last_update is not None:
+        last_update = last_update.replace(tzinfo=None)
+    save_metadata(user_id, last_update, {
+        cat: res["state"] for cat, res in results.items() if res.get("state")
+    }, bundle_version=version)
 
     msg = "Training finished ✅"
     print(msg)
@@ -0,0 +1,59 @@
+"""Train the shared GlobalLSTM on every user's monthly category series.
+
+    python future_prediction/train_global.py [--epochs N] [--user-buckets N]
+
+Reads each user's records once (GLOBAL_FETCH_THREADS at a time), trains in
+large in-memory batches and writes GLOBAL_MODEL_PATH atomically, so a
+running predict API picks the new model up on its next request.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from future_prediction.utils import db, count_reads, fetch_monthly_category_frame, category_series
+from future_prediction.records_mirror import RECORDS_SOURCE, get_mirror
+from future_prediction.global_forecaster import (
+    train_global, save_global, GLOBAL_MODEL_PATH, GLOBAL_EPOCHS, GLOBAL_USER_BUCKETS
+)
+
+CATEGORIES = ["Food", "Utilities", "Travel", "Shopping", "Health"]
+GLOBAL_FETCH_THREADS = int(os.environ.get("GLOBAL_FETCH_THREADS", 8))
+
+
+def load_all_series(categories: list[str]) -> list[tuple]:
+    if RECORDS_SOURCE == "mirror":
+        frames = get_mirror().monthly_category_frames(categories=categories)
+        print(f"Read {len(frames)} users from the records mirror")
+        return [(uid, cat, category_series(frame, cat).values)
+                for uid, frame in frames.items() for cat in categories if len(category_series(frame, cat))]
+
+    user_ids = []
+    for doc in db.collection("users").select([]).stream():
+        count_reads()
+        user_ids.append(doc.id)
+    print(f"Fetching records for {len(user_ids)} users...")
+
+    def load(uid):
+        frame = fetch_monthly_category_frame(uid, categories)
+        return [(uid, cat, category_series(frame, cat).values) for cat in categories]
+
+    series = []
+    with ThreadPoolExecutor(max_workers=GLOBAL_FETCH_THREADS) as pool:
+        for user_series in pool.map(load, user_ids):
+            series.extend(s for s in user_series if len(s[2]))
+    return series
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--epochs", type=int, default=GLOBAL_EPOCHS)
+    parser.add_argument("--user-buckets", type=int, default=GLOBAL_USER_BUCKETS)
+    parser.add_argument("--out", default=GLOBAL_MODEL_PATH)
+    args = parser.parse_args()
+
+    series = load_all_series(CATEGORIES)
+    model, stats = train_global(series, CATEGORIES, epochs=args.epochs, user_buckets=args.user_buckets)
+    save_global(model, CATEGORIES, stats, args.out)
+    print(f"Global forecaster saved to {args.out} ({stats['windows']} windows, {stats['series']} series) ✅")
@@ -0,0 +1,341 @@
+"""Persistent, bounded queue for per-user forecaster training jobs.
+
+Jobs live in a SQLite file so they survive restarts, a user can only have
+one queued/running job at a time, and a fixed pool of worker threads runs
+train_forcaster.py for at most TRAINING_WORKERS users concurrently.
+
+Run a dedicated worker (instead of the in-process pool) with:
+    python future_prediction/training_queue.py
+On SIGTERM/SIGINT it stops claiming jobs and lets the running ones finish
+for up to TRAINING_STOP_TIMEOUT seconds; trainers still running then are
+killed and their jobs requeued, so no job is left 'running'.
+"""
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRAIN_SCRIPT = os.path.join(PROJECT_ROOT, "future_prediction", "train_forcaster.py")
+QUEUE_DB_PATH = os.environ.get(
+    "TRAINING_QUEUE_DB", os.path.join(PROJECT_ROOT, "models", "training_jobs.sqlite3")
+)
+TRAINER_PYTHON = os.environ.get("TRAINER_PYTHON", sys.executable)
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", 2))
+TRAINING_JOB_TIMEOUT = float(os.environ.get("TRAINING_JOB_TIMEOUT", 3600))
+RECOVER_GRACE_SECONDS = 300  # slack past the timeout before a 'running' job is presumed lost
+TRAINING_STOP_TIMEOUT = float(os.environ.get("TRAINING_STOP_TIMEOUT", 25))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    started_at  TEXT,
+    finished_at TEXT,
+    worker      TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    returncode  INTEGER,
+    output      TEXT,
+    error       TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_one_active_per_user
+    ON jobs(user_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);
+"""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class TrainingQueue:
+    def __init__(self, db_path: str = QUEUE_DB_PATH, num_workers: int = TRAINING_WORKERS):
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self._workers = []
+        self._workers_pid = None
+        self._workers_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._procs = {}  # job id -> running trainer Popen
+        self._killed = set()  # job ids whose trainer stop() killed
+        self._procs_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()  # also rolls back an unfinished BEGIN IMMEDIATE
+
+    # ───── Producer side ─────
+    def enqueue(self, user_id: str) -> tuple[dict, bool]:
+        """Queue a training job. Returns (job, created); created is False when
+        the user already had a queued or running job, which is returned instead."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = conn.execute(
+                "SELECT * FROM jobs WHERE user_id = ? AND status IN ('queued', 'running')",
+                (user_id,)
+            ).fetchone()
+            if existing is not None:
+                conn.execute("COMMIT")
+                return dict(existing), False
+            cur = conn.execute(
+                "INSERT INTO jobs (user_id, status, created_at) VALUES (?, 'queued', ?)",
+                (user_id, _now())
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (cur.lastrowid,)).fetchone()
+            conn.execute("COMMIT")
+        self._wakeup.set()
+        return dict(job), True
+
+    def get(self, job_id: int) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, user_id: str | None = None, status: str | None = None, limit: int = 50) -> list[dict]:
+        query, params = "SELECT * FROM jobs WHERE 1=1", []
+        if user_id:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(int(limit))
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(query, params).fetchall()]
+
+    def wait(self, job_id: int, timeout: float | None = None, poll: float = 1.0) -> dict | None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] not in ACTIVE_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll)
+
+    # ───── Worker side ─────
+    def _worker_name(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+    def recover(self):
+        """Requeue jobs left 'running' by a process on this host that no longer
+        exists, and any 'running' job (from any host) started more than
+        TRAINING_JOB_TIMEOUT ago: its trainer would have been killed by then,
+        so it was lost with a restarted container or a reused PID."""
+        host = socket.gethostname()
+        expired = (datetime.utcnow() - timedelta(seconds=TRAINING_JOB_TIMEOUT + RECOVER_GRACE_SECONDS)).isoformat()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in conn.execute("SELECT id, worker, started_at FROM jobs WHERE status = 'running'").fetchall():
+                w_host, _, rest = (row["worker"] or "").partition(":")
+                pid = rest.partition(":")[0]
+                dead = w_host == host and pid.isdigit() and not _pid_alive(int(pid))
+                timed_out = row["started_at"] is None or row["started_at"] < expired
+                if not dead and not timed_out:
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL WHERE id = ?",
+                    (row["id"],)
+                )
+                print(f"Requeued interrupted training job {row['id']}")
+            conn.execute("COMMIT")
+
+    def _claim(self) -> dict | None:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (_now(), self._worker_name(), row["id"])
+            )
+            conn.execute("COMMIT")
+        return dict(row)
+
+    def _finish(self, job_id: int, status: str, returncode=None, output=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, returncode = ?, output = ?, error = ? WHERE id = ?",
+                (status, _now(), returncode, output, error, job_id)
+            )
+
+    def _requeue(self, job_id: int) -> bool:
+        """Put a running job back in the queue; False if it already finished."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL "
+                "WHERE id = ? AND status = 'running'", (job_id,)
+            )
+        return cur.rowcount > 0
+
+    def run_job(self, job: dict):
+        user_id = job["user_id"]
+        print(f"Training job {job['id']} started for {user_id}")
+        try:
+            proc = subprocess.Popen(
+                [TRAINER_PYTHON, TRAIN_SCRIPT, user_id],
+                cwd=PROJECT_ROOT,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=True,  # own process group: stop() kills its pool workers too
+            )
+            with self._procs_lock:
+                self._procs[job["id"]] = proc
+            try:
+                stdout, stderr = proc.communicate(timeout=TRAINING_JOB_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.communicate()
+                self._finish(job["id"], "failed", error=f"timed out after {TRAINING_JOB_TIMEOUT}s")
+                return
+            finally:
+                with self._procs_lock:
+                    self._procs.pop(job["id"], None)
+            if job["id"] in self._killed and proc.returncode != 0:
+                return  # killed and requeued by stop()
+            output = (stdout + stderr)[-20_000:]  # cap
+            status = "done" if proc.returncode == 0 else "failed"
+            self._finish(job["id"], status, proc.returncode, output)
+        except Exception as e:
+            self._finish(job["id"], "failed", error=str(e))
+        print(f"Training job {job['id']} finished for {user_id}")
+
+    def run_once(self) -> bool:
+        job = self._claim()
+        if job is None:
+            return False
+        self.run_job(job)
+        return True
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print(f"[ERROR] training worker: {e}")
+            self._wakeup.wait(timeout=5)
+            self._wakeup.clear()
+
+    def start_workers(self):
+        """Start the worker pool in this process (once per process, fork-safe)."""
+        if self.num_workers <= 0:
+            return
+        with self._workers_lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers_pid = os.getpid()
+            self.recover()
+            self._workers = []
+            for i in range(self.num_workers):
+                t = threading.Thread(target=self._worker_loop, name=f"training-worker-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def stop(self, timeout: float = TRAINING_STOP_TIMEOUT):
+        """Stop claiming jobs and wait up to `timeout` for the running ones;
+        trainers still running after that are killed and their jobs requeued."""
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for t in self._workers:
+            t.join(max(0.0, deadline - time.monotonic()))
+        with self._procs_lock:
+            self._killed.update(self._procs)
+            running = dict(self._procs)
+        for job_id, proc in running.items():
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                pass
+            if proc.returncode == 0:
+                continue  # finished before the kill; run_job records it as done
+            if self._requeue(job_id):
+                print(f"Training job {job_id} interrupted, requeued")
+        for t in self._workers:
+            t.join(5)
+
+    def drain(self):
+        """Run queued jobs on `num_workers` threads until the queue is empty."""
+        self.recover()
+        def _drain_loop():
+            while self.run_once():
+                pass
+
+        threads = []
+        for i in range(max(1, self.num_workers)):
+            t = threading.Thread(target=_drain_loop, name=f"training-drain-{i}")
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue() -> TrainingQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = TrainingQueue()
+        return _queue
+
+
+if __name__ == "__main__":
+    sys.path.append(PROJECT_ROOT)
+    from future_prediction.metadata_index import get_index
+
+    added = get_index().backfill()
+    if added is not None:
+        print(f"Metadata index backfilled with {added} users")
+    q = get_queue()
+    print(f"Training worker running with {q.num_workers} slot(s) on {q.db_path}")
+    stop_requested = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop_requested.set())
+    q.start_workers()
+    stop_requested.wait()
+    print(f"Stopping training worker (waiting up to {TRAINING_STOP_TIMEOUT:g}s for running jobs)")
+    q.stop()
@@ -1,48 +1,134 @@
 from datetime import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hashlib
+import threading
 import pandas as pd
-from firebase_admin import firestore
-import firebase_admin
-from firebase_admin import credentials
-import os
 from dotenv import load_dotenv
 load_dotenv()
-# Safe Firebase initialization
-if not firebase_admin._apps:
-    firebase_key_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    if not firebase_key_path or not os.path.exists(firebase_key_path):
-        raise RuntimeError(" Firebase key not found or invalid path.")
-    cred = credentials.Certificate(firebase_key_path)
-    firebase_admin.initialize_app(cred)
+from future_prediction.datastore import get_db, get_async_db
 
-db = firestore.client()
+# Firestore (or the DATASTORE=fake stand-in), initialized on first use
+db = get_db()
 
-def fetch_category_monthly_series(user_id: str, category: str, months_back=None) -> pd.Series:
-    """Returns monthly totals for a given category from Firestore"""
+# ───── Read accounting ─────
+# Every streamed/fetched Firestore document is counted so per-request read
+# costs can be checked (see track_reads and the X-Firestore-Reads header).
+# Counters are context-local: per thread, and per asyncio task in the ASGI app.
+_reads_lock = threading.Lock()
+_reads_total = 0
+_reads_stack = ContextVar("firestore_reads_stack", default=())
+
+def count_reads(n: int = 1):
+    global _reads_total
+    with _reads_lock:
+        _reads_total += n
+    for counter in _reads_stack.get():
+        counter["reads"] += n
+
+def get_read_count() -> int:
+    return _reads_total
+
+@contextmanager
+def track_reads():
+    """Counts Firestore reads made by the current thread (or task) inside the block."""
+    counter = {"reads": 0}
+    token = _reads_stack.set(_reads_stack.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _reads_stack.reset(token)
+
+
+# ───── Records loading ─────
+def fetch_monthly_category_frame(user_id: str, categories=None, months_back=None) -> pd.DataFrame:
+    """Reads the user's records once and returns a month x category frame.
+
+    Cells are NaN where a month has no entry for that category, so
+    category_series(frame, cat) matches what fetch_category_monthly_series
+    used to return for each category. frame.attrs["last_update"] holds the
+    latest update_time among the streamed (non-empty) documents and
+    frame.attrs["records_version"] the records_version of all of them.
+    Always read from Firestore: per-user reads serve requests and must see
+    the latest records (the records mirror is for fleet-wide batch reads).
+    """
     records_ref = db.collection("users").document(user_id).collection("records")
-    docs = records_ref.stream()
+    return _records_frame(records_ref.stream(), categories, months_back)
+
+async def fetch_monthly_category_frame_async(user_id: str, categories=None, months_back=None) -> pd.DataFrame:
+    """fetch_monthly_category_frame on the async Firestore client (ASGI handlers)."""
+    records_ref = get_async_db().collection("users").document(user_id).collection("records")
+    docs = [doc async for doc in records_ref.stream()]
+    return _records_frame(docs, categories, months_back)
+
+def records_version(pairs) -> str:
+    """Digest of (month id, update_time isoformat) over every record document,
+    empty ones included. Unlike the latest update_time it also changes when a
+    document is deleted or cleared."""
+    digest = hashlib.sha1()
+    for month, updated in sorted((m, u or "") for m, u in pairs):
+        digest.update(f"{month}|{updated}\n".encode())
+    return digest.hexdigest()
 
-    rows = []
+def _records_frame(docs, categories=None, months_back=None) -> pd.DataFrame:
+    months, rows, versions = [], [], []
+    last_update = None
     for doc in docs:
-        data = doc.to_dict()
-        month_str = doc.id
+        count_reads()
+        data = doc.to_dict() or {}
+        updated = doc.update_time.replace(tzinfo=None).isoformat() if doc.update_time is not None else None
+        versions.append((doc.id, updated))
+        if data and doc.update_time is not None and (last_update is None or doc.update_time > last_update):
+            last_update = doc.update_time
         cat_exp = data.get("categoryExpenses", {})
-        if category in cat_exp:
-            rows.append({
-                "month": pd.to_datetime(month_str),
-                "amount": float(cat_exp[category])
-            })
-
-    df = pd.DataFrame(rows)
-    if df.empty:
-        return pd.Series([], dtype=float)
+        months.append(pd.to_datetime(doc.id))
+        rows.append({
+            cat: float(amount) for cat, amount in cat_exp.items()
+            if categories is None or cat in categories
+        })
 
-    df.set_index("month", inplace=True)
-    df = df.sort_index()
+    frame = pd.DataFrame(rows, index=pd.DatetimeIndex(months, name="month"), dtype=float)
+    if categories is not None:
+        frame = frame.reindex(columns=list(categories))
+    frame = frame.sort_index()
+    # data-version watermark: latest update_time of any record document
+    frame.attrs["last_update"] = last_update
+    frame.attrs["records_version"] = records_version(versions)
 
     # ✅ Optional filter
     if months_back is not None:
         cutoff = pd.to_datetime(datetime.now()) - pd.DateOffset(months=months_back)
-        df = df.loc[df.index >= cutoff]
+        frame = frame.loc[frame.index >= cutoff]
 
-    return df["amount"]
+    return frame
 
+def category_series(frame: pd.DataFrame, category: str) -> pd.Series:
+    """Monthly totals for one category out of a fetch_monthly_category_frame result."""
+    if category not in frame.columns:
+        return pd.Series([], dtype=float)
+    ts = frame[category].dropna()
+    if ts.empty:
+        return pd.Series([], dtype=float)
+    return ts.rename("amount")
+
+def fetch_category_monthly_series(user_id: str, category: str, months_back=None) -> pd.Series:
+    """Returns monthly totals for a given category from Firestore"""
+    frame = fetch_monthly_category_frame(user_id, [category], months_back=months_back)
+    return category_series(frame, category)
+
+def fetch_records_watermark(user_id: str) -> datetime | None:
+    """Latest update_time (naive UTC) of the user's non-empty record documents.
+
+    update_time comes with each streamed snapshot, so this is one read per
+    document and no per-document get().
+    """
+    records_ref = db.collection("users").document(user_id).collection("records")
+    latest = None
+    for doc in records_ref.stream():
+        count_reads()
+        if not doc.to_dict() or doc.update_time is None:
+            continue
+        dt = doc.update_time.replace(tzinfo=None)  # strip tz
+        if latest is None or dt > latest:
+            latest = dt
+    return latest
@@ -0,0 +1,108 @@
+# gunicorn.conf.py
+"""Pre-forking production server: gunicorn -c gunicorn.conf.py app_combined:app
+
+The app is imported once in the arbiter (preload_app) with the classifier
+loaded eagerly, so the DistilBERT weights, tokenizer and category map are
+in memory before the workers are forked and every worker shares those
+pages copy-on-write. To keep them shared, the garbage collector is disabled
+in the arbiter, everything loaded is frozen right before each fork
+(gc.freeze, so collections in the workers never write to those objects)
+and re-enabled in each worker.
+
+  WEB_CONCURRENCY        worker processes (default 2)
+  GUNICORN_THREADS       threads per worker (default 4, lets the micro-batcher batch)
+  TORCH_THREADS          torch intra-op threads per worker (default cpu_count / workers)
+  PRELOAD_FORECASTER=1   also import torch/pmdarima/the forecaster before forking
+  GUNICORN_TRAINING_WORKER=0
+                         don't start the training queue worker next to the arbiter
+
+Web workers only enqueue training jobs (TRAINING_WORKERS is forced to 0 in
+them); the queue runs in one dedicated `python future_prediction/training_queue.py`
+process started once the server is ready. On shutdown it gets SIGTERM and
+lets running jobs finish for up to graceful_timeout - 5s, then kills them
+and requeues their jobs.
+
+OMP_NUM_THREADS is forced to 1 in the arbiter so no OpenMP pool exists
+before fork; an operator-set value is restored in each worker (and given to
+the training worker), otherwise workers use TORCH_THREADS.
+
+Reloads: `kill -HUP <arbiter>` gracefully replaces the workers with fresh
+forks of the already-loaded app. To pick up new code or model files, start
+a new arbiter with `kill -USR2 <arbiter>` (it loads everything again), then
+stop the old one's workers with WINCH and the old arbiter with QUIT.
+
+ASGI mode: add `-k uvicorn.workers.UvicornWorker` and serve asgi_app:app.
+"""
+import gc
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))  # covers a cold /predict (PREDICT_API_TIMEOUT)
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))  # recycled workers are cheap forks
+max_requests_jitter = max_requests // 10
+
+OPERATOR_OMP_THREADS = os.environ.get("OMP_NUM_THREADS")
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", OPERATOR_OMP_THREADS or max(1, (os.cpu_count() or 1) // workers)))
+PRELOAD_FORECASTER = os.environ.get("PRELOAD_FORECASTER", "0") == "1"
+TRAINING_WORKERS = os.environ.get("TRAINING_WORKERS", "2")
+START_TRAINING_WORKER = os.environ.get("GUNICORN_TRAINING_WORKER", "1") == "1"
+
+# ───── Before the app is imported (in the arbiter) ─────
+# A background warmup thread would not survive fork(): load synchronously.
+if os.environ.get("CLASSIFIER_WARMUP", "background").lower() == "background":
+    os.environ["CLASSIFIER_WARMUP"] = "eager"
+os.environ["TRAINING_WORKERS"] = "0"
+# no OpenMP pool in the arbiter (it would not survive fork); workers set their own
+os.environ["OMP_NUM_THREADS"] = "1"
+gc.disable()
+
+_training_worker = None
+
+
+def when_ready(server):
+    global _training_worker
+    if PRELOAD_FORECASTER:
+        import future_prediction.predictor  # noqa: F401  (torch, pmdarima, statsmodels)
+        server.log.info("Forecaster modules preloaded")
+    if START_TRAINING_WORKER and int(TRAINING_WORKERS) > 0:
+        env = {**os.environ, "TRAINING_WORKERS": TRAINING_WORKERS,
+               "TRAINING_STOP_TIMEOUT": str(max(1, graceful_timeout - 5))}
+        env.pop("OMP_NUM_THREADS")
+        if OPERATOR_OMP_THREADS:
+            env["OMP_NUM_THREADS"] = OPERATOR_OMP_THREADS
+        _training_worker = subprocess.Popen(
+            [sys.executable, os.path.join(PROJECT_ROOT, "future_prediction", "training_queue.py")],
+            cwd=PROJECT_ROOT, env=env,
+        )
+        server.log.info(f"Training queue worker started (pid {_training_worker.pid})")
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    os.environ["OMP_NUM_THREADS"] = OPERATOR_OMP_THREADS or str(TORCH_THREADS)  # if torch is first imported here
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(TORCH_THREADS)
+    server.log.info(f"Worker {worker.pid} forked (torch threads: {TORCH_THREADS if torch else 'not loaded'})")
+
+
+def on_exit(server):
+    if _training_worker is not None and _training_worker.poll() is None:
+        _training_worker.terminate()  # finishes or requeues its running jobs, see training_queue.py
+        try:
+            _training_worker.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            _training_worker.kill()
@@ -0,0 +1,108 @@
+"""Benchmark ARIMA order selection: full auto_arima vs the fast mode.
+
+Synthetic monthly expense series (trend + yearly seasonality + noise) of
+varying length are fitted on all but the last HOLDOUT months, which are used
+to score the forecast. Three variants are compared:
+
+    full        pm.auto_arima stepwise seasonal search (previous behaviour)
+    fast_cold   bounded grid, no cached order (a category's first training)
+    fast_warm   bounded grid starting from the order auto_arima chose one
+                month earlier (every later retrain)
+
+    python scripts/bench_arima_selection.py --series 30 --budget 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from future_prediction.arima_order import select_arima  # noqa: E402
+
+HOLDOUT = 3
+
+
+def synthetic_series(rng, n_months: int) -> pd.Series:
+    t = np.arange(n_months)
+    base = rng.uniform(2000, 15000)
+    trend = base * rng.uniform(-0.005, 0.02) * t
+    season = base * rng.uniform(0.05, 0.3) * np.sin(2 * np.pi * (t + rng.integers(12)) / 12)
+    noise = rng.normal(0, base * rng.uniform(0.03, 0.12), n_months)
+    values = np.maximum(base + trend + season + noise, 0)
+    index = pd.date_range("2018-01-01", periods=n_months, freq="MS")
+    return pd.Series(values.round(2), index=index)
+
+
+def score(model, actual: np.ndarray) -> dict:
+    forecast = np.asarray(model.predict(n_periods=len(actual)), dtype=float)
+    err = forecast - actual
+    return {
+        "mae": float(np.mean(np.abs(err))),
+        "mape": float(np.mean(np.abs(err) / np.maximum(np.abs(actual), 1e-9))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--series", type=int, default=30)
+    parser.add_argument("--min-months", type=int, default=18)
+    parser.add_argument("--max-months", type=int, default=72)
+    parser.add_argument("--budget", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write the report JSON here")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    rng = np.random.default_rng(args.seed)
+    rows = {"full": [], "fast_cold": [], "fast_warm": []}
+
+    for i in range(args.series):
+        n = int(rng.integers(args.min_months, args.max_months + 1))
+        ts = synthetic_series(rng, n)
+        train, actual = ts[:-HOLDOUT], ts[-HOLDOUT:].values
+
+        # order a previous (one month shorter) full search would have cached
+        previous, _ = select_arima(train[:-1], search="full")
+        cached = {"order": tuple(previous.order), "seasonal_order": tuple(previous.seasonal_order)}
+
+        for name, kwargs in (
+            ("full", {"search": "full"}),
+            ("fast_cold", {"search": "fast", "budget": args.budget}),
+            ("fast_warm", {"search": "fast", "budget": args.budget, "cached": cached}),
+        ):
+            t0 = time.perf_counter()
+            model, info = select_arima(train, **kwargs)
+            seconds = time.perf_counter() - t0
+            rows[name].append({"months": n, "seconds": seconds, "method": info["method"], **score(model, actual)})
+        print(f"[{i + 1}/{args.series}] {n} months: " + ", ".join(
+            f"{k} {v[-1]['seconds']:.2f}s mape {v[-1]['mape']:.3f}" for k, v in rows.items()))
+
+    report = {"series": args.series, "budget": args.budget, "holdout": HOLDOUT, "variants": {}}
+    for name, r in rows.items():
+        secs = np.array([x["seconds"] for x in r])
+        report["variants"][name] = {
+            "fit_seconds_total": round(float(secs.sum()), 2),
+            "fit_seconds_mean": round(float(secs.mean()), 3),
+            "fit_seconds_p95": round(float(np.percentile(secs, 95)), 3),
+            "mae_mean": round(float(np.mean([x["mae"] for x in r])), 2),
+            "mape_mean": round(float(np.mean([x["mape"] for x in r])), 4),
+            "methods": {m: sum(1 for x in r if x["method"] == m) for m in {x["method"] for x in r}},
+        }
+    full_total = report["variants"]["full"]["fit_seconds_total"]
+    for name in ("fast_cold", "fast_warm"):
+        total = report["variants"][name]["fit_seconds_total"]
+        report["variants"][name]["speedup_vs_full"] = round(full_total / total, 2) if total else None
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Load benchmark for /categorize_expense.
+
+Start the API twice, once with batching disabled and once enabled, and run
+this script against each:
+
+    CLASSIFIER_MAX_BATCH=1  python flask_api/expense_routes.py
+    python scripts/bench_categorize.py --label unbatched
+
+    CLASSIFIER_MAX_BATCH=16 CLASSIFIER_MAX_WAIT_MS=5 python flask_api/expense_routes.py
+    python scripts/bench_categorize.py --label batched
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+SAMPLE_EXPENSES = [
+    "uber to office", "swiggy dinner", "electricity bill", "petrol",
+    "netflix subscription", "pharmacy medicines", "grocery shopping at dmart",
+    "flight tickets to delhi", "school fees", "zomato lunch", "mobile recharge",
+    "new shoes from myntra", "doctor consultation", "movie tickets", "water bill",
+]
+
+
+def run(url: str, concurrency: int, total: int):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        nonlocal errors
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        payload = {"expense": random.choice(SAMPLE_EXPENSES)}
+        t0 = time.perf_counter()
+        try:
+            r = session.post(url, json=payload, timeout=60)
+            ok = r.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    lat_ms = np.array(latencies) * 1000 if latencies else np.array([0.0])
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000/categorize_expense")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args()
+
+    # warm up the model / connection pool before measuring
+    run(args.url, 4, 20)
+
+    results = [run(args.url, c, args.requests) for c in args.concurrency]
+    for res in results:
+        print(f"[{args.label}] c={res['concurrency']:>3}  {res['throughput_rps']:>8} req/s  "
+              f"p50={res['p50_ms']}ms  p99={res['p99_ms']}ms  errors={res['errors']}")
+    print(json.dumps({"label": args.label, "results": results}))
@@ -0,0 +1,141 @@
+"""Memory per worker and requests/s: single-process server vs pre-forked gunicorn.
+
+Starts each server in turn, drives it with the load_test.py runner and then
+reads every server process's RSS, PSS and private memory from
+/proc/<pid>/smaps_rollup (Linux). PSS splits shared pages between the
+processes mapping them, so the PSS sum is the real footprint. Forked
+workers show most of the model memory as shared, not private.
+
+    python scripts/bench_prefork.py --workers 4 --endpoints categorize_expense generate_budget
+
+--fake-users N (default 300) runs both servers on the same seeded fake
+Firestore (DATASTORE=fake), so no credentials are needed. Pass 0 to use
+whatever DATASTORE/credentials the environment has.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from load_test import HttpTarget, fleet_documents, run, warm_up
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _children(pid: int) -> list[int]:
+    out = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == pid:
+                out.append(int(entry))
+    return out
+
+
+def process_memory(pid: int) -> dict:
+    """RSS, PSS and private (USS) memory of one process in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {"pid": pid, "rss_mb": round(fields.get("Rss", 0), 1), "pss_mb": round(fields.get("Pss", 0), 1),
+            "private_mb": round(private, 1)}
+
+
+def server_memory(root_pid: int) -> dict:
+    procs = [process_memory(root_pid)] + [process_memory(p) for p in _children(root_pid)]
+    # gunicorn: the arbiter plus its forked workers; the training worker is not part of serving
+    return {
+        "processes": procs,
+        "total_rss_mb": round(sum(p["rss_mb"] for p in procs), 1),
+        "total_pss_mb": round(sum(p["pss_mb"] for p in procs), 1),
+    }
+
+
+def wait_until_up(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/classifier_cache_stats", timeout=2)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not come up in {timeout}s")
+
+
+def bench(label: str, cmd: list[str], env: dict, args, user_ids: list[str]) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url, args.startup_timeout)
+        startup = round(time.perf_counter() - started, 2)
+        target = HttpTarget(url, timeout=60)
+        results = []
+        for endpoint in args.endpoints:
+            warm_up(target, endpoint, user_ids, args.startup_timeout)
+            res = run(target, endpoint, user_ids, args.concurrency, args.requests)
+            results.append(res)
+            print(f"[{label}] {endpoint:<24} {res['throughput_rps']:>8} req/s  p50={res['p50_ms']}ms  "
+                  f"p99={res['p99_ms']}ms  errors={res['errors']}", file=sys.stderr)
+        memory = server_memory(proc.pid)
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=60)
+
+    serving = [p for p in memory["processes"] if p["pid"] != proc.pid] or memory["processes"]
+    print(f"[{label}] {len(memory['processes'])} process(es), total PSS {memory['total_pss_mb']} MB, "
+          f"per worker: PSS {serving[0]['pss_mb']} MB / private {serving[0]['private_mb']} MB", file=sys.stderr)
+    return {"label": label, "command": " ".join(cmd), "startup_seconds": startup, "memory": memory, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=7870)
+    parser.add_argument("--endpoints", nargs="+", default=["categorize_expense", "generate_budget"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--fake-users", type=int, default=300)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--out", help="also write the JSON comparison here")
+    args = parser.parse_args()
+
+    env = {**os.environ, "PORT": str(args.port), "TRAINING_WORKERS": "0"}
+    documents = fleet_documents(args.fake_users or 1, 24)
+    user_ids = sorted(path.split("/")[1] for path in documents if path.count("/") == 1)
+    if args.fake_users:
+        seed = os.path.join(tempfile.mkdtemp(), "fleet.json")
+        with open(seed, "w", encoding="utf-8") as f:
+            json.dump(documents, f)
+        env.update(DATASTORE="fake", FAKE_FIRESTORE_SEED=seed)
+        env.setdefault("FAKE_FIRESTORE_LATENCY_MS", "20")
+
+    single_env = {**env, "CLASSIFIER_WARMUP": env.get("CLASSIFIER_WARMUP", "eager")}
+    single = bench("single", [sys.executable, "-c", (
+        "import os, app_combined; app_combined.app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"
+    )], single_env, args, user_ids)
+    prefork = bench(f"gunicorn x{args.workers}", [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app_combined:app",
+    ], {**env, "WEB_CONCURRENCY": str(args.workers), "GUNICORN_THREADS": str(args.threads),
+        "GUNICORN_TRAINING_WORKER": "0"}, args, user_ids)
+
+    comparison = {"workers": args.workers, "concurrency": args.concurrency, "single": single, "prefork": prefork}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(comparison, f, indent=2)
+    print(json.dumps(comparison))
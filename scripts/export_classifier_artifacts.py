@@ -0,0 +1,20 @@
+"""One-time export of the DistilBERT tokenizer and config into saved_models/.
+
+After this has run (with hub access), the API loads the classifier fully
+offline from saved_models/distilbert-base-uncased.
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "flask_api")))
+
+from transformers import DistilBertConfig, DistilBertTokenizerFast
+
+from classifier import LOCAL_ARTIFACTS_DIR, PRETRAINED_NAME, load_category_map
+
+if __name__ == "__main__":
+    os.makedirs(LOCAL_ARTIFACTS_DIR, exist_ok=True)
+    config = DistilBertConfig.from_pretrained(PRETRAINED_NAME, num_labels=len(load_category_map()))
+    config.save_pretrained(LOCAL_ARTIFACTS_DIR)
+    DistilBertTokenizerFast.from_pretrained(PRETRAINED_NAME).save_pretrained(LOCAL_ARTIFACTS_DIR)
+    print(f"✅ Tokenizer and config saved to {LOCAL_ARTIFACTS_DIR}")
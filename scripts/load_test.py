@@ -0,0 +1,278 @@
+"""Load test and latency baseline for the API endpoints, against a fake Firestore.
+
+By default the combined app (app_combined.py) is imported in this process
+with DATASTORE=fake, seeded with a synthetic fleet of users (records,
+savings goals, profile fields), and driven through Flask test clients:
+
+    python scripts/load_test.py --users 500 --latency-ms 20 --concurrency 1 8 32
+
+To load a real server instead, dump the same fleet, start the server on it
+and point --url at it (reads then come from X-Firestore-Reads, where the
+endpoint sets it):
+
+    python scripts/load_test.py --users 500 --dump-seed fleet.json
+    DATASTORE=fake FAKE_FIRESTORE_SEED=fleet.json FAKE_FIRESTORE_LATENCY_MS=20 python app_combined.py
+    python scripts/load_test.py --url http://127.0.0.1:7860
+
+(or `uvicorn asgi_app:app --port 7860` for the ASGI serving mode).
+
+Prints one line per (endpoint, concurrency) and a JSON baseline with
+throughput, p50/p95/p99 latency, status counts and Firestore reads
+(--out also writes it to a file).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+CATEGORIES = ["Food", "Utilities", "Travel", "Shopping", "Health"]
+BASE_SPEND = {"Food": 18_000, "Utilities": 6_000, "Travel": 9_000, "Shopping": 12_000, "Health": 4_000}
+SAMPLE_EXPENSES = [
+    "uber to office", "swiggy dinner", "electricity bill", "petrol",
+    "netflix subscription", "pharmacy medicines", "grocery shopping at dmart",
+    "flight tickets to delhi", "zomato lunch", "mobile recharge", "doctor consultation",
+]
+GOALS_PER_USER = 2
+
+# name -> (method, path, builder(rng, user_ids) -> (query params, json body))
+ENDPOINTS = {
+    "categorize_expense": ("POST", "/categorize_expense",
+                           lambda rng, users: (None, {"expense": rng.choice(SAMPLE_EXPENSES)})),
+    "predict": ("GET", "/predict", lambda rng, users: ({"user_id": rng.choice(users)}, None)),
+    "predict_future_expense": ("GET", "/predict_future_expense",
+                               lambda rng, users: ({"user_id": rng.choice(users)}, None)),
+    "generate_budget": ("GET", "/generate_budget", lambda rng, users: ({"user_id": rng.choice(users)}, None)),
+    "track_goal_progress": ("GET", "/track_goal_progress",
+                            lambda rng, users: ({"user_id": rng.choice(users),
+                                                 "goal_id": f"goal_{rng.randrange(GOALS_PER_USER)}"}, None)),
+    "admin_list_users": ("GET", "/admin/list_users", lambda rng, users: (None, None)),
+}
+
+
+# ───── Synthetic fleet ─────
+def fleet_documents(users: int, months: int, seed: int = 0) -> dict:
+    """{"users/u/...": data} for `users` users with `months` monthly records each
+    (ending last month, seasonal noise around per-user base spend) and goals."""
+    rng = np.random.default_rng(seed)
+    now = datetime.now()
+    first = now.year * 12 + now.month - 1 - months  # 0-based month index, ends last month
+    month_ids = [f"{(first + i) // 12:04d}-{(first + i) % 12 + 1:02d}" for i in range(months)]
+
+    docs = {}
+    for u in range(users):
+        uid = f"user_{u:05d}"
+        income = float(rng.choice([60_000, 90_000, 150_000, 250_000]))
+        scale = rng.uniform(0.5, 1.5)
+        docs[f"users/{uid}"] = {"displayName": f"Load Test {u}", "email": f"{uid}@example.com"}
+        for mid in month_ids:
+            month = int(mid[5:])
+            season = 1.3 if month in (6, 7, 8, 12) else 1.0
+            expenses = {
+                cat: round(float(base * scale * season * rng.uniform(0.7, 1.3)), 2)
+                for cat, base in BASE_SPEND.items() if rng.random() > 0.05
+            }
+            docs[f"users/{uid}/records/{mid}"] = {
+                "totalIncome": income,
+                "spentAmount": round(sum(expenses.values()), 2),
+                "categoryExpenses": expenses,
+            }
+        for g in range(GOALS_PER_USER):
+            target = float(rng.integers(20, 200) * 1_000)
+            docs[f"users/{uid}/savings_goals/goal_{g}"] = {
+                "goal_name": f"Goal {g}",
+                "target_amount": target,
+                "amount_saved": round(float(target * rng.uniform(0, 0.9)), 2),
+                "end_date": f"{now.year + 1}-{rng.integers(1, 13):02d}-01",
+            }
+    return docs
+
+
+# ───── Targets ─────
+class InProcessTarget:
+    """The combined Flask app on a seeded FakeFirestore, one test client per thread."""
+
+    def __init__(self, documents: dict, latency_ms: float, per_doc_ms: float):
+        os.environ["DATASTORE"] = "fake"
+        os.environ.setdefault("TRAINING_WORKERS", "0")  # don't train while measuring
+        from future_prediction.datastore import set_db
+        from future_prediction.fake_firestore import FakeFirestore
+
+        self.db = FakeFirestore(latency_ms=latency_ms, per_doc_ms=per_doc_ms)
+        self.db.seed(documents)
+        set_db(self.db)
+
+        sys.path.append(os.path.join(PROJECT_ROOT, "flask_api"))
+        from app_combined import app
+        self.app = app
+        self._local = threading.local()
+        self.name = "in-process"
+
+    def reads(self):
+        return self.db.reads
+
+    def request(self, method, path, params, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, query_string=params, json=body)
+        return response.status_code, response.headers.get("X-Firestore-Reads")
+
+
+class HttpTarget:
+    def __init__(self, url: str, timeout: float):
+        import requests
+        self._requests = requests
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+        self.name = self.url
+
+    def reads(self):
+        return None  # only per-response X-Firestore-Reads
+
+    def request(self, method, path, params, body):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.request(method, self.url + path, params=params, json=body, timeout=self.timeout)
+        return response.status_code, response.headers.get("X-Firestore-Reads")
+
+
+# ───── Runner ─────
+def warm_up(target, endpoint: str, users: list[str], timeout: float):
+    """One request per endpoint before measuring; waits out 503 (model warming)."""
+    method, path, build = ENDPOINTS[endpoint]
+    rng = random.Random(0)
+    deadline = time.monotonic() + timeout
+    while True:
+        status, _ = target.request(method, path, *build(rng, users))
+        if status != 503 or time.monotonic() > deadline:
+            return status
+        time.sleep(1)
+
+
+def run(target, endpoint: str, users: list[str], concurrency: int, total: int, seed: int = 0) -> dict:
+    method, path, build = ENDPOINTS[endpoint]
+    latencies, statuses, header_reads = [], {}, []
+    errors = 0
+    lock = threading.Lock()
+    rngs = threading.local()
+
+    def one(_):
+        nonlocal errors
+        rng = getattr(rngs, "rng", None)
+        if rng is None:
+            rng = rngs.rng = random.Random(seed + threading.get_ident())
+        params, body = build(rng, users)
+        t0 = time.perf_counter()
+        try:
+            status, reads = target.request(method, path, params, body)
+        except Exception:
+            status, reads = "exception", None
+        elapsed = time.perf_counter() - t0
+        with lock:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == "exception" or status >= 500:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+            if reads is not None:
+                header_reads.append(int(reads))
+
+    reads_before = target.reads()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    if reads_before is not None:
+        reads = target.reads() - reads_before
+    else:
+        reads = sum(header_reads) if header_reads else None
+
+    lat_ms = np.array(latencies) * 1000 if latencies else np.array([0.0])
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "status_counts": statuses,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 2),
+        "max_ms": round(float(lat_ms.max()), 2),
+        "firestore_reads": reads,
+        "reads_per_request": round(reads / total, 2) if reads is not None else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--users", type=int, default=200, help="synthetic users to seed")
+    parser.add_argument("--months", type=int, default=24, help="monthly records per user")
+    parser.add_argument("--latency-ms", type=float, default=float(os.environ.get("FAKE_FIRESTORE_LATENCY_MS", 20)),
+                        help="fake Firestore latency per call")
+    parser.add_argument("--doc-latency-ms", type=float, default=float(os.environ.get("FAKE_FIRESTORE_DOC_LATENCY_MS", 0.05)),
+                        help="fake Firestore latency per returned document")
+    parser.add_argument("--warmup-timeout", type=float, default=120)
+    parser.add_argument("--timeout", type=float, default=60, help="HTTP timeout with --url")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dump-seed", help="write the synthetic fleet as FAKE_FIRESTORE_SEED JSON and exit")
+    parser.add_argument("--out", help="also write the JSON baseline here")
+    parser.add_argument("--label", default="baseline")
+    args = parser.parse_args()
+
+    documents = fleet_documents(args.users, args.months, args.seed)
+    if args.dump_seed:
+        with open(args.dump_seed, "w", encoding="utf-8") as f:
+            json.dump(documents, f)
+        print(f"Wrote {len(documents)} documents to {args.dump_seed}")
+        sys.exit(0)
+
+    user_ids = sorted(path.split("/")[1] for path in documents if path.count("/") == 1)
+    if args.url:
+        target = HttpTarget(args.url, args.timeout)
+    else:
+        target = InProcessTarget(documents, args.latency_ms, args.doc_latency_ms)
+
+    results = []
+    for endpoint in args.endpoints:
+        warm_status = warm_up(target, endpoint, user_ids, args.warmup_timeout)
+        for c in args.concurrency:
+            res = run(target, endpoint, user_ids, c, args.requests, args.seed)
+            res["warmup_status"] = warm_status
+            results.append(res)
+            print(f"[{args.label}] {endpoint:<24} c={c:>3}  {res['throughput_rps']:>8} req/s  "
+                  f"p50={res['p50_ms']}ms  p95={res['p95_ms']}ms  p99={res['p99_ms']}ms  "
+                  f"reads/req={res['reads_per_request']}  errors={res['errors']}", file=sys.stderr)
+
+    baseline = {
+        "label": args.label,
+        "target": target.name,
+        "created_at": datetime.utcnow().isoformat(),
+        "config": {
+            "users": args.users, "months": args.months, "requests": args.requests,
+            "latency_ms": None if args.url else args.latency_ms,
+            "doc_latency_ms": None if args.url else args.doc_latency_ms,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+    print(json.dumps(baseline))
@@ -0,0 +1,142 @@
+"""Parity, latency and memory report: eager PyTorch vs int8 ONNX classifier.
+
+    python scripts/onnx_parity.py expenses_dataset_cleaned.csv \
+        --text-column Expense --label-column Category --limit 2000
+
+Exports saved_models/distilbert_int8.onnx first if it does not exist yet.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "flask_api"))
+
+from classifier import MAX_TOKENS, MODEL_PATH, load_category_map, load_tokenizer, load_torch_model
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load_backend(backend: str, num_labels: int):
+    """Returns a callable (input_ids, attention_mask) -> probs ndarray."""
+    if backend == "onnx":
+        from onnx_backend import OnnxClassifier, softmax
+        clf = OnnxClassifier()
+        return lambda ids, mask: softmax(clf.logits(ids, mask))
+
+    import torch
+    model = load_torch_model(num_labels)
+
+    def run(ids, mask):
+        with torch.no_grad():
+            logits = model(input_ids=torch.as_tensor(ids), attention_mask=torch.as_tensor(mask)).logits
+        return torch.softmax(logits, dim=1).numpy()
+    return run
+
+
+def evaluate(backend: str, texts: list[str], batch_size: int) -> dict:
+    """Runs in a fresh process so memory numbers are not polluted by the other backend."""
+    import torch
+    torch.set_num_threads(int(os.environ.get("BENCH_THREADS", os.cpu_count() or 1)))
+    tokenizer = load_tokenizer()
+
+    rss_before = rss_mb()
+    run = load_backend(backend, len(load_category_map()))
+    rss_loaded = rss_mb()
+
+    probs, batch_latencies, single_latencies = [], [], []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i:i + batch_size], padding="longest", truncation=True,
+                        max_length=MAX_TOKENS, return_tensors="np")
+        t0 = time.perf_counter()
+        probs.append(run(enc["input_ids"], enc["attention_mask"]))
+        batch_latencies.append(time.perf_counter() - t0)
+
+    for text in texts[:200]:
+        enc = tokenizer([text], truncation=True, max_length=MAX_TOKENS, return_tensors="np")
+        t0 = time.perf_counter()
+        run(enc["input_ids"], enc["attention_mask"])
+        single_latencies.append(time.perf_counter() - t0)
+
+    single_ms = np.array(single_latencies) * 1000
+    return {
+        "probs": np.concatenate(probs).tolist(),
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(rss_mb(), 1),
+        "batch_throughput_per_s": round(len(texts) / sum(batch_latencies), 1),
+        "single_p50_ms": round(float(np.percentile(single_ms, 50)), 2),
+        "single_p99_ms": round(float(np.percentile(single_ms, 99)), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv")
+    parser.add_argument("--text-column", default="Expense")
+    parser.add_argument("--label-column", default="Category")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threshold", type=float, default=0.4)
+    parser.add_argument("--max-agreement-drop", type=float, default=0.01,
+                        help="fail if the label agreement is below 1 - this value")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, encoding="ISO-8859-1").dropna(subset=[args.text_column, args.label_column])
+    df = df.head(args.limit)
+    texts = df[args.text_column].astype(str).str.lower().tolist()
+
+    category_map = load_category_map()
+    reverse_category_map = {v: k for k, v in category_map.items()}
+
+    from onnx_backend import ONNX_MODEL_PATH, export_quantized_onnx
+    if not os.path.exists(ONNX_MODEL_PATH):
+        export_quantized_onnx(load_torch_model(len(category_map)))
+
+    ctx = mp.get_context("spawn")
+    reports = {}
+    for backend in ("torch", "onnx"):
+        with ctx.Pool(1) as pool:
+            reports[backend] = pool.apply(evaluate, (backend, texts, args.batch_size))
+
+    p_torch = np.array(reports["torch"].pop("probs"))
+    p_onnx = np.array(reports["onnx"].pop("probs"))
+
+    def categories(p):
+        return [reverse_category_map.get(int(l), "unknown") if c >= args.threshold else "unknown"
+                for l, c in zip(p.argmax(axis=1), p.max(axis=1))]
+
+    cat_torch, cat_onnx = categories(p_torch), categories(p_onnx)
+    labels = df[args.label_column].astype(str).str.strip().tolist()
+    conf_diff = np.abs(p_torch.max(axis=1) - p_onnx.max(axis=1))
+
+    report = {
+        "samples": len(texts),
+        "label_agreement": round(float(np.mean(p_torch.argmax(1) == p_onnx.argmax(1))), 4),
+        "category_agreement": round(float(np.mean([a == b for a, b in zip(cat_torch, cat_onnx)])), 4),
+        "accuracy_torch": round(float(np.mean([a == b for a, b in zip(cat_torch, labels)])), 4),
+        "accuracy_onnx": round(float(np.mean([a == b for a, b in zip(cat_onnx, labels)])), 4),
+        "confidence_abs_diff_mean": round(float(conf_diff.mean()), 4),
+        "confidence_abs_diff_max": round(float(conf_diff.max()), 4),
+        "onnx_file_mb": round(os.path.getsize(ONNX_MODEL_PATH) / 2**20, 1),
+        "torch_file_mb": round(os.path.getsize(MODEL_PATH) / 2**20, 1),
+        "torch": reports["torch"],
+        "onnx": reports["onnx"],
+    }
+    print(json.dumps(report, indent=2))
+
+    if report["label_agreement"] < 1 - args.max_agreement_drop:
+        print("❌ ONNX backend diverges from the eager model")
+        sys.exit(1)
+    print("✅ ONNX backend matches the eager model")
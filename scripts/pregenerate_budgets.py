@@ -0,0 +1,69 @@
+"""Pre-generate next-month budgets for every user (e.g. for monthly budget
+notifications) without calling /generate_budget once per user.
+
+    python scripts/pregenerate_budgets.py --out budgets.jsonl [--chunk 1000]
+
+Users are processed in chunks: each chunk's records and goals are fetched
+concurrently (BUDGET_BATCH_FETCH_THREADS), then budget_engine computes all
+of the chunk's budgets in one vectorized pass. Writes one JSON line per user.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+load_dotenv()
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "flask_api")))
+
+from budget_insights import db, fetch_many_budget_inputs  # noqa: E402
+from budget_engine import generate_budgets  # noqa: E402
+
+
+def iter_user_ids():
+    for doc in db.collection("users").select([]).stream():
+        yield doc.id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+
+    now = datetime.now()
+    started = time.perf_counter()
+    written = skipped = 0
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        chunk = []
+
+        def flush():
+            nonlocal written, skipped
+            budgets = generate_budgets(fetch_many_budget_inputs(chunk), now)
+            for uid, budget in budgets.items():
+                if budget is None:
+                    skipped += 1
+                    continue
+                f.write(json.dumps({"user_id": uid, "generated_at": now.isoformat(), "budget": budget},
+                                   ensure_ascii=False) + "\n")
+                written += 1
+            print(f"{written + skipped} users processed ({time.perf_counter() - started:.1f}s)")
+            chunk.clear()
+
+        for uid in iter_user_ids():
+            chunk.append(uid)
+            if len(chunk) >= args.chunk:
+                flush()
+        if chunk:
+            flush()
+
+    print(f"Budgets written for {written} users to {args.out} ({skipped} without records) ✅")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,7 @@
 #!/bin/bash
-python flask_api/expense_routes.py
+# Production: pre-forking gunicorn with the models loaded once before fork
+# (see gunicorn.conf.py). SERVER=dev runs the single-process Flask server.
+if [ "${SERVER:-gunicorn}" = "dev" ]; then
+    exec python flask_api/expense_routes.py
+fi
+exec gunicorn -c gunicorn.conf.py app_combined:app
@@ -0,0 +1,31 @@
+"""Tests run on the in-memory FakeFirestore (DATASTORE=fake); no credentials
+or network. Local state (training queue, mirror, metadata index) goes to a
+temporary directory."""
+import os
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [PROJECT_ROOT, os.path.join(PROJECT_ROOT, "flask_api")]
+
+_state_dir = tempfile.mkdtemp(prefix="finance-tests-")
+os.environ["DATASTORE"] = "fake"
+os.environ["TRAINING_WORKERS"] = "0"
+os.environ.setdefault("CLASSIFIER_WARMUP", "off")
+os.environ["TRAINING_QUEUE_DB"] = os.path.join(_state_dir, "training_jobs.sqlite3")
+os.environ["RECORDS_MIRROR_DB"] = os.path.join(_state_dir, "records_mirror.sqlite3")
+os.environ["METADATA_INDEX_DB"] = os.path.join(_state_dir, "metadata_index.sqlite3")
+
+import pytest  # noqa: E402
+
+from future_prediction.datastore import get_db, set_db  # noqa: E402
+from future_prediction.fake_firestore import FakeFirestore  # noqa: E402
+
+# one client for the whole session: app modules bind get_db() at import time
+set_db(FakeFirestore())
+
+
+@pytest.fixture
+def fake_db():
+    """The app's FakeFirestore. Tests use their own user ids instead of resetting it."""
+    return get_db()
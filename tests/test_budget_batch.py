@@ -0,0 +1,26 @@
+import pytest
+from flask import Flask
+
+import budget_insights
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(budget_insights.bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("body", [["u1", "u2"], {"user_ids": ["u1", ["u2"]]}, {"user_ids": ["u1", ""]},
+                                  {"user_ids": [{"id": "u1"}]}])
+def test_generate_budgets_rejects_malformed_bodies(client, body):
+    response = client.post("/generate_budgets", json=body)
+
+    assert response.status_code == 400
+
+
+def test_generate_budgets_reports_users_without_records(fake_db, client):
+    response = client.post("/generate_budgets", json={"user_ids": ["budgetless_user"]})
+
+    assert response.status_code == 200
+    assert response.get_json()["results"]["budgetless_user"] == {"error": "No financial records found"}
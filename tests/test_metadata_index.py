@@ -0,0 +1,25 @@
+import json
+
+from future_prediction.metadata_index import MetadataIndex
+
+
+def write_metadata(models_root, user_id, meta):
+    path = models_root / user_id / "metadata.json"
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps(meta))
+
+
+def test_backfill_adds_missing_users_without_overwriting_upserts(tmp_path):
+    models = tmp_path / "models"
+    write_metadata(models, "old_user", {"last_trained": "2024-01-01T00:00:00", "bundle_version": 1})
+    write_metadata(models, "new_user", {"last_trained": "2024-02-01T00:00:00"})
+    index = MetadataIndex(str(tmp_path / "index.sqlite3"), str(models))
+    assert index.get_many(["old_user", "new_user"]) == {}  # nothing read on open
+
+    index.upsert("old_user", {"last_trained": "2025-01-01T00:00:00", "bundle_version": 7})
+    assert index.backfill() == 1
+    assert index.backfill() is None  # once per index file
+
+    meta = index.get_many(["old_user", "new_user"])
+    assert meta["old_user"]["bundle_version"] == 7
+    assert meta["new_user"]["last_trained"] == "2024-02-01T00:00:00"
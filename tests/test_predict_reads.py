@@ -0,0 +1,85 @@
+import pytest
+
+from future_prediction import predict_api
+
+MONTHS = [f"{2023 + i // 12}-{i % 12 + 1:02d}" for i in range(15)]
+
+
+@pytest.fixture
+def client():
+    return predict_api.app.test_client()
+
+
+def seed_records(db, user_id, months=MONTHS):
+    db.seed({
+        f"users/{user_id}/records/{month}": {
+            "totalIncome": 90_000.0,
+            "categoryExpenses": {"Food": 10_000.0 + 100 * i, "Utilities": 4_000.0 + 10 * i},
+        }
+        for i, month in enumerate(months)
+    })
+
+
+def test_predict_reads_each_record_document_once(fake_db, client):
+    seed_records(fake_db, "reads_user")
+    reads, calls = fake_db.reads, fake_db.calls
+
+    response = client.get("/predict", query_string={"user_id": "reads_user"})
+
+    assert response.status_code == 200
+    assert int(response.headers["X-Firestore-Reads"]) == len(MONTHS)
+    assert fake_db.reads - reads == len(MONTHS)
+    assert fake_db.calls - calls == 1  # one stream of the records collection
+
+
+def test_cached_predict_still_reads_records_once(fake_db, client):
+    seed_records(fake_db, "cached_user")
+    first = client.get("/predict", query_string={"user_id": "cached_user"})
+    calls, hits = fake_db.calls, predict_api.forecast_cache.stats()["hits"]
+
+    second = client.get("/predict", query_string={"user_id": "cached_user"})
+
+    assert second.get_json() == first.get_json()
+    assert int(second.headers["X-Firestore-Reads"]) == len(MONTHS)
+    assert fake_db.calls - calls == 1
+    assert predict_api.forecast_cache.stats()["hits"] == hits + 1
+
+
+def test_predict_recomputes_after_a_record_is_deleted(fake_db, client):
+    seed_records(fake_db, "deleting_user")
+    client.get("/predict", query_string={"user_id": "deleting_user"})
+    misses = predict_api.forecast_cache.stats()["misses"]
+
+    fake_db.document(f"users/deleting_user/records/{MONTHS[0]}").delete()
+    response = client.get("/predict", query_string={"user_id": "deleting_user"})
+
+    assert int(response.headers["X-Firestore-Reads"]) == len(MONTHS) - 1
+    assert predict_api.forecast_cache.stats()["misses"] == misses + 1  # not served from the cache
+
+
+@pytest.mark.parametrize("user_ids", [["ok", ["nested"]], ["ok", {"id": 1}], ["ok", ""], [7]])
+def test_predict_batch_rejects_non_string_ids(client, user_ids):
+    response = client.post("/predict_batch", json={"user_ids": user_ids})
+
+    assert response.status_code == 400
+
+
+def test_predict_batch_reports_a_failing_user_without_failing_the_batch(fake_db, client, monkeypatch):
+    from future_prediction import predictor
+
+    seed_records(fake_db, "good_user")
+    seed_records(fake_db, "broken_user")
+    prepare = predictor._prepare_category
+
+    def flaky(user_id, category, ts):
+        if user_id == "broken_user":
+            raise RuntimeError("corrupt model")
+        return prepare(user_id, category, ts)
+
+    monkeypatch.setattr(predictor, "_prepare_category", flaky)
+    response = client.post("/predict_batch", json={"user_ids": ["good_user", "broken_user"]})
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert results["broken_user"] == {"status": "error", "error": "corrupt model"}
+    assert results["good_user"]["categoryExpenses"]
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from future_prediction.fake_firestore import FakeFirestore
+from future_prediction.records_mirror import RecordsMirror
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client():
+    db = FakeFirestore()
+    db.seed({
+        "users/alice": {"displayName": "Alice"},
+        "users/alice/records/2024-01": {"totalIncome": 100.0, "categoryExpenses": {"Food": 10.0}},
+        "users/alice/records/2024-02": {"totalIncome": 100.0, "categoryExpenses": {"Food": 20.0, "Travel": 5.0}},
+        "users/bob": {"displayName": "Bob"},
+        "users/bob/records/2024-01": {"totalIncome": 50.0, "categoryExpenses": {"Health": 7.0}},
+    }, update_time=T0)
+    return db
+
+
+@pytest.fixture
+def mirror(client, tmp_path):
+    return RecordsMirror(str(tmp_path / "mirror.sqlite3"), client)
+
+
+def records(client, user_id):
+    return client.collection("users").document(user_id).collection("records")
+
+
+def test_initial_sync_mirrors_every_document(mirror):
+    stats = mirror.sync()
+    assert stats["mode"] == "scan"
+    assert (stats["scanned"], stats["upserted"], stats["deleted"]) == (3, 3, 0)
+
+    frames = mirror.monthly_category_frames(["alice", "bob"], ["Food", "Travel", "Health"])
+    assert frames["alice"]["Food"].tolist() == [10.0, 20.0]
+    assert frames["bob"]["Health"].tolist() == [7.0]
+    assert mirror.budget_records(["bob"])["bob"] == [
+        {"month": "2024-01", "categoryExpenses": {"Health": 7.0}, "totalIncome": 50.0}
+    ]
+
+
+def test_sync_picks_up_updates_and_only_refetches_changed_documents(client, mirror):
+    mirror.sync()
+    records(client, "alice").document("2024-02").set({"categoryExpenses": {"Food": 99.0}})
+    records(client, "alice").document("2024-03").set({"categoryExpenses": {"Food": 30.0}})
+
+    stats = mirror.sync()
+    assert (stats["scanned"], stats["upserted"], stats["deleted"]) == (4, 2, 0)
+    frame = mirror.monthly_category_frame("alice", ["Food", "Travel"])
+    assert frame["Food"].tolist() == [10.0, 99.0, 30.0]
+    assert frame["Travel"].isna().all()  # replaced, not merged with the old categories
+
+
+def test_sync_drops_deleted_documents_and_moves_last_update(client, mirror):
+    mirror.sync()
+    before_update = mirror.last_updates(["alice"])["alice"]
+    before_version = mirror.record_versions(["alice"])["alice"]
+
+    records(client, "alice").document("2024-01").delete()
+    stats = mirror.sync()
+
+    assert stats["deleted"] == 1
+    assert mirror.monthly_category_frame("alice", ["Food"])["Food"].tolist() == [20.0]
+    assert mirror.last_updates(["alice"])["alice"] > before_update
+    assert mirror.record_versions(["alice"])["alice"] != before_version
+    # the training watermark still only looks at existing, non-empty documents
+    assert mirror.watermarks(["alice"])["alice"] == before_update
+
+
+def test_cleared_document_moves_last_update_but_not_watermark(client, mirror):
+    mirror.sync()
+    watermark = mirror.watermarks(["bob"])["bob"]
+    records(client, "bob").document("2024-01").set({})
+    mirror.sync()
+
+    assert "bob" not in mirror.watermarks(["bob"])
+    assert mirror.last_updates(["bob"])["bob"] > watermark
+    assert mirror.monthly_category_frame("bob", ["Health"]).empty
+
+
+def test_mirror_records_version_matches_firestore_frame(client, mirror):
+    from future_prediction import utils
+
+    mirror.sync()
+    stream = records(client, "alice").stream()
+    frame = utils._records_frame(stream, ["Food"])
+    assert frame.attrs["records_version"] == mirror.record_versions(["alice"])["alice"]
@@ -0,0 +1,75 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from future_prediction import training_queue
+from future_prediction.training_queue import TrainingQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return TrainingQueue(str(tmp_path / "jobs.sqlite3"), num_workers=1)
+
+
+def set_worker(queue, job_id, worker):
+    with queue._connect() as conn:
+        conn.execute("UPDATE jobs SET worker = ? WHERE id = ?", (worker, job_id))
+
+
+def test_enqueue_returns_the_active_job_instead_of_a_duplicate(queue):
+    job, created = queue.enqueue("dup_user")
+    again, created_again = queue.enqueue("dup_user")
+    assert created and not created_again
+    assert again["id"] == job["id"]
+
+    queue._claim()
+    running, created_running = queue.enqueue("dup_user")
+    assert not created_running and running["status"] == "running"
+
+    queue._finish(job["id"], "done", 0)
+    _, created_after = queue.enqueue("dup_user")
+    assert created_after
+
+
+def test_recover_requeues_jobs_of_dead_local_workers_only(queue):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    host = socket.gethostname()
+    lost, _ = queue.enqueue("lost_user")
+    alive, _ = queue.enqueue("alive_user")
+    queue._claim()
+    queue._claim()
+    set_worker(queue, lost["id"], f"{host}:{dead.pid}:training-worker-0")
+
+    queue.recover()
+
+    assert queue.get(lost["id"])["status"] == "queued"
+    assert queue.get(alive["id"])["status"] == "running"  # this process is alive
+
+
+def test_requeue_leaves_finished_jobs_alone(queue):
+    job, _ = queue.enqueue("finished_user")
+    queue._claim()
+    queue._finish(job["id"], "done", 0)
+
+    assert not queue._requeue(job["id"])
+    assert queue.get(job["id"])["status"] == "done"
+
+
+def test_stop_kills_and_requeues_a_running_trainer(queue, tmp_path, monkeypatch):
+    script = tmp_path / "slow_trainer.sh"
+    script.write_text("sleep 30\n")
+    monkeypatch.setattr(training_queue, "TRAINER_PYTHON", "/bin/sh")
+    monkeypatch.setattr(training_queue, "TRAIN_SCRIPT", str(script))
+    job, _ = queue.enqueue("slow_user")
+    queue.start_workers()
+    deadline = time.monotonic() + 10
+    while not queue._procs and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    queue.stop(timeout=0.2)
+
+    assert queue.get(job["id"])["status"] == "queued"